@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Benchmark of the binarisation methods of utils.Binarise on full pages.
+
+Every sampled page is blurred as by the cleaning stage, then binarized by
+Otsu and by each local method at several window sizes: the time of a local
+method should not grow with its window. The ink found by each method is
+compared to Otsu's: the share of the page it binarizes differently, and the
+pages where it finds far more or less ink, worth a look.
+
+Run from the repository root:
+    python benchmarks/binarise.py [-i src/data/input/1922] [-n 10] [-w 15 51 151]
+"""
+
+import argparse
+import time
+from pathlib import Path
+from typing import Callable, List
+import numpy as np
+import core
+import utils
+
+METHODS = ('sauvola', 'niblack', 'wolf')
+WINDOWS = (15, 51, 151)
+
+
+def timed(func: Callable, *args) -> tuple:
+    """Result of func and the seconds it took."""
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def run(pages: List[Path], windows=WINDOWS) -> dict:
+    """Timings and differences to Otsu of every method over pages."""
+    binarise = utils.Binarise()
+    stats = {'otsu': {'seconds': [], 'ink': [], 'diff': []}}
+    stats.update({
+        (method, window): {'seconds': [], 'ink': [], 'diff': []}
+        for method in METHODS for window in windows
+    })
+    outliers = []
+    shape = None
+
+    for src in pages:
+        gray = core.Scan(src).blur_gray
+        shape = gray.shape
+        (_, otsu), seconds = timed(binarise.otsu, gray)
+        otsu = otsu > 0
+        stats['otsu']['seconds'].append(seconds)
+        stats['otsu']['ink'].append(otsu.mean())
+        stats['otsu']['diff'].append(0.0)
+
+        for method in METHODS:
+            for window in windows:
+                binary, seconds = timed(binarise.local, gray, method, window)
+                binary = binary > 0
+                stat = stats[(method, window)]
+                stat['seconds'].append(seconds)
+                stat['ink'].append(binary.mean())
+                stat['diff'].append((binary != otsu).mean())
+                # twice as much or half as little ink as Otsu
+                if otsu.any() and not 0.5 <= binary.mean() / otsu.mean() <= 2:
+                    outliers.append((Path(src).name, method, window, otsu.mean(), binary.mean()))
+
+    return {'methods': stats, 'pages': len(pages), 'shape': shape, 'outliers': outliers}
+
+
+def report(results: dict) -> None:
+    """Print the results of run()."""
+    height, width = results['shape']
+    print(f"{results['pages']} pages of {width}x{height} pixels")
+    print(f"{'method':<10}{'window':>8}{'ms/page':>10}{'ink %':>8}{'diff %':>8}")
+    for name, stat in results['methods'].items():
+        method, window = (name, '') if name == 'otsu' else name
+        print(f"{method:<10}{window:>8}{1000 * np.mean(stat['seconds']):>10.1f}"
+              f"{100 * np.mean(stat['ink']):>8.2f}{100 * np.mean(stat['diff']):>8.2f}")
+
+    for name, method, window, otsu, ink in results['outliers']:
+        print(f"{name}: {method} ({window}) {100 * ink:.2f}% ink, Otsu {100 * otsu:.2f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('-i', '--input', type=Path, default=Path('src/data/input/1922'),
+                        help="Directory of input pages")
+    parser.add_argument('-n', '--pages', type=int, default=10,
+                        help="Number of pages sampled evenly from the input directory")
+    parser.add_argument('-w', '--windows', type=int, nargs='+', default=list(WINDOWS),
+                        help="Window sizes of the local methods (odd)")
+    args = parser.parse_args()
+
+    files = sorted(args.input.glob('*.png'))
+    if not files:
+        parser.error(f"No page found in {args.input}")
+    step = max(1, len(files) // args.pages)
+    report(run(files[::step][:args.pages], args.windows))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Benchmark of the skew estimation methods of utils.Transform.
+
+Every sampled page is binarized as by the cleaning stage, then rotated by
+known angles. The estimated skew of a rotated page should be the skew of the
+page minus the angle it was rotated by, whatever the actual skew of the
+page: the error of a method is how far it is from that. Pages whose skew
+the methods disagree on by more than a degree are listed.
+
+Run from the repository root:
+    python benchmarks/skew.py [-i src/data/input/1922] [-n 20]
+"""
+
+import argparse
+import time
+from pathlib import Path
+from typing import Callable, List
+import cv2
+import numpy as np
+import core
+import utils
+
+ANGLES = (-3.0, -1.0, -0.3, 0.3, 1.0, 3.0)
+
+
+def timed(func: Callable, *args) -> tuple:
+    """Result of func and the seconds it took."""
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def run(pages: List[Path], angles=ANGLES) -> dict:
+    """Estimation errors and timings of both methods over pages."""
+    params = core.Params()
+    transform = utils.Transform()
+    methods = {
+        'minAreaRect': transform.estimate_angle,
+        'profile': lambda src: transform.estimate_angle_profile(
+            src, params.SKEW_MAX_ANGLE, params.SKEW_PRECISION, params.SKEW_STRIDE),
+    }
+    stats = {name: {'errors': [], 'seconds': []} for name in methods}
+    rotations = {'cubic': [], 'nearest': [], 'skipped': 0}
+    measured = 0
+    disagreements = []
+
+    for src in pages:
+        thresh = core.Scan(src).blur_binary
+        if not np.count_nonzero(thresh):
+            # minAreaRect needs ink (blank pages are discarded by selection)
+            continue
+        measured += 1
+        skews = {}
+        for name, method in methods.items():
+            skews[name], seconds = timed(method, thresh)
+            stats[name]['seconds'].append(seconds)
+        if abs(skews['profile'] - skews['minAreaRect']) > 1:
+            disagreements.append((Path(src).name, skews['minAreaRect'], skews['profile']))
+        if abs(skews['profile']) < params.SKEW_MIN_ANGLE:
+            rotations['skipped'] += 1
+
+        _, seconds = timed(transform.rotate, thresh, 1.0)
+        rotations['cubic'].append(seconds)
+        _, seconds = timed(transform.rotate, thresh, 1.0, 0.0, cv2.INTER_NEAREST)
+        rotations['nearest'].append(seconds)
+
+        for angle in angles:
+            rotated = transform.rotate(thresh, angle, 0.0, cv2.INTER_NEAREST)
+            for name, method in methods.items():
+                estimated, seconds = timed(method, rotated)
+                stats[name]['errors'].append(abs(estimated - (skews[name] - angle)))
+                stats[name]['seconds'].append(seconds)
+
+    return {'methods': stats, 'rotations': rotations, 'pages': measured,
+            'disagreements': disagreements}
+
+
+def report(results: dict) -> None:
+    """Print the results of run()."""
+    print(f"{results['pages']} pages, rotated by {', '.join(str(angle) for angle in ANGLES)} degrees")
+    print(f"{'method':<12}{'ms/page':>10}{'mean err':>10}{'p95 err':>10}{'max err':>10}")
+    for name, stat in results['methods'].items():
+        errors = np.array(stat['errors'])
+        print(f"{name:<12}{1000 * np.mean(stat['seconds']):>10.1f}{errors.mean():>10.3f}"
+              f"{np.percentile(errors, 95):>10.3f}{errors.max():>10.3f}")
+
+    rotations = results['rotations']
+    print(f"rotation: cubic {1000 * np.mean(rotations['cubic']):.1f} ms/page, "
+          f"nearest {1000 * np.mean(rotations['nearest']):.1f} ms/page, "
+          f"{rotations['skipped']} pages below {core.Params().SKEW_MIN_ANGLE} degree not rotated")
+
+    # the skew of a page is unknown, but such pages are worth a look
+    for name, rect, profile in results['disagreements']:
+        print(f"{name}: minAreaRect {rect:.2f}, profile {profile:.2f} degrees")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('-i', '--input', type=Path, default=Path('src/data/input/1922'),
+                        help="Directory of input pages")
+    parser.add_argument('-n', '--pages', type=int, default=20,
+                        help="Number of pages sampled evenly from the input directory")
+    args = parser.parse_args()
+
+    files = sorted(args.input.glob('*.png'))
+    if not files:
+        parser.error(f"No page found in {args.input}")
+    step = max(1, len(files) // args.pages)
+    report(run(files[::step][:args.pages]))
+
+
+if __name__ == "__main__":
+    main()
@@ -17,6 +17,25 @@ class CommandLineArgs:
     input_path: Optional[Path] = None
     output_path: Optional[Path] = None
     verbose: bool = False
+    jobs: int = 1
+    ocr_procs: int = 0
+    engine: Optional[str] = None
+    line_batch: Optional[int] = None
+    cascade: bool = False
+    words: bool = False
+    refine: bool = False
+    fast_select: bool = False
+    fast_deskew: bool = False
+    tiled: bool = False
+    layouts: bool = False
+    in_memory: bool = False
+    debug: bool = False
+    stream: bool = False
+    cache: bool = False
+    ocr_memo: bool = False
+    resume: bool = False
+    worker: Optional[Path] = None
+    merge: Optional[Path] = None
 
 def get_parser() -> argparse.ArgumentParser:
     """
@@ -66,6 +85,146 @@ def get_parser() -> argparse.ArgumentParser:
         help="Enable verbose output",
         default=False
     )
+
+    # Execution
+    parser.add_argument(
+        '-j', '--jobs',
+        type=int,
+        help="Number of worker processes used by each stage of the pipeline",
+        default=1
+    )
+
+    parser.add_argument(
+        '--ocr-procs',
+        type=int,
+        metavar='N',
+        help="Number of tesseract processes reading lines at once (file mode, LINE method)",
+        default=0
+    )
+
+    parser.add_argument(
+        '--engine',
+        choices=['pytesseract', 'tesserocr'],
+        help="OCR backend: the tesseract binary, or libtesseract loaded once per worker",
+        default=None
+    )
+
+    parser.add_argument(
+        '--line-batch',
+        type=int,
+        metavar='K',
+        help="Read short lines K at a time, stacked into a single image (file mode, LINE method)",
+        default=None
+    )
+
+    parser.add_argument(
+        '--cascade',
+        action='store_true',
+        help="Read lines with the legacy engine first, and again with other modes only when doubtful",
+        default=False
+    )
+
+    parser.add_argument(
+        '--words',
+        action='store_true',
+        help="Add the words of each line or block, with their boxes and confidences, to output.csv",
+        default=False
+    )
+
+    parser.add_argument(
+        '--refine',
+        action='store_true',
+        help="Read again, on their own and scaled up, the words recognized with a low confidence",
+        default=False
+    )
+
+    parser.add_argument(
+        '--fast-select',
+        action='store_true',
+        help="Count the lines of a page on a downscaled version first, at full resolution only when close to the trigger",
+        default=False
+    )
+
+    parser.add_argument(
+        '--fast-deskew',
+        action='store_true',
+        help="Estimate the skew of a page from projection profiles and leave nearly straight pages as they are",
+        default=False
+    )
+
+    parser.add_argument(
+        '--tiled',
+        action='store_true',
+        help="Clean pages by strips, within the memory budget of ProcessingConfig.TILE_BUDGET_MB",
+        default=False
+    )
+
+    parser.add_argument(
+        '--layouts',
+        action='store_true',
+        help="Reuse the blocks and lines of earlier pages of the same number and table layout (in memory only)",
+        default=False
+    )
+
+    parser.add_argument(
+        '--in-memory',
+        action='store_true',
+        help="Pass decoded images between stages instead of writing PNG files",
+        default=False
+    )
+
+    parser.add_argument(
+        '--debug',
+        action='store_true',
+        help="Write intermediate images when running in memory",
+        default=False
+    )
+
+    parser.add_argument(
+        '--stream',
+        action='store_true',
+        help="Process pages one after another in memory and write rows to output.csv as they come",
+        default=False
+    )
+
+    parser.add_argument(
+        '--cache',
+        action='store_true',
+        help="Reuse the stage outputs of previous runs for unchanged pages (in memory only)",
+        default=False
+    )
+
+    parser.add_argument(
+        '--ocr-memo',
+        action='store_true',
+        help="Reuse the text of line and block images already recognized by previous runs",
+        default=False
+    )
+
+    parser.add_argument(
+        '--resume',
+        action='store_true',
+        help="Resume an interrupted run, skipping the lines recorded in its journal",
+        default=False
+    )
+
+    # Distributed execution
+    parser.add_argument(
+        '--worker',
+        type=Path,
+        metavar='QUEUE',
+        help="Process pages claimed from a work queue shared with other hosts "
+             "(a directory, or a .sqlite file)",
+        default=None
+    )
+
+    parser.add_argument(
+        '--merge',
+        type=Path,
+        metavar='QUEUE',
+        help="Write the results of a work queue to output.csv",
+        default=None
+    )
     
     return parser
 
@@ -89,7 +248,26 @@ class Parser:
             version=parsed.version,
             input_path=parsed.input,
             output_path=parsed.output,
-            verbose=parsed.verbose
+            verbose=parsed.verbose,
+            jobs=parsed.jobs,
+            ocr_procs=parsed.ocr_procs,
+            engine=parsed.engine,
+            line_batch=parsed.line_batch,
+            cascade=parsed.cascade,
+            words=parsed.words,
+            refine=parsed.refine,
+            fast_select=parsed.fast_select,
+            fast_deskew=parsed.fast_deskew,
+            tiled=parsed.tiled,
+            layouts=parsed.layouts,
+            in_memory=parsed.in_memory,
+            debug=parsed.debug,
+            stream=parsed.stream,
+            cache=parsed.cache,
+            ocr_memo=parsed.ocr_memo,
+            resume=parsed.resume,
+            worker=parsed.worker,
+            merge=parsed.merge
         )
 
     def _get_output_directory(self) -> Path:
@@ -181,6 +359,11 @@ class Parser:
         """Get the output directory path."""
         return self.args.output_path
 
+    @property
+    def jobs(self) -> int:
+        """Get the number of worker processes."""
+        return self.args.jobs
+
     @property
     def is_verbose(self) -> bool:
         """Check if verbose mode is enabled."""
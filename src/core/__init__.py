@@ -1,6 +1,13 @@
 # from .draw import Draw
 from .params import Params
+from .scan import Scan
 from .image import Image
 from .text import Text
-from .ocr import OCR
+from .engine import Engine, PytesseractEngine, TesserocrEngine
+from .ocr import OCR, LineBatcher, TesseractPool
+from .pdf import Rasterizer, PdftoppmRasterizer, PdfiumRasterizer
 from .io import IO
+from .cache import Cache
+from .layout import Layouts
+from .journal import Journal
+from .workqueue import WorkQueue, DirectoryQueue, SQLiteQueue
@@ -0,0 +1,133 @@
+"""
+Content-addressed cache of stage outputs.
+"""
+
+import hashlib
+import inspect
+import os
+import pickle
+import zlib
+from pathlib import Path
+from typing import Any, Optional
+import numpy as np
+import utils
+
+
+class Cache:
+    """On-disk store of stage outputs addressed by the hash of their inputs.
+
+    Entries are compressed pickles stored under `path`. Reading an entry
+    refreshes its modification time, and the least recently used entries
+    are removed once the store grows beyond `max_bytes`.
+    """
+
+    def __init__(self, path: Path, max_bytes: int):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._size: Optional[int] = None
+        self.logger = utils.Log().create_logger(self.__class__.__name__)
+
+    @staticmethod
+    def digest(*parts: Any) -> str:
+        """Hash arrays, bytes and any other value (through its repr)."""
+        h = hashlib.sha256()
+        for part in parts:
+            if isinstance(part, np.ndarray):
+                h.update(f"{part.shape}{part.dtype}".encode())
+                h.update(np.ascontiguousarray(part).data)
+            elif isinstance(part, bytes):
+                h.update(part)
+            else:
+                h.update(repr(part).encode())
+            h.update(b'\0')
+        return h.hexdigest()
+
+    @classmethod
+    def version(cls, *objects: Any) -> str:
+        """Hash the source code of the functions, classes or modules a stage runs."""
+        return cls.digest(*(inspect.getsource(obj) for obj in objects))[:16]
+
+    def _file(self, key: str) -> Path:
+        return self.path / key[:2] / f"{key}.pkl"
+
+    def __contains__(self, key: str) -> bool:
+        return self._file(key).exists()
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Return the value stored under key, or default."""
+        file = self._file(key)
+        try:
+            with open(file, 'rb') as f:
+                value = pickle.loads(zlib.decompress(f.read()))
+        except (OSError, EOFError, zlib.error, pickle.UnpicklingError):
+            self.misses += 1
+            return default
+
+        try:
+            # mark the entry as recently used
+            os.utime(file)
+        except OSError:
+            pass
+        self.hits += 1
+        return value
+
+    def put(self, key: str, value: Any) -> None:
+        """Store value under key and evict old entries if needed."""
+        file = self._file(key)
+        file.parent.mkdir(exist_ok=True)
+        data = zlib.compress(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), 1)
+
+        # write then rename so that concurrent readers never see a partial entry
+        tmp = file.with_suffix(f'.{os.getpid()}.tmp')
+        tmp.write_bytes(data)
+        os.replace(tmp, file)
+
+        if self._size is None:
+            self._size = self.size()
+        else:
+            self._size += len(data)
+        if self._size > self.max_bytes:
+            self.evict()
+
+    def _entries(self) -> list:
+        """(mtime, size, file) of every entry."""
+        entries = []
+        for file in self.path.glob('*/*.pkl'):
+            try:
+                stat = file.stat()
+            except OSError:
+                # removed by another process in the meantime
+                continue
+            entries.append((stat.st_mtime, stat.st_size, file))
+        return entries
+
+    def size(self) -> int:
+        """Total size of the entries in bytes."""
+        return sum(size for _, size, _ in self._entries())
+
+    def evict(self) -> int:
+        """Remove least recently used entries until the store fits max_bytes.
+
+        Returns:
+            int: Number of entries removed
+        """
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, file in sorted(entries, key=lambda entry: entry[0]):
+            if total <= self.max_bytes:
+                break
+            try:
+                file.unlink()
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+
+        self._size = total
+        if removed:
+            self.logger.debug(f"\t > cache: {removed} entries evicted")
+        return removed
@@ -0,0 +1,182 @@
+"""
+Text recognition engines behind core.OCR.
+"""
+
+import os
+import threading
+from pathlib import Path
+from typing import List, Tuple
+import numpy as np
+import pytesseract
+
+
+class Engine:
+    """Backend recognizing the text of an image with a given OCRConfig.
+
+    Engines are created once per process by get(), so a backend holding a
+    loaded language model keeps it for every image the process recognizes.
+    """
+
+    name = ''
+    _instances = {}
+
+    @classmethod
+    def get(cls, name: str) -> 'Engine':
+        """Engine of the current process for a backend name."""
+        key = (name, os.getpid())
+        if key not in cls._instances:
+            backends = {engine.name: engine for engine in cls.__subclasses__()}
+            if name not in backends:
+                raise ValueError(f"Unsupported OCR engine: {name}")
+            cls._instances[key] = backends[name]()
+        return cls._instances[key]
+
+    def version(self) -> str:
+        """Version of tesseract behind the engine."""
+        raise NotImplementedError
+
+    def recognize(self, image: np.ndarray, config) -> str:
+        """Text of an image."""
+        raise NotImplementedError
+
+    def words(self, image: np.ndarray, config) -> List[dict]:
+        """Words of an image in reading order.
+
+        Returns:
+            list[dict]: 'text', 'left', 'top', 'width', 'height', 'conf' and
+            'line' (identifier of the text line the word belongs to) of each word
+        """
+        raise NotImplementedError
+
+    def read(self, image: np.ndarray, config) -> Tuple[str, List[dict]]:
+        """Text and words of an image, from a single recognition."""
+        raise NotImplementedError
+
+
+class PytesseractEngine(Engine):
+    """Runs the tesseract binary for every image (the model is loaded each time)."""
+
+    name = 'pytesseract'
+
+    def __init__(self):
+        self._version = None
+
+    def version(self) -> str:
+        if self._version is None:
+            self._version = str(pytesseract.get_tesseract_version())
+        return self._version
+
+    def recognize(self, image: np.ndarray, config) -> str:
+        return pytesseract.image_to_string(image, config=config.to_string())
+
+    def words(self, image: np.ndarray, config) -> List[dict]:
+        data = pytesseract.image_to_data(
+            image, config=config.to_string(), output_type=pytesseract.Output.DICT)
+        return self._words(data)
+
+    def read(self, image: np.ndarray, config) -> Tuple[str, List[dict]]:
+        # one tesseract run writing both the text and the TSV outputs
+        with pytesseract.pytesseract.save(image) as (temp_name, input_filename):
+            pytesseract.pytesseract.run_tesseract(
+                input_filename, temp_name, 'txt tsv', None,
+                f'-c tessedit_create_tsv=1 {config.to_string()}')
+            text = Path(f'{temp_name}.txt').read_text(encoding='utf-8')
+            tsv = Path(f'{temp_name}.tsv').read_text(encoding='utf-8')
+        return text, self._words(pytesseract.pytesseract.file_to_dict(tsv, '\t', -1))
+
+    @staticmethod
+    def _words(data: dict) -> List[dict]:
+        """Words of the columns of a tesseract TSV output."""
+        return [
+            {
+                'text': data['text'][i],
+                'left': data['left'][i],
+                'top': data['top'][i],
+                'width': data['width'][i],
+                'height': data['height'][i],
+                'conf': float(data['conf'][i]),
+                'line': (data['block_num'][i], data['par_num'][i], data['line_num'][i]),
+            }
+            for i in range(len(data.get('text', [])))
+            if data['level'][i] == 5 and data['text'][i].strip()
+        ]
+
+
+class TesserocrEngine(Engine):
+    """Calls libtesseract in-process through tesserocr (optional dependency).
+
+    One API handle is kept per (lang, oem, psm, whitelist), so the language
+    model is loaded once per process instead of once per image.
+    """
+
+    name = 'tesserocr'
+
+    def __init__(self):
+        try:
+            import tesserocr
+        except ImportError as e:
+            raise ImportError(
+                "The tesserocr engine requires the tesserocr package (pip install tesserocr)"
+            ) from e
+        self.tesserocr = tesserocr
+        self._apis = {}
+        self._lock = threading.Lock()
+
+    def _api(self, config):
+        """API handle loaded for the language and modes of a config."""
+        key = (config.lang, config.oem, config.psm, config.whitelist)
+        if key not in self._apis:
+            api = self.tesserocr.PyTessBaseAPI(lang=config.lang, oem=config.oem, psm=config.psm)
+            api.SetVariable('tessedit_write_images', str(config.write_images).lower())
+            if config.whitelist:
+                api.SetVariable('tessedit_char_whitelist', config.whitelist)
+            self._apis[key] = api
+        return self._apis[key]
+
+    def version(self) -> str:
+        return self.tesserocr.tesseract_version()
+
+    def _set_image(self, api, image: np.ndarray, config) -> None:
+        image = np.ascontiguousarray(image)
+        height, width = image.shape[:2]
+        channels = 1 if image.ndim == 2 else image.shape[2]
+        api.SetImageBytes(image.tobytes(), width, height, channels, width * channels)
+        api.SetSourceResolution(config.dpi)
+
+    def recognize(self, image: np.ndarray, config) -> str:
+        # a handle recognizes one image at a time
+        with self._lock:
+            api = self._api(config)
+            self._set_image(api, image, config)
+            return api.GetUTF8Text()
+
+    def words(self, image: np.ndarray, config) -> List[dict]:
+        return self.read(image, config)[1]
+
+    def read(self, image: np.ndarray, config) -> Tuple[str, List[dict]]:
+        RIL = self.tesserocr.RIL
+        words = []
+        with self._lock:
+            api = self._api(config)
+            self._set_image(api, image, config)
+            api.Recognize()
+            text = api.GetUTF8Text()
+            iterator = api.GetIterator()
+            line = 0
+            for word in self.tesserocr.iterate_level(iterator, RIL.WORD):
+                word_text = word.GetUTF8Text(RIL.WORD)
+                if word.IsAtBeginningOf(RIL.TEXTLINE):
+                    line += 1
+                if not word_text or not word_text.strip():
+                    continue
+                left, top, right, bottom = word.BoundingBox(RIL.WORD)
+                words.append({
+                    'text': word_text,
+                    'left': left,
+                    'top': top,
+                    'width': right - left,
+                    'height': bottom - top,
+                    'conf': word.Confidence(RIL.WORD),
+                    'line': line,
+                })
+        return text, words
@@ -3,95 +3,161 @@ Main processing functions ImageProcessing and TextProcessing
 """
 import time
 import cv2
+import numpy as np
 import utils
+from core.scan import Scan
 
 class Image(object):
     """Image Class Processing
-    Input: .TXT containing path to source image 
-    Output: .TXT containing path to processed image 
+    Input: .TXT containing path to source image
+    Output: .TXT containing path to processed image
+
+    When `image` is given, stages work on that decoded array instead of
+    reading `src`, which is then only used to name outputs. Stages share
+    the decoded image and its derivatives through `scan`, which several
+    Image instances of the same page may be given. Debug artifacts are
+    written to `dst` only when `debug` is set.
     """
-    def __init__(self, src, dst, *args, **kwargs):
+    def __init__(self, src, dst, *args, image=None, scan=None, debug=True, **kwargs):
         self.src = src
         self.dst = dst
-        self.logger = utils.Log().create_logger(self.__class__.__name__)
-        self.year = utils.Metadata(self.src).get_year()
-        self.page = utils.Metadata(self.src).get_page()
+        self.scan = scan if scan is not None else Scan(src, image)
+        self.debug = debug
+        self.year = self.scan.metadata.get_year()
+        self.page = self.scan.metadata.get_page()
 
         self.logger = utils.Log().create_logger(self.__class__.__name__)
 
-    def selection(self, TRIGGER_ANALYZE):
-        '''Returns a list of images paths to process'''
+    def _load(self):
+        '''Returns the decoded image (grayscale when read from src), reading src only once'''
+        return self.scan.image
+
+    def _write(self, filename, img):
+        '''Writes an image to the destination directory'''
+        #opencv only accepts string as input
+        cv2.imwrite(str(self.dst / filename), img)
+
+    def select(self, TRIGGER_ANALYZE, level=0, band=(0.35, 1.2)):
+        '''Returns True if the page contains enough lines to be processed
+
+        With level > 0, lines are first counted on the page halved `level`
+        times. Fewer lines are found there than at full resolution, so the
+        page is decided from that count only when it is clearly off the
+        trigger: discarded below band[0] * TRIGGER_ANALYZE, kept from
+        band[1] * TRIGGER_ANALYZE on, counted again at full resolution in
+        between (band[0] <= 1 <= band[1]).
+        '''
 
         # initialization
-        img = cv2.imread(str(self.src))
-        # preprocessing
-        blur = utils.Remove().noise(img)
-        gray = utils.Color().to_gray(blur)
+        img = self._load()
+
+        lines = self._houghlines(level)
+        if level:
+            count = 0 if lines is None else len(lines)
+            if band[0] * TRIGGER_ANALYZE <= count < band[1] * TRIGGER_ANALYZE:
+                self.logger.debug(f"\t > {count} lines at level {level}, close to the trigger")
+                level = 0
+                lines = self._houghlines(level)
+
+        # analyze() returns a list of files to process
+        document = utils.Should().analyze(self.src, TRIGGER_ANALYZE, self.year, self.page, lines)
+
+        #draw HoughlinesP for debugging
+        if self.debug:
+            # lines are drawn in colour
+            cimg = cv2.cvtColor(img, cv2.COLOR_GRAY2BGR) if img.ndim == 2 else img.copy()
+            full = lines * (1 << level) if lines is not None else None
+            draw_houghline = utils.Draw(cimg).draw_lines(full)
+            self._write('houghlineP_{:s}-{:s}.png'.format(self.year, self.page), draw_houghline)
+
+        return document is not None
+
+    def _houghlines(self, level):
+        '''Returns the line segments found on a level of the page pyramid'''
+        scale = 1 / (1 << level)
+        # preprocessing (blur and grayscale are shared with preprocess())
+        gray = self.scan.pyramid(level)
 
         # detect lines with Canny thresholding method
         thresh = cv2.Canny(gray, 0, 255, apertureSize=3, L2gradient=True)
 
         # dilate and erode for better results at Houghlines transform stage
-        kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (8, 4))
+        size = (max(1, round(8 * scale)), max(1, round(4 * scale)))
+        kernel = cv2.getStructuringElement(cv2.MORPH_RECT, size)
         close = cv2.morphologyEx(thresh, cv2.MORPH_CLOSE, kernel, iterations=1)
 
         # houghlinesP to estimate the number of edges
-        lines = utils.Lines().houghlinesP(close)
+        return utils.Lines().houghlinesP(close, scale)
 
-        # analyze() returns a list of files to process
-        document = utils.Should().analyze(self.src, TRIGGER_ANALYZE, self.year, self.page, lines)
+    def selection(self, TRIGGER_ANALYZE, level=0, band=(0.35, 1.2)):
+        '''Returns a list of images paths to process'''
+        return self.src if self.select(TRIGGER_ANALYZE, level, band) else None
 
-        if document is not None:
-            output = self.src
-        else:
-            output = None
+    # Bytes held per pixel of a strip by the tiled cleaning chain (blurred,
+    # gray and binary source rows, rotated rows and line detection), measured
+    # with tracemalloc
+    TILE_BYTES_PER_PIXEL = 24
 
-        #draw HoughlinesP for debugging
-        cimg = img.copy()
-        draw_houghline = utils.Draw(cimg).draw_lines(lines)
+    def preprocess(self, deskew=None, budget=None, binarisation=None):
+        '''Returns the intermediate images of the cleaning chain.
 
-        #write
-        cv2.imwrite(
-            str(self.dst / 'houghlineP_{:s}-{:s}.png').format(self.year, self.page), draw_houghline
-        )
+        The blurred page is binarized by Otsu, unless `binarisation` gives
+        the 'method' and 'window' of a local binarisation (Binarise.local).
 
-        return output
+        The skew angle is estimated with minAreaRect and the page rotated
+        with cubic interpolation, unless `deskew` gives the 'max_angle',
+        'precision', 'stride' and 'min_angle' of the fast deskew: angle from
+        projection profiles, nearest-neighbour rotation of the binary page,
+        skipped below min_angle.
+
+        When `budget` (bytes) is given, the page is cleaned by strips
+        holding about that much memory besides the decoded and cleaned
+        pages, with the same result (see _preprocess_tiled), and only the
+        'preprocessed' image and the 'grid' are returned.
+
+        Returns:
+            dict: 'thresh', 'rotate', 'mask' and 'preprocessed' images, and
+            the 'grid' of the cells of the ruled tables found from the mask
+            (see utils.Grid.cells)
+        '''
+        if budget is not None:
+            return self._preprocess_tiled(deskew, budget, binarisation)
 
-    def clean(self):
-        '''Returns an image without any noise, skew angle, table lines, etc.'''
-       
         # start timer
         start_timer = time.time()
         # display start
         self.logger.info('\033[1m Preprocess {:s} \033[0m'.format(str(self.src)))
 
-        # load image
-        img = cv2.imread(str(self.src))
-
-        # Gaussian blur (5x5 kernel)
-        self.logger.debug("\t > remove noise")
-        blur = utils.Remove().noise(img)
-
-        # grayscale
-        self.logger.debug("\t > grayscale")
-        gray = utils.Color().to_gray(blur)
-
-        # otsu binarization
-        self.logger.debug("\t > binarize")
-        _, thresh = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+        # Gaussian blur (5x5 kernel), grayscale and otsu binarization,
+        # computed once per page
+        self.logger.debug("\t > remove noise, grayscale, binarize")
+        if binarisation is None:
+            thresh = self.scan.blur_binary
+        else:
+            thresh = utils.Binarise().local(self.scan.blur_gray, **binarisation)
 
         # estimate skewness angle
-        angle = utils.Transform().estimate_angle(thresh)
+        if deskew is None:
+            angle = utils.Transform().estimate_angle(thresh)
+            rotate_args = {}
+        else:
+            angle = utils.Transform().estimate_angle_profile(
+                thresh, deskew['max_angle'], deskew['precision'], deskew['stride'])
+            rotate_args = {'min_angle': deskew['min_angle'], 'interpolation': cv2.INTER_NEAREST}
         self.logger.debug("\t > skew angle = {:.2f} degree(s)".format(float(angle)))
 
         # rotate
-        rotate = utils.Transform().rotate(thresh, angle)
+        rotate = utils.Transform().rotate(thresh, angle, **rotate_args)
         self.logger.debug("\t > rotate document by {:.2f} degree(s)".format(float(angle)))
 
         # remove lines
         self.logger.debug("\t > find lines")
         mask = utils.Lines().find_lines(rotate)
 
+        # cells of the tables, between the lines
+        grid = utils.Grid(mask.shape)
+        grid.add(mask)
+
         # remove lines from the binarized image
         self.logger.debug("\t > remove lines")
         preprocessed = cv2.subtract(rotate, mask)
@@ -101,112 +167,340 @@ class Image(object):
         stop_timer = time.time() - start_timer
         self.logger.info('\t Terminated - Lines removed in {:d} seconds.\n'.format(int(stop_timer)))
 
-        # store output
-        # output = [
-        #     self.dst+"preprocessed_{:s}-{:s}.png".format(year, page),
-        #     year,
-        #     page
-        # ]
+        stages = {
+            'thresh': thresh,
+            'rotate': rotate,
+            'mask': mask,
+            'preprocessed': preprocessed,
+            'grid': grid.cells()
+        }
 
-        #opencv only accepts string as input
-        cv2.imwrite(
-            str(self.dst / "thresh_y{:s}-p{:s}.png").format(self.year, self.page),
-            thresh
-        )
-        cv2.imwrite(
-            str(self.dst / "rotate_y{:s}-p{:s}.png").format(self.year, self.page),
-            rotate
-        )
-        cv2.imwrite(
-            str(self.dst / "table_edges_y{:s}-p{:s}.png").format(self.year, self.page),
-            mask
-        )
-        cv2.imwrite(
-            str(self.dst / "preprocess_y{:s}-p{:s}.png").format(self.year, self.page),
-            preprocessed
-        )
+        if self.debug:
+            self._write_preprocess(stages)
+
+        return stages
+
+    def _preprocess_tiled(self, deskew, budget, binarisation=None):
+        '''Returns the preprocessed page, cleaned by horizontal strips.
+
+        Every step of the cleaning chain is computed on strips of rows as
+        wide as the page, so that no more than a strip of the blurred, gray,
+        binary and rotated pages is held at once:
+
+        - the Otsu threshold is found from the histogram of the strips,
+          or, with a local binarisation, the strips are binarized with the
+          rows of their windows (and Wolf's gray level and contrast range
+          of the page are found first)
+        - the skew angle from the convex hulls of the ink of the strips
+          (the minimum area rectangle of the page only depends on them), or
+          from the strips sampled every stride rows and columns
+        - each strip of the rotated page is warped from the rows of the
+          binary page it maps to, extended by the halo of the line
+          detection, whose rows are then dropped
+        - the grid from the profiles of the line masks of the strips
+
+        Strips are as high as `budget` allows, but not less than the halo.
+
+        Returns:
+            dict: 'preprocessed' image and 'grid'
+        '''
+        start_timer = time.time()
+        self.logger.info('\033[1m Preprocess {:s} by strips \033[0m'.format(str(self.src)))
+
+        img = self._load()
+        height, width = img.shape[:2]
+        transform = utils.Transform()
+        lines = utils.Lines()
+        halo = lines.halo()[1]
+        stride = deskew['stride'] if deskew is not None else 1
+        # strips start on rows sampled by the fast deskew
+        rows = max(halo, budget // (self.TILE_BYTES_PER_PIXEL * width)) // stride * stride
+
+        # Otsu threshold of the blurred grayscale page (or the darkest gray
+        # level and largest local deviation of the page, for Wolf's method)
+        binarise = utils.Binarise()
+        wolf = binarisation is not None and binarisation['method'] == 'wolf'
+        hist, max_std = np.zeros(256), 0.0
+        for y0 in range(0, height, rows):
+            y1 = min(height, y0 + rows)
+            if wolf:
+                top, bottom = self._window_rows(img, y0, y1, binarisation)
+                gray = self._blur_gray_rows(img, top, bottom)
+                std = binarise.local_stats(gray, binarisation['window'])[1]
+                max_std = max(max_std, float(std[y0 - top:y1 - top].max()))
+                gray = gray[y0 - top:y1 - top]
+            else:
+                gray = self._blur_gray_rows(img, y0, y1)
+            hist += cv2.calcHist([gray], [0], None, [256], [0, 256]).ravel()
+        if binarisation is None:
+            threshold = binarise.otsu_threshold(hist)
+        elif wolf:
+            threshold = dict(binarisation, min_gray=float(np.flatnonzero(hist)[0]), max_std=max_std)
+        else:
+            threshold = binarisation
+
+        # estimate skewness angle
+        hulls, samples = [], []
+        for y0 in range(0, height, rows):
+            thresh = self._blur_binary_rows(img, y0, min(height, y0 + rows), threshold)
+            if deskew is not None:
+                samples.append(thresh[::stride, ::stride].copy())
+                continue
+            points = cv2.findNonZero(thresh)
+            if points is not None:
+                hulls.append(cv2.convexHull(points) + np.array([0, y0], dtype=np.int32))
+        if deskew is None:
+            angle = transform.estimate_angle_points(np.concatenate(hulls) if hulls else None)
+            interpolation, rotated = cv2.INTER_CUBIC, True
+        else:
+            angle = transform.estimate_angle_profile(
+                np.concatenate(samples), deskew['max_angle'], deskew['precision'], stride,
+                shape=(height, width))
+            interpolation, rotated = cv2.INTER_NEAREST, abs(angle) >= deskew['min_angle']
+        self.logger.debug("\t > skew angle = {:.2f} degree(s)".format(float(angle)))
+
+        # rotate and remove lines strip by strip
+        if rotated:
+            matrix, (bound_w, bound_h) = transform.rotation((height, width), angle)
+            # maps the rotated page to the page
+            inverse = cv2.invertAffineTransform(matrix)
+        else:
+            bound_w, bound_h = width, height
+        preprocessed = np.empty((bound_h, bound_w), dtype=np.uint8)
+        grid = utils.Grid((bound_h, bound_w))
+
+        for y0 in range(0, bound_h, rows):
+            y1 = min(bound_h, y0 + rows)
+            top, bottom = max(0, y0 - halo), min(bound_h, y1 + halo)
+            if rotated:
+                # rows of the page the strip maps to, with room for the interpolation
+                corners = np.array([[0, top, 1], [bound_w - 1, top, 1],
+                                    [0, bottom - 1, 1], [bound_w - 1, bottom - 1, 1]])
+                ys = corners @ inverse[1]
+                start = max(0, int(np.floor(ys.min())) - 4)
+                stop = min(height, int(np.ceil(ys.max())) + 5)
+                strip = inverse.copy()
+                strip[0, 2] += inverse[0, 1] * top
+                strip[1, 2] += inverse[1, 1] * top - start
+                rotate = cv2.warpAffine(
+                    self._blur_binary_rows(img, start, stop, threshold), strip,
+                    (bound_w, bottom - top), flags=interpolation | cv2.WARP_INVERSE_MAP,
+                    borderMode=cv2.BORDER_REPLICATE
+                )
+            else:
+                rotate = self._blur_binary_rows(img, top, bottom, threshold)
+
+            mask = lines.find_lines(rotate)
+            grid.add(mask[y0 - top:y1 - top], y0)
+            preprocessed[y0:y1] = cv2.bitwise_not(cv2.subtract(rotate, mask))[y0 - top:y1 - top]
+
+        stop_timer = time.time() - start_timer
+        self.logger.info('\t Terminated - Lines removed in {:d} seconds.\n'.format(int(stop_timer)))
+
+        stages = {'preprocessed': preprocessed, 'grid': grid.cells()}
+        if self.debug:
+            self._write_preprocess(stages)
+
+        return stages
+
+    def _blur_gray_rows(self, img, y0, y1):
+        '''Returns rows y0 to y1 of the blurred grayscale page, as Scan.blur_gray'''
+        # rows within the reach of the 5x5 blur
+        top, bottom = max(0, y0 - 2), min(img.shape[0], y1 + 2)
+        blur = utils.Remove().noise(img[top:bottom])
+        return utils.Color().to_gray(blur[y0 - top:y1 - top])
+
+    def _blur_binary_rows(self, img, y0, y1, threshold):
+        '''Returns rows y0 to y1 of the binary page, as Scan.blur_binary
+        with the Otsu threshold of the page, or as preprocess() binarizes it
+        with the arguments of Binarise.local() given as threshold'''
+        if isinstance(threshold, dict):
+            top, bottom = self._window_rows(img, y0, y1, threshold)
+            gray = self._blur_gray_rows(img, top, bottom)
+            return utils.Binarise().local(gray, **threshold)[y0 - top:y1 - top]
+        gray = self._blur_gray_rows(img, y0, y1)
+        return cv2.threshold(gray, threshold, 255, cv2.THRESH_BINARY_INV)[1]
+
+    def _window_rows(self, img, y0, y1, binarisation):
+        '''Returns the rows within the windows of the local binarisation of rows y0 to y1'''
+        half = binarisation['window'] // 2
+        return max(0, y0 - half), min(img.shape[0], y1 + half)
+
+    def _write_preprocess(self, stages):
+        '''Writes the images of the cleaning chain (those a tiled run keeps)'''
+        names = {'thresh': "thresh", 'rotate': "rotate", 'mask': "table_edges", 'preprocessed': "preprocess"}
+        for stage, name in names.items():
+            if stage in stages:
+                self._write("{:s}_y{:s}-p{:s}.png".format(name, self.year, self.page), stages[stage])
+
+    def clean(self, deskew=None, budget=None, binarisation=None):
+        '''Returns an image without any noise, skew angle, table lines, etc.'''
+        stages = self.preprocess(deskew, budget, binarisation)
+        if not self.debug:
+            self._write("preprocess_y{:s}-p{:s}.png".format(self.year, self.page), stages['preprocessed'])
 
         #output format is Posix
         output = self.dst / "preprocess_y{:s}-p{:s}.png".format(self.year, self.page)
 
         return output
 
-    def block_segmentation(self):
+    def segment_blocks(self, engine='morphology', blocks=None):
         '''
-        Segments an image into blocks and returns paths to segmented images.
-        
+        Segments an image into blocks, with the morphology engine or the
+        profile engine (same blocks, found from the row ink profiles).
+
+        Args:
+            engine: Engine finding the blocks (see find_blocks())
+            blocks: Blocks as find_blocks() returns them, cropped without
+                being searched for (e.g. registered from a layout template)
+
         Returns:
-            list[str]: Paths to segmented block images
+            list[tuple]: (path, block image) for each block kept, path being
+            where block_segmentation() stores it
         '''
         start_timer = time.time()
         self.logger.info(f" \033[1mStarting - Blocks segmentation of {self.src} \033[0m")
 
-        img = cv2.imread(str(self.src))
+        img = self._load()
         if img is None:
             self.logger.error(f"Failed to load image: {self.src}")
             return []
 
-        # Preprocessing
-        gray = utils.Color().to_gray(img)
-        _, thresh = cv2.threshold(gray, 127, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
-        
+        if blocks is None:
+            blocks = self.find_blocks(engine)
+
+        output = []
+        for i, (x0, y0, x1, y1) in blocks:
+            block_img = img[y0:y1, x0:x1]
+            filename = f"block_y{self.year}-p{self.page}-b{i}.png"
+            output.append((self.dst / filename, block_img))
+            if self.debug:
+                self._write(filename, block_img)
+
+        stop_timer = time.time() - start_timer
+        self.logger.info(
+            f'\tTerminated - {len(output)} blocks segmented in {int(stop_timer)} seconds - {len(output)} considered.\n'
+        )
+
+        return output
+
+    def find_blocks(self, engine='morphology'):
+        '''
+        Finds the blocks of an image, with the morphology engine or the
+        profile engine.
+
+        Returns:
+            list[tuple]: (i, (x0, y0, x1, y1)) for each block kept, i being
+            its index and (x0, y0, x1, y1) the bounds of its crop
+        '''
+        thresh = self.scan.binary
+
         # Segment blocks
         self.logger.debug('\t > segment blocks')
-        segment = utils.Segment().segment_block(thresh)
-        contours, _ = cv2.findContours(segment, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-        
-        self.logger.info(f'\t > {len(contours)} blocks found.')
+        segment = None
+        if engine == 'profile':
+            blocks = utils.Segment().profile_block(thresh, 100000)
+        elif engine == 'morphology':
+            segment = utils.Segment().segment_block(thresh)
+            contours, _ = cv2.findContours(segment, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+            blocks = [(i, cv2.boundingRect(cnt), int(cv2.contourArea(cnt)))
+                      for i, cnt in enumerate(contours)]
+        else:
+            raise ValueError(f"Unsupported segmentation engine: {engine}")
+
+        self.logger.info(f'\t > {len(blocks)} blocks found.')
 
-        # Process contours
         output = []
-        count_blocks_kept = 0
-        
-        for i, cnt in enumerate(contours):
-            area = int(cv2.contourArea(cnt))
+        for i, box, area in blocks:
             if area < 100000:
                 continue
-                
+
             self.logger.info(f'\t\t > {i}-th block considered (area = {area})')
-            block_img = self._extract_block(img, cnt)
-            
-            if block_img is not None:
-                filename = f"block_y{self.year}-p{self.page}-b{i}.png"
-                cv2.imwrite(str(self.dst / filename), block_img)
-                output.append(str(self.dst / filename))
-                count_blocks_kept += 1
+            region = self._region(thresh, *box, margin_x=20, margin_y=20)
+            if region is not None:
+                output.append((i, region))
 
         # Write debug images
-        cv2.imwrite(str(self.dst / f"blocks_thresh_y{self.year}-p{self.page}.png"), thresh)
-        cv2.imwrite(str(self.dst / f"blocks_segmentation_y{self.year}-p{self.page}.png"), segment)
+        if self.debug:
+            self._write(f"blocks_thresh_y{self.year}-p{self.page}.png", thresh)
+            if segment is not None:
+                self._write(f"blocks_segmentation_y{self.year}-p{self.page}.png", segment)
 
-        stop_timer = time.time() - start_timer
-        self.logger.info(
-            f'\tTerminated - {len(output)} blocks segmented in {int(stop_timer)} seconds - {count_blocks_kept} considered.\n'
-        )
+        return output
+
+    def block_segmentation(self, engine='morphology'):
+        '''
+        Segments an image into blocks and returns paths to segmented images.
+
+        Returns:
+            list[str]: Paths to segmented block images
+        '''
+        output = []
+        for path, block_img in self.segment_blocks(engine):
+            if not self.debug:
+                self._write(path.name, block_img)
+            output.append(str(path))
 
         return output
 
-    def line_segmentation(self):
+    def segment_lines(self, lines=None):
         '''
-        Segments blocks into lines and returns paths to segmented images.
-        
+        Segments a block into lines and removes their artifacts.
+
+        Args:
+            lines: Lines as find_lines() returns them, cropped without being
+                searched for (e.g. registered from a layout template)
+
         Returns:
-            list[str]: Paths to segmented line images
+            list[tuple]: (path, line image) for each line kept, path being
+            where line_segmentation() stores it
         '''
-        nth_block = utils.Metadata(self.src).get_block()
+        nth_block = self.scan.metadata.get_block()
         start_timer = time.time()
-        
+
         self.logger.info(f" \033[1mStarting - Line segmentation in {self.src} \033[0m")
 
-        img = cv2.imread(str(self.src))
+        img = self._load()
         if img is None:
             self.logger.error(f"Failed to load image: {self.src}")
             return []
 
-        # Preprocessing
-        gray = utils.Color().to_gray(img)
-        _, thresh = cv2.threshold(gray, 127, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
-        
+        if lines is None:
+            lines = self.find_lines()
+
+        # artifacts of every line removed in one call on the block
+        cleaned = utils.Remove().artifacts_batch(
+            img, [(*region, height) for _, region, height in lines]
+        )
+
+        output = []
+        for (i, _, _), (mask_clean, line_clean) in zip(lines, cleaned):
+            filename = f"line_y{self.year}-p{self.page}-b{nth_block}-r{i}.png"
+            maskname = f"mask_y{self.year}-p{self.page}-b{nth_block}-r{i}.png"
+
+            if self.debug:
+                self._write(filename, line_clean)
+                self._write(maskname, mask_clean)
+            output.append((self.dst / filename, line_clean))
+
+        stop_timer = time.time() - start_timer
+        self.logger.info(
+            f'\t> Terminated - line segmentation for lines in block {nth_block} terminated in {int(stop_timer)} seconds.\n'
+        )
+
+        return output
+
+    def find_lines(self):
+        '''
+        Finds the lines of a block.
+
+        Returns:
+            list[tuple]: (i, (x0, y0, x1, y1), height) for each line kept, i
+            being its index, (x0, y0, x1, y1) the bounds of its crop and
+            height the one of its row
+        '''
+        thresh = self.scan.binary
+
         segment = utils.Segment().segment_line(thresh)
         contours, _ = cv2.findContours(segment, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
 
@@ -217,44 +511,90 @@ class Image(object):
                 continue
 
             self.logger.info(f'\t\t > {i}-th line considered (area = {area})')
-            line_img = self._extract_line(img, cnt)
-            
-            if line_img is not None:
-                mask_clean, line_clean = utils.Remove().artifacts(line_img['image'], line_img['height'])
-                
-                filename = f"line_y{self.year}-p{self.page}-b{nth_block}-r{i}.png"
-                maskname = f"mask_y{self.year}-p{self.page}-b{nth_block}-r{i}.png"
-                
-                cv2.imwrite(str(self.dst / filename), line_clean)
-                cv2.imwrite(str(self.dst / maskname), mask_clean)
-                output.append(str(self.dst / filename))
+            x, y, w, h = cv2.boundingRect(cnt)
+            region = self._region(thresh, x, y, w, h, margin_x=40, margin_y=20)
+            if region is not None:
+                output.append((i, region, h))
+
+        return output
+
+    def line_segmentation(self):
+        '''
+        Segments blocks into lines and returns paths to segmented images.
+
+        Returns:
+            list[str]: Paths to segmented line images
+        '''
+        output = []
+        for path, line_clean in self.segment_lines():
+            if not self.debug:
+                self._write(path.name, line_clean)
+            output.append(str(path))
+
+        return output
+
+    def segment_cells(self, grid):
+        '''
+        Crops the text rows of the cells of the ruled tables of a page.
+
+        Each band of the grid (see preprocess()) is split into text rows from
+        its ink profile, and the rows cut every cell of the band, so that a
+        row of a table is the same row in all its columns. Cells without ink
+        are left out.
+
+        Returns:
+            list[tuple]: (path, cell image) for each cell kept, the cell of
+            row r of the tables of the page and column c being named
+            cell_y{year}-p{page}-b{r}-r{c}.png
+        '''
+        start_timer = time.time()
+        self.logger.info(f" \033[1mStarting - Cells segmentation of {self.src} \033[0m")
+
+        img = self._load()
+        if img is None:
+            self.logger.error(f"Failed to load image: {self.src}")
+            return []
+
+        thresh = self.scan.binary
+        table = utils.Grid(thresh.shape)
+        bands = [grid[grid[:, 0] == band] for band in np.unique(grid[:, 0])]
+        profiles = [
+            np.count_nonzero(thresh[cells[0, 3]:cells[0, 5], cells[:, 2].min():cells[:, 4].max()], axis=1)
+            for cells in bands
+        ]
+        pitch = table.pitch(profiles)
+        self.logger.info(f'\t > {len(grid)} cells in {len(bands)} bands, rows of {pitch:.0f} pixels')
+
+        output = []
+        row = 0
+        for cells, profile in zip(bands, profiles):
+            for top, bottom in table.text_rows(profile, pitch):
+                for _, column, x0, y0, x1, y1 in cells:
+                    if not thresh[y0 + top:y0 + bottom, x0:x1].any():
+                        continue
+                    filename = f"cell_y{self.year}-p{self.page}-b{row}-r{column}.png"
+                    cell_img = img[y0 + top:y0 + bottom, x0:x1]
+                    output.append((self.dst / filename, cell_img))
+                    if self.debug:
+                        self._write(filename, cell_img)
+                row += 1
 
         stop_timer = time.time() - start_timer
         self.logger.info(
-            f'\t> Terminated - line segmentation for lines in block {nth_block} terminated in {int(stop_timer)} seconds.\n'
+            f'\tTerminated - {len(output)} cells in {row} rows segmented in {int(stop_timer)} seconds.\n'
         )
 
         return output
 
-    def _extract_block(self, img, contour, margin_x=20, margin_y=20):
-        '''Helper method to extract a block from an image with margins'''
-        x, y, w, h = cv2.boundingRect(contour)
-        return self._extract_region(img, x, y, w, h, margin_x, margin_y)
-
-    def _extract_line(self, img, contour, margin_x=40, margin_y=20):
-        '''Helper method to extract a line from an image with margins'''
-        x, y, w, h = cv2.boundingRect(contour)
-        image = self._extract_region(img, x, y, w, h, margin_x, margin_y)
-        return {'image': image, 'height': h} if image is not None else None
-
-    def _extract_region(self, img, x, y, w, h, margin_x, margin_y):
-        '''Helper method to extract a region from an image with margins and boundary checking'''
+    def _region(self, img, x, y, w, h, margin_x, margin_y):
+        '''Helper method returning the bounds (start_x, start_y, end_x, end_y) of a
+        region with margins within an image, or None if empty'''
         start_x = max(0, x - margin_x)
         start_y = max(0, y - margin_y)
         end_x = min(img.shape[1], x + w + margin_x)
         end_y = min(img.shape[0], y + h + margin_y)
-        
+
         if start_x >= end_x or start_y >= end_y:
             return None
-            
-        return img[start_y:end_y, start_x:end_x]
\ No newline at end of file
+
+        return start_x, start_y, end_x, end_y
@@ -10,7 +10,7 @@ Written by Florian Cochard
 from pathlib import Path
 from dataclasses import dataclass
 from typing import List
-from core import Params
+from core import Params, Rasterizer
 
 @dataclass
 class DirectoryPaths:
@@ -22,6 +22,10 @@ class DirectoryPaths:
     log: Path
     tessinput: Path
     tessinput_line: Path
+    cache: Path
+    ocr_memo: Path
+    cell: Path
+    layout: Path
 
 @dataclass
 class FilePaths:
@@ -33,6 +37,7 @@ class FilePaths:
     log: Path
     tessinput: Path
     tessinput_line: Path
+    journal: Path
 
 class IO:
     """Create and manage files and directories for the program."""
@@ -65,6 +70,11 @@ class IO:
         self.PATH_BLOCK_FILE = self.files.block
         self.PATH_LINE = self.dirs.line
         self.PATH_LINE_FILE = self.files.line
+        self.PATH_CELL = self.dirs.cell
+        self.PATH_LAYOUT = self.dirs.layout
+        self.PATH_CACHE = self.dirs.cache
+        self.PATH_OCR_MEMO = self.dirs.ocr_memo
+        self.PATH_JOURNAL_FILE = self.files.journal
         # The PATH_INPUT_FILES is now properly set by _setup_input_files()
 
     def _setup_paths(self):
@@ -80,7 +90,11 @@ class IO:
             line=self.path_output / 'line',
             log=self.path_output / 'log',
             tessinput=self.path_output / 'tessinput',
-            tessinput_line=self.path_output / 'tessinput/line'
+            tessinput_line=self.path_output / 'tessinput/line',
+            cache=self.path_output / 'cache',
+            ocr_memo=self.path_output / 'ocr_memo',
+            cell=self.path_output / 'cell',
+            layout=self.path_output / 'layout'
         )
 
         # Setup file paths
@@ -91,7 +105,8 @@ class IO:
             line=self.dirs.line / 'line.txt',
             log=self.dirs.log / 'log.txt',
             tessinput=self.dirs.tessinput / 'tessinput.txt',
-            tessinput_line=self.dirs.tessinput_line / 'line.txt'
+            tessinput_line=self.dirs.tessinput_line / 'line.txt',
+            journal=self.dirs.log / 'journal.sqlite'
         )
 
     def _create_directories(self):
@@ -112,13 +127,15 @@ class IO:
             for page in self.pages_formatted
         ]
 
+        # pages missing as PNG files are read from the PDF of their year
+        # (see core.Rasterizer), still named by their PNG
         self.input_file_paths = []
         for year in self.years_formatted:
             year_dir = self.path_input / year
             if year_dir.exists():
                 for input_file in self.input_files:
                     file_path = year_dir / input_file
-                    if file_path.exists():
+                    if file_path.exists() or Rasterizer.document(file_path) is not None:
                         self.input_file_paths.append(file_path)
 
         self.PATH_INPUT_FILES = self.input_file_paths if self.input_file_paths else []
@@ -0,0 +1,116 @@
+"""
+Progress journal of a run, to resume it after a crash.
+"""
+
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from typing import List, Optional
+
+
+class Journal:
+    """Durable record of the units (year, page, block, line) recognized so far.
+
+    Every result is committed to a SQLite file as soon as it is recorded, so
+    that a run killed at any point can be resumed without recognizing the
+    same lines again. A connection is opened lazily in each process using
+    the journal, which can therefore be handed to pool workers.
+    """
+
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS units ("
+        " src TEXT, year TEXT, page TEXT, block TEXT, line TEXT, text TEXT, words TEXT,"
+        " PRIMARY KEY (year, page, block, line))",
+        "CREATE TABLE IF NOT EXISTS pages (src TEXT PRIMARY KEY)",
+    )
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._conn = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_conn'] = None
+        state['_lock'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        """Connection of the current process."""
+        if self._conn is None or self._pid != os.getpid():
+            conn = sqlite3.connect(
+                str(self.path), timeout=60, isolation_level=None, check_same_thread=False
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            for statement in self.SCHEMA:
+                conn.execute(statement)
+            # journals written before words were recorded
+            columns = [column[1] for column in conn.execute("PRAGMA table_info(units)")]
+            if 'words' not in columns:
+                conn.execute("ALTER TABLE units ADD COLUMN words TEXT")
+            self._conn = conn
+            self._pid = os.getpid()
+        return self._conn
+
+    def _execute(self, sql: str, args: tuple = ()) -> list:
+        with self._lock:
+            return self.conn.execute(sql, args).fetchall()
+
+    def reset(self) -> None:
+        """Forget every recorded unit and page."""
+        self._execute("DELETE FROM units")
+        self._execute("DELETE FROM pages")
+
+    def record(self, src: str, row: dict) -> None:
+        """Record the result row of a unit."""
+        self._execute(
+            "INSERT OR REPLACE INTO units (src, year, page, block, line, text, words)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (str(src), row['year'], row['page'], row['block'], row.get('line', ''),
+             row['text'], row.get('words'))
+        )
+
+    def get(self, year: str, page: str, block: str, line: str = '', words: bool = True) -> Optional[dict]:
+        """Return the recorded row of a unit, or None. Its words are left out
+        unless `words` is set (a run resumed without them)."""
+        rows = self._execute(
+            "SELECT text, words FROM units WHERE year = ? AND page = ? AND block = ? AND line = ?",
+            (year, page, block, line)
+        )
+        if not rows:
+            return None
+        text, recorded = rows[0]
+        return self._row(text, year, page, block, line, recorded if words else None)
+
+    def complete_page(self, src: str) -> None:
+        """Mark every unit of a page as recorded."""
+        self._execute("INSERT OR IGNORE INTO pages VALUES (?)", (str(src),))
+
+    def is_complete(self, src: str) -> bool:
+        """Check whether every unit of a page is recorded."""
+        return bool(self._execute("SELECT 1 FROM pages WHERE src = ?", (str(src),)))
+
+    def rows(self, src: str, words: bool = True) -> List[dict]:
+        """Recorded rows of a page, in the order they were recognized (with
+        their words if `words` is set)."""
+        rows = self._execute(
+            "SELECT text, year, page, block, line, words FROM units WHERE src = ? ORDER BY rowid",
+            (str(src),)
+        )
+        return [self._row(*row) if words else self._row(*row[:-1]) for row in rows]
+
+    def _row(self, text: str, year: str, page: str, block: str, line: str,
+             words: Optional[str] = None) -> dict:
+        row = {'text': text, 'year': year, 'page': page, 'block': block}
+        if line:
+            row['line'] = line
+        if words is not None:
+            row['words'] = words
+        return row
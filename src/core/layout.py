@@ -0,0 +1,164 @@
+"""
+Index of the layouts of the pages, to reuse their segmentation.
+"""
+
+import math
+from pathlib import Path
+from typing import List, Optional, Tuple
+import numpy as np
+import utils
+from .cache import Cache
+
+
+class Layouts:
+    """Block and line boxes of segmented pages, by page number and layout.
+
+    The Year Book prints a given page number with the same tables year after
+    year. The boxes found on a page are stored as the template of its page
+    number and layout signature (the number of columns of each band of its
+    grid), along with its grid. A later page of the same number and signature
+    is registered to the template by fitting a rotation and a translation
+    between the corners of their cells, and the boxes of the template are
+    moved onto it. A page is segmented in full when no template matches, or
+    when the fit leaves more than max_residual pixels between the corners or
+    turns the page by more than max_angle degrees.
+
+    Templates are stored on disk, so that they are shared by the pool
+    workers and reused by later runs. The first page of a layout segmented
+    becomes its template and is never replaced.
+    """
+
+    def __init__(self, path: Path, max_bytes: int, max_residual: float, max_angle: float):
+        self.store = Cache(path, max_bytes)
+        self.max_residual = max_residual
+        self.max_angle = max_angle
+        # pages registered to a template, and pages segmented in full
+        self.hits = 0
+        self.misses = 0
+        self.logger = utils.Log().create_logger(self.__class__.__name__)
+
+    @staticmethod
+    def signature(grid: np.ndarray) -> Tuple[int, ...]:
+        """Number of columns of each band of a grid (see utils.Grid.cells())."""
+        return tuple(int(count) for count in np.unique(grid[:, 0], return_counts=True)[1])
+
+    def _key(self, page: str, grid: np.ndarray, parts: tuple) -> str:
+        return self.store.digest(page, self.signature(grid), *parts)
+
+    def get(self, page: str, grid: np.ndarray, shape: Tuple[int, int], parts: tuple = ()) -> Optional[list]:
+        """
+        Blocks of the template of a page, registered to it.
+
+        Args:
+            page: Page number
+            grid: Cells of the tables of the page
+            shape: (height, width) of the page
+            parts: Settings the boxes depend on (method, engine)
+
+        Returns:
+            Blocks as put() stores them, moved onto the page, or None when
+            the page has no grid, no template, or fits its template poorly
+        """
+        template = self.store.get(self._key(page, grid, parts)) if len(grid) else None
+        if template is None:
+            self.misses += 1
+            return None
+
+        rotation, translation, residual = self.fit(template['grid'], grid)
+        angle = math.degrees(math.atan2(rotation[1, 0], rotation[0, 0]))
+        if residual > self.max_residual or abs(angle) > self.max_angle:
+            self.logger.info(f'\t > page {page}: poor fit to its template '
+                             f'({residual:.1f} pixels, {angle:.2f} degrees)')
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return self.register(template['blocks'], rotation, translation, shape)
+
+    def put(self, page: str, grid: np.ndarray, blocks: list, parts: tuple = ()) -> None:
+        """
+        Store the blocks of a page as the template of its layout, unless
+        there is one already.
+
+        Args:
+            page: Page number
+            grid: Cells of the tables of the page
+            blocks: (i, (x0, y0, x1, y1), lines) of each block, lines being
+                the (j, (x0, y0, x1, y1), height) of its lines within the
+                block (see core.Image.find_lines()), or None
+            parts: Settings the boxes depend on (method, engine)
+        """
+        if not len(grid):
+            return
+        key = self._key(page, grid, parts)
+        if key not in self.store:
+            self.store.put(key, {'grid': grid, 'blocks': blocks})
+
+    @staticmethod
+    def fit(src: np.ndarray, dst: np.ndarray) -> Tuple[np.ndarray, np.ndarray, float]:
+        """
+        Rotation and translation moving the cells of a grid onto the cells
+        of another grid of the same signature, by least squares on their
+        top left and bottom right corners.
+
+        Returns:
+            Tuple containing:
+                - 2x2 rotation matrix
+                - Translation (dx, dy)
+                - Root mean square distance between the moved and the
+                  target corners, in pixels
+        """
+        a = src[:, 2:6].reshape(-1, 2).astype(np.float64)
+        b = dst[:, 2:6].reshape(-1, 2).astype(np.float64)
+        center_a, center_b = a.mean(axis=0), b.mean(axis=0)
+        a0, b0 = a - center_a, b - center_b
+
+        theta = math.atan2(np.sum(a0[:, 0] * b0[:, 1] - a0[:, 1] * b0[:, 0]),
+                           np.sum(a0[:, 0] * b0[:, 0] + a0[:, 1] * b0[:, 1]))
+        rotation = np.array([[math.cos(theta), -math.sin(theta)],
+                             [math.sin(theta), math.cos(theta)]])
+        translation = center_b - rotation @ center_a
+        residual = float(np.sqrt(np.mean(np.sum((a @ rotation.T + translation - b) ** 2, axis=1))))
+        return rotation, translation, residual
+
+    @staticmethod
+    def _shift(rotation: np.ndarray, translation: np.ndarray, x: float, y: float) -> Tuple[int, int]:
+        """Shift of the point (x, y) by the fit, rounded to pixels."""
+        dx, dy = rotation @ (x, y) + translation - (x, y)
+        return int(round(dx)), int(round(dy))
+
+    def register(self, blocks: list, rotation: np.ndarray, translation: np.ndarray,
+                 shape: Tuple[int, int]) -> List[tuple]:
+        """
+        Move the blocks of a template onto a page.
+
+        Every block and line is shifted by the fit at its center: their
+        boxes stay upright, the angles fit being small. Boxes are clipped to
+        the page, and to their block, and left out when empty.
+
+        Returns:
+            Blocks as put() stores them
+        """
+        height, width = shape[:2]
+        output = []
+        for i, (x0, y0, x1, y1), lines in blocks:
+            dx, dy = self._shift(rotation, translation, (x0 + x1) / 2, (y0 + y1) / 2)
+            bx0, by0 = max(0, x0 + dx), max(0, y0 + dy)
+            bx1, by1 = min(width, x1 + dx), min(height, y1 + dy)
+            if bx0 >= bx1 or by0 >= by1:
+                continue
+
+            moved = None
+            if lines is not None:
+                moved = []
+                for j, (lx0, ly0, lx1, ly1), line_height in lines:
+                    # shift of the line on the page, minus the origin of its block
+                    ldx, ldy = self._shift(rotation, translation, x0 + (lx0 + lx1) / 2, y0 + (ly0 + ly1) / 2)
+                    ox, oy = x0 + ldx - bx0, y0 + ldy - by0
+                    region = (max(0, lx0 + ox), max(0, ly0 + oy),
+                              min(bx1 - bx0, lx1 + ox), min(by1 - by0, ly1 + oy))
+                    if region[0] < region[2] and region[1] < region[3]:
+                        moved.append((j, region, line_height))
+
+            output.append((i, (bx0, by0, bx1, by1), moved))
+        return output
@@ -2,12 +2,18 @@
 OCR module for text recognition from processed images.
 """
 
+import asyncio
+import shlex
 import cv2
+import numpy as np
 import pytesseract
+from collections import Counter
 from dataclasses import dataclass
-from typing import Optional
+from typing import Callable, List, Optional, Sequence, Union
 import utils
 from core import Params
+from core.cache import Cache
+from core.engine import Engine
 
 @dataclass
 class OCRConfig:
@@ -17,29 +23,55 @@ class OCRConfig:
     dpi: int = 300
     lang: str = 'eng'
     write_images: bool = True
+    # characters recognized (all when empty)
+    whitelist: str = ''
 
     def to_string(self) -> str:
         """Convert config to tesseract command string."""
-        return (f'-l {self.lang} --oem {self.oem} --psm {self.psm} '
-                f'--dpi {self.dpi} -c tessedit_write_images={str(self.write_images).lower()}')
+        config = (f'-l {self.lang} --oem {self.oem} --psm {self.psm} '
+                  f'--dpi {self.dpi} -c tessedit_write_images={str(self.write_images).lower()}')
+        if self.whitelist:
+            config += f' -c tessedit_char_whitelist={self.whitelist}'
+        return config
+
+    def to_args(self) -> List[str]:
+        """Convert config to tesseract command arguments."""
+        return shlex.split(self.to_string())
 
 class OCR:
-    """Text recognition from processed images to raw string."""
+    """Text recognition from processed images to raw string.
+
+    When `image` is given, it is recognized instead of reading `src`,
+    which is then only used for metadata. `engine` names the backend
+    running the recognition (Params.OCR_ENGINE by default). With a `memo`
+    store, an image already recognized with the same config and tesseract
+    version is not recognized again. With `cascade`, lines are read by the
+    retry cascade of line_cascade(), and the number of lines read at each
+    tier is added to `tiers`. With `refine`, the doubtful words found by
+    line_to_data() and block_to_data() are read again by refine_words().
+    """
 
-    def __init__(self, src: str):
+    def __init__(self, src: str, image=None, engine: Optional[str] = None,
+                 memo: Optional[Cache] = None, cascade: bool = False,
+                 tiers: Optional[Counter] = None, refine: bool = False):
         self.src = src
+        self.image = image
+        self.memo = memo
+        self.cascade = cascade
+        self.tiers = tiers
+        self.refine = refine
         self._setup_metadata()
         self._setup_configs()
+        self.engine = engine or Params().OCR_ENGINE
         self.logger = utils.Log().create_logger(self.__class__.__name__)
 
     def _setup_metadata(self):
         """Initialize metadata from source file."""
-        metadata = utils.Metadata(self.src)
+        metadata = utils.Metadata(self.src, must_exist=self.image is None)
         self.year = metadata.get_year()
         self.page = metadata.get_page()
         self.nth_block = metadata.get_block()
         self.nth_line = metadata.get_line()
-        self.height = metadata.get_image_height()
 
     def _setup_configs(self):
         """Initialize OCR configurations."""
@@ -47,9 +79,23 @@ class OCR:
         self.configs = {
             'block': OCRConfig(params.OEM_BLOCK_TO_STRING, params.PSM_BLOCK_TO_STRING),
             'line': OCRConfig(params.OEM_LINE_TO_STRING, params.PSM_LINE_TO_STRING),
-            'line_alt': OCRConfig(params.OEM_LINE_TO_STRING_ALT, params.PSM_LINE_TO_STRING_ALT)
+            'line_alt': OCRConfig(params.OEM_LINE_TO_STRING_ALT, params.PSM_LINE_TO_STRING_ALT),
+            'cell': OCRConfig(params.OEM_CELL_TO_STRING, params.PSM_CELL_TO_STRING,
+                              whitelist=params.CELL_WHITELIST)
         }
 
+    def _load(self):
+        """Return the decoded image (grayscale), reading src only once."""
+        if self.image is None:
+            self.image = cv2.imread(str(self.src), cv2.IMREAD_GRAYSCALE)
+        return self.image
+
+    @property
+    def height(self) -> int:
+        """Height of the image (0 if it cannot be read)."""
+        img = self._load()
+        return img.shape[0] if img is not None else 0
+
     def _preprocess_image(self, img) -> tuple:
         """Preprocess image for OCR."""
         self.logger.debug("\t > grayscale")
@@ -63,21 +109,53 @@ class OCR:
 
     def _perform_ocr(self, image, config: OCRConfig) -> str:
         """Perform OCR with given configuration."""
-        self.logger.debug("\t > text recognition (wait)")
-        return pytesseract.image_to_string(image, config=config.to_string())
+        return self._memoized(
+            image, config, '', lambda: Engine.get(self.engine).recognize(image, config))
+
+    def _perform_read(self, image, config: OCRConfig) -> tuple:
+        """Perform OCR with given configuration, returning (text, words)."""
+        return self._memoized(
+            image, config, 'read', lambda: Engine.get(self.engine).read(image, config))
+
+    def _memoized(self, image, config: OCRConfig, variant: str, recognize: Callable):
+        """Output of recognize, taken from the memo store when possible."""
+        if self.memo is None:
+            self.logger.debug("\t > text recognition (wait)")
+            return recognize()
+
+        key = self.memo_key(image, config, self.engine, variant)
+        output = self.memo.get(key)
+        if output is None:
+            self.logger.debug("\t > text recognition (wait)")
+            output = recognize()
+            self.memo.put(key, output)
+        else:
+            self.logger.debug("\t > text recognition (memoized)")
+        return output
+
+    @staticmethod
+    def memo_key(image, config: OCRConfig, engine: str, variant: str = '') -> str:
+        """Key of the output of a binarized image in the memo store.
+
+        `variant` tells apart the outputs of the same recognition (plain
+        text, text with words, text of stacked lines).
+        """
+        return Cache.digest(
+            image, config.to_string(), engine, Engine.get(engine).version(), variant)
+
+    def block_request(self) -> Optional[tuple]:
+        """Prepare the recognition of a block image.
 
-    def block_to_string(self) -> Optional[str]:
-        """Extract text from a block image.
-        
         Returns:
-            str: Extracted text or None if processing fails
+            tuple: (binarized image, OCRConfig) to recognize, or None if
+            the image cannot be loaded
         """
         self.logger.info(
             f"\033[1m Starting - Block segmentation and recognition "
             f"of year {self.year} page {self.page}. \033[0m"
         )
 
-        img = cv2.imread(str(self.src))
+        img = self._load()
         if img is None:
             self.logger.error(f"Failed to load image: {self.src}")
             return None
@@ -85,27 +163,56 @@ class OCR:
         self.logger.info(f'\N{wrench} Analyzing block {self.nth_block}')
         
         _, thresh = self._preprocess_image(img)
-        output = self._perform_ocr(thresh, self.configs['block'])
+        return thresh, self.configs['block']
+
+    def block_to_string(self) -> Optional[str]:
+        """Extract text from a block image.
+        
+        Returns:
+            str: Extracted text or None if processing fails
+        """
+        request = self.block_request()
+        if request is None:
+            return None
+        output = self._perform_ocr(*request)
 
         self.logger.debug("\t > text extracted:")
         print(output, '\n')
 
         return output
 
-    def line_to_string(self) -> Optional[str]:
-        """Extract text from a line image.
-        
+    def block_to_data(self) -> Optional[dict]:
+        """Extract text and words from a block image.
+
         Returns:
-            str: Extracted text or None if processing fails
+            dict: 'text' and 'words' (see Engine.words), or None if
+            processing fails
         """
-        H_LIM_RECOGNITION = 60
+        request = self.block_request()
+        if request is None:
+            return None
+        text, words = self._perform_read(*request)
+        if self.refine:
+            text, words = self.refine_words(request[0], text, words)
+
+        self.logger.debug("\t > text extracted:")
+        print(text, '\n')
+
+        return {'text': text, 'words': words}
 
+    def line_request(self) -> Optional[tuple]:
+        """Prepare the recognition of a line image.
+
+        Returns:
+            tuple: (binarized image, OCRConfig) to recognize, or None if
+            the image cannot be loaded
+        """
         self.logger.info(
             f"\033[1m Starting - Line segmentation and recognition "
             f"of year {self.year} page {self.page}. \033[0m"
         )
 
-        img = cv2.imread(str(self.src))
+        img = self._load()
         if img is None:
             self.logger.error(f"Failed to load image: {self.src}")
             return None
@@ -115,11 +222,14 @@ class OCR:
         )
 
         _, thresh = self._preprocess_image(img)
-        
-        if self.height <= H_LIM_RECOGNITION:
-            output = self._perform_ocr(thresh, self.configs['line'])
-        else:
-            output = self._perform_ocr(thresh, self.configs['line_alt'])
+        return thresh, self.configs['line' if self.is_short_line() else 'line_alt']
+
+    def line_result(self, output: Optional[str]) -> Optional[str]:
+        """Format the text recognized in a line image."""
+        if output is None:
+            return None
+
+        if not self.is_short_line():
             output = "[NEW]".join(output.split('\n'))
             self.logger.info(
                 f"> ℹ info: h > HLIM: p{self.page} b{self.nth_block} "
@@ -130,3 +240,377 @@ class OCR:
         print(output, '\n')
 
         return output
+
+    def is_short_line(self) -> bool:
+        """Lines taller than H_LIM_RECOGNITION are read with the LSTM engine."""
+        H_LIM_RECOGNITION = 60
+        return self.height <= H_LIM_RECOGNITION
+
+    def line_to_string(self) -> Optional[str]:
+        """Extract text from a line image.
+        
+        Returns:
+            str: Extracted text or None if processing fails
+        """
+        request = self.line_request()
+        if request is None:
+            return None
+        if self.cascade:
+            return self.line_result(self.line_cascade(request[0])[0])
+        return self.line_result(self._perform_ocr(*request))
+
+    def line_to_data(self) -> Optional[dict]:
+        """Extract text and words from a line image.
+
+        Returns:
+            dict: 'text' and 'words' (see Engine.words), or None if
+            processing fails
+        """
+        request = self.line_request()
+        if request is None:
+            return None
+        if self.cascade:
+            text, words = self.line_cascade(request[0])
+        else:
+            text, words = self._perform_read(*request)
+        if self.refine:
+            text, words = self.refine_words(request[0], text, words)
+        return {'text': self.line_result(text), 'words': words}
+
+    def cell_request(self) -> Optional[tuple]:
+        """Prepare the recognition of a table cell image.
+
+        Returns:
+            tuple: (binarized image, OCRConfig) to recognize, or None if
+            the image cannot be loaded
+        """
+        img = self._load()
+        if img is None:
+            self.logger.error(f"Failed to load image: {self.src}")
+            return None
+
+        self.logger.info(f'\N{wrench} Analyzing cell {self.nth_line} of row {self.nth_block}')
+
+        _, thresh = self._preprocess_image(img)
+        # cells are cropped within their rulings: room around the digits
+        thresh = cv2.copyMakeBorder(thresh, 10, 10, 10, 10, cv2.BORDER_CONSTANT, value=0)
+        return thresh, self.configs['cell']
+
+    def cell_to_string(self) -> Optional[str]:
+        """Extract the number of a table cell image.
+
+        Returns:
+            str: Extracted text without surrounding blanks, or None if
+            processing fails
+        """
+        request = self.cell_request()
+        if request is None:
+            return None
+        return self._perform_ocr(*request).strip()
+
+    def line_cascade(self, image) -> tuple:
+        """Text of a binarized line, read with the cheap legacy config first
+        (tall lines with their LSTM config, as outside the cascade).
+
+        The line is read again while Should.recognize_again finds its text
+        doubtful or the mean confidence of its words is below
+        Params.RETRY_MIN_CONFIDENCE, with the (oem, psm) suggested by
+        recognize_again, or the LSTM config of tall lines otherwise. A line
+        is read at most Params.RETRY_MAX more times, never twice with the
+        same config, and the last reading is kept.
+
+        Returns:
+            tuple: (text, words) of the last reading
+        """
+        params = Params()
+        should = utils.Should()
+        config = self.configs['line' if self.is_short_line() else 'line_alt']
+        tried = []
+
+        while True:
+            text, words = self._perform_read(image, config)
+            tried.append((config.oem, config.psm))
+
+            again, oem, psm = should.recognize_again(text.strip())
+            confidence = sum(word['conf'] for word in words) / len(words) if words else 0
+            if (not again and confidence >= params.RETRY_MIN_CONFIDENCE) \
+                    or len(tried) > params.RETRY_MAX:
+                break
+
+            if not again or (oem, psm) in tried:
+                oem, psm = self.configs['line_alt'].oem, self.configs['line_alt'].psm
+            if (oem, psm) in tried:
+                break
+            self.logger.debug(
+                f"\t > read again with oem {oem} psm {psm} (confidence {confidence:.0f})")
+            config = OCRConfig(oem, psm)
+
+        if self.tiers is not None:
+            self.tiers[len(tried) - 1] += 1
+        return text, words
+
+    def refine_words(self, image, text: str, words: List[dict]) -> tuple:
+        """Read again the words of a binarized image whose confidence is
+        below Params.REFINE_MIN_CONFIDENCE.
+
+        Each doubtful word is cropped from its box, scaled up by
+        Params.REFINE_SCALE and read on its own with the LSTM engine in
+        single word mode. The new reading replaces the word, in the words
+        and in the text, only if it is more confident.
+
+        Returns:
+            tuple: (text, words) with the refined words marked 'refined'
+        """
+        params = Params()
+        config = OCRConfig(self.configs['line_alt'].oem, 8)
+        MARGIN = 4
+
+        refined = []
+        cursor = 0
+        for word in words:
+            position = text.find(word['text'], cursor)
+            if word['conf'] >= params.REFINE_MIN_CONFIDENCE:
+                cursor = position + len(word['text']) if position >= 0 else cursor
+                refined.append(word)
+                continue
+
+            top, left = max(0, word['top'] - MARGIN), max(0, word['left'] - MARGIN)
+            crop = image[top:word['top'] + word['height'] + MARGIN,
+                         left:word['left'] + word['width'] + MARGIN]
+            # nearest neighbour keeps the crop binary
+            crop = cv2.resize(crop, None, fx=params.REFINE_SCALE, fy=params.REFINE_SCALE,
+                              interpolation=cv2.INTER_NEAREST)
+            crop = cv2.copyMakeBorder(crop, 10, 10, 10, 10, cv2.BORDER_CONSTANT, value=0)
+            _, candidates = self._perform_read(crop, config)
+
+            if candidates:
+                reading = ' '.join(candidate['text'] for candidate in candidates)
+                conf = sum(candidate['conf'] for candidate in candidates) / len(candidates)
+                if conf > word['conf']:
+                    self.logger.debug(f"\t > word '{word['text']}' read again as '{reading}'")
+                    if position >= 0:
+                        text = text[:position] + reading + text[position + len(word['text']):]
+                    word = {**word, 'text': reading, 'conf': conf, 'refined': True}
+
+            if position >= 0:
+                cursor = position + len(word['text'])
+            refined.append(word)
+
+        return text, refined
+
+
+class LineBatcher:
+    """Recognizes short lines `batch_size` at a time.
+
+    The binarized lines are stacked vertically, `gap` pixels apart, and read
+    in a single recognition returning word boxes. Each word goes back to the
+    line whose rows its box covers. A line is read on its own instead when
+    the mapping is ambiguous: a word box crossing several lines or lying in
+    a gap, or a text line of the engine spanning several lines. Tall lines,
+    read with the LSTM engine, are always read on their own.
+
+    The text of a batched line is its words joined by single spaces, or by
+    as many spaces as characters fit in the gap between them when it is
+    wider than a character, as in the text of a line read on its own,
+    whose columns are told apart by gaps of two spaces or more.
+    """
+
+    # mode of the memoized texts of batched lines (older texts, joined by
+    # single spaces, are not reused)
+    MEMO_MODE = 'batched-gaps'
+
+    def __init__(self, batch_size: int, gap: int = 40, engine: Optional[str] = None,
+                 memo: Optional[Cache] = None):
+        self.batch_size = max(1, int(batch_size))
+        self.gap = gap
+        self.engine = engine or Params().OCR_ENGINE
+        self.memo = memo
+        self.batched = 0
+        self.fallbacks = 0
+        self.logger = utils.Log().create_logger(self.__class__.__name__)
+
+    def recognize(self, ocrs: List[OCR]) -> List[Optional[str]]:
+        """Text of the line image of every OCR, in order."""
+        outputs = [None] * len(ocrs)
+        requests = [ocr.line_request() for ocr in ocrs]
+
+        batch = []
+        for i, (ocr, request) in enumerate(zip(ocrs, requests)):
+            if request is None:
+                continue
+            if not ocr.is_short_line():
+                outputs[i] = ocr._perform_ocr(*request)
+                continue
+            if self.memo is not None:
+                outputs[i] = self.memo.get(OCR.memo_key(*request, self.engine, self.MEMO_MODE))
+                if outputs[i] is not None:
+                    continue
+            batch.append(i)
+            if len(batch) == self.batch_size:
+                self._recognize_batch(ocrs, batch, requests, outputs)
+                batch = []
+        if batch:
+            self._recognize_batch(ocrs, batch, requests, outputs)
+
+        return [ocr.line_result(output) for ocr, output in zip(ocrs, outputs)]
+
+    def _recognize_batch(self, ocrs: List[OCR], batch: List[int], requests: List[tuple],
+                         outputs: List[Optional[str]]) -> None:
+        """Fill outputs with the text of the lines of a batch."""
+        config = requests[batch[0]][1]
+        images = [requests[i][0] for i in batch]
+        if len(batch) == 1:
+            outputs[batch[0]] = ocrs[batch[0]]._perform_ocr(images[0], config)
+            return
+
+        stacked, spans = self.stack(images, self.gap)
+        lines, ambiguous = self.assign(Engine.get(self.engine).words(stacked, config), spans)
+
+        for n, i in enumerate(batch):
+            if n in ambiguous:
+                outputs[i] = ocrs[i]._perform_ocr(images[n], config)
+                continue
+            outputs[i] = self.join(lines[n])
+            if self.memo is not None:
+                self.memo.put(OCR.memo_key(images[n], config, self.engine, self.MEMO_MODE), outputs[i])
+        self.batched += len(batch) - len(ambiguous)
+        self.fallbacks += len(ambiguous)
+        if ambiguous:
+            self.logger.debug(f"\t > {len(ambiguous)} of {len(batch)} lines read on their own")
+
+    @staticmethod
+    def stack(images: List[np.ndarray], gap: int) -> tuple:
+        """Stack images vertically on a background of zeros.
+
+        Returns:
+            tuple: (stacked image, [(top, bottom)] rows of each image)
+        """
+        width = max(image.shape[1] for image in images)
+        height = gap + sum(image.shape[0] + gap for image in images)
+        stacked = np.zeros((height, width) + images[0].shape[2:], dtype=images[0].dtype)
+
+        spans = []
+        top = gap
+        for image in images:
+            bottom = top + image.shape[0]
+            stacked[top:bottom, :image.shape[1]] = image
+            spans.append((top, bottom))
+            top = bottom + gap
+        return stacked, spans
+
+    @staticmethod
+    def assign(words: List[dict], spans: List[tuple]) -> tuple:
+        """Map words to the spans of rows they lie in.
+
+        Returns:
+            tuple: (words of each span, set of spans with an ambiguous mapping)
+        """
+        lines = [[] for _ in spans]
+        ambiguous = set()
+        spans_of_line = {}
+
+        for word in words:
+            top, bottom = word['top'], word['top'] + word['height']
+            hits = [n for n, (y0, y1) in enumerate(spans) if top < y1 and y0 < bottom]
+            if len(hits) != 1:
+                if not hits:
+                    # in a gap: it may belong to the line above or below
+                    above = [n for n, (_, y1) in enumerate(spans) if y1 <= top]
+                    below = [n for n, (y0, _) in enumerate(spans) if y0 >= bottom]
+                    hits = above[-1:] + below[:1]
+                ambiguous.update(hits)
+                continue
+            lines[hits[0]].append(word)
+            spans_of_line.setdefault(word['line'], set()).add(hits[0])
+
+        for hits in spans_of_line.values():
+            if len(hits) > 1:
+                ambiguous.update(hits)
+
+        return lines, ambiguous
+
+    @staticmethod
+    def join(words: List[dict]) -> str:
+        """Text of the words of a line, with the gaps wider than a character
+        (the median width of a character of the words) kept as spaces."""
+        words = sorted(words, key=lambda word: word['left'])
+        if not words:
+            return ''
+        char = float(np.median([word['width'] / max(1, len(word['text'])) for word in words]))
+        text = words[0]['text']
+        for previous, word in zip(words, words[1:]):
+            gap = word['left'] - (previous['left'] + previous['width'])
+            text += ' ' * (max(2, round(gap / char)) if char and gap > char else 1) + word['text']
+        return text
+
+
+class TesseractPool:
+    """Runs up to `size` tesseract processes at once from asyncio.
+
+    Images are piped to tesseract through stdin and the text is read from
+    its stdout, so no temporary file is written. A call taking more than
+    `timeout` seconds is killed and returns None, as does a failed call.
+    """
+
+    def __init__(self, size: int, timeout: float = 60, cmd: Optional[str] = None):
+        self.size = max(1, int(size))
+        self.timeout = timeout
+        self.cmd = cmd or pytesseract.pytesseract.tesseract_cmd
+        self._loop = None
+        self._semaphore = None
+        self.logger = utils.Log().create_logger(self.__class__.__name__)
+
+    def _slots(self) -> asyncio.Semaphore:
+        """Semaphore bounding the processes of the running event loop."""
+        # a semaphore is bound to the loop it was first used in, and every
+        # asyncio.run() call starts a new loop
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._semaphore = asyncio.Semaphore(self.size)
+        return self._semaphore
+
+    async def recognize(self, image, config: OCRConfig) -> Optional[str]:
+        """Text of a single image, or None if tesseract failed or timed out."""
+        # PNM is uncompressed: cheaper to encode than the PNG pytesseract writes
+        ok, data = cv2.imencode('.pnm', image)
+        if not ok:
+            self.logger.error("Failed to encode image for tesseract")
+            return None
+
+        async with self._slots():
+            process = await asyncio.create_subprocess_exec(
+                self.cmd, 'stdin', 'stdout', *config.to_args(),
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE
+            )
+            try:
+                stdout, stderr = await asyncio.wait_for(
+                    process.communicate(data.tobytes()), self.timeout)
+            except asyncio.TimeoutError:
+                process.kill()
+                await process.wait()
+                self.logger.error(f"tesseract timed out after {self.timeout} seconds")
+                return None
+
+        if process.returncode != 0:
+            self.logger.error(f"tesseract failed: {stderr.decode(errors='replace').strip()}")
+            return None
+        return stdout.decode('utf-8')
+
+    async def recognize_many(self, images: Sequence,
+                             config: Union[OCRConfig, Sequence[OCRConfig]]) -> List[Optional[str]]:
+        """Text of every image, in order.
+
+        Args:
+            images: Images to recognize
+            config: Config of every image, or one config per image
+
+        Returns:
+            list: Text of each image, None where recognition failed
+        """
+        configs = [config] * len(images) if isinstance(config, OCRConfig) else list(config)
+        return await asyncio.gather(*(
+            self.recognize(image, conf) for image, conf in zip(images, configs)
+        ))
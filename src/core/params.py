@@ -8,7 +8,7 @@ Written by Florian Cochard
 """
 
 from dataclasses import dataclass
-from typing import List, Literal
+from typing import List, Literal, Tuple
 
 @dataclass(frozen=True)
 class TesseractConfig:
@@ -23,12 +23,108 @@ class TesseractConfig:
     PSM_LINE: int = 6   # Assume uniform block of text
     PSM_LINE_ALT: int = 6  # Assume uniform block of text
 
+    # Seconds after which a tesseract process is killed
+    TIMEOUT_SECONDS: int = 60
+
+    # Recognition backend: "pytesseract" (binary) or "tesserocr" (in-process)
+    ENGINE: str = "pytesseract"
+
+    # Short lines stacked into a single recognition (1 reads lines one by one)
+    LINE_BATCH_SIZE: int = 1
+    # Blank rows between stacked lines
+    LINE_BATCH_GAP: int = 40
+
+    # Retry cascade: readings after the legacy one, and mean word confidence
+    # (0-100) below which a line is read again
+    RETRY_MAX: int = 2
+    RETRY_MIN_CONFIDENCE: int = 60
+
+    # Word refinement: confidence below which a word is read again, on its
+    # own and scaled up by REFINE_SCALE
+    REFINE_MIN_CONFIDENCE: int = 50
+    REFINE_SCALE: int = 2
+
+    # Table cells (CELL method): read as a single text line by the legacy
+    # engine, which only returns the characters of the whitelist
+    OEM_CELL: int = 0
+    PSM_CELL: int = 7
+    CELL_WHITELIST: str = "0123456789."
+
 @dataclass(frozen=True)
 class ProcessingConfig:
     """Image processing configuration parameters."""
     # Minimum number of lines required to trigger analysis
     MIN_LINES_TO_ANALYZE: int = 75
 
+    # Fast selection: pyramid level lines are counted on (each level halves
+    # the page), and fractions of MIN_LINES_TO_ANALYZE between which they are
+    # counted again at full resolution. Empirical: about 0.6 times as many
+    # lines are found at level 1, and level 2 misses the rulings of dense tables
+    SELECTION_LEVEL: int = 1
+    SELECTION_BAND: Tuple[float, float] = (0.35, 1.2)
+
+    # Fast deskew: largest skew angle searched (degrees), precision of the
+    # search, sampling step of the ink pixels, and angle below which the page
+    # is not rotated
+    SKEW_MAX_ANGLE: float = 5.0
+    SKEW_PRECISION: float = 0.05
+    SKEW_STRIDE: int = 4
+    SKEW_MIN_ANGLE: float = 0.1
+
+    # Tiled cleaning: memory held by the strips a page is cleaned by, besides
+    # the decoded and cleaned pages (strips are at least the halo of the
+    # line detection high)
+    TILE_BUDGET_MB: int = 64
+
+    # Local binarisation of the pages of some years, for scans Otsu fails
+    # on (uneven paper tone, faded ink): (first year, last year, method)
+    # ranges, method being "sauvola", "niblack" or "wolf". Pages of other
+    # years are binarized by Otsu
+    BINARISATION: Tuple[Tuple[int, int, str], ...] = ()
+    # Side of the window of the local binarisation (pixels, odd), about
+    # two text lines of a 300 dpi scan
+    BINARISATION_WINDOW: int = 51
+
+    # Engine finding the blocks of a page: "morphology" (closings of the
+    # page) or "profile" (row ink profiles, same blocks at a lower cost).
+    # Lines are found by morphology with either engine: the lines of a block
+    # are too close, and skewed by too much, to be told apart by profiles
+    SEGMENTATION_ENGINE: Literal["morphology", "profile"] = "morphology"
+
+    # Layout index: largest distance (pixels) left between the cell corners
+    # of a page and of the template of its layout by their fit, and largest
+    # angle (degrees) of the fit, above which the page is segmented in full
+    LAYOUT_MAX_RESIDUAL: float = 4.0
+    LAYOUT_MAX_ANGLE: float = 0.5
+
+@dataclass(frozen=True)
+class CacheConfig:
+    """Stage cache configuration parameters."""
+    # Size above which least recently used entries are evicted
+    MAX_SIZE_MB: int = 2048
+    # Same for the texts memoized by OCR
+    OCR_MEMO_MAX_SIZE_MB: int = 256
+    # Same for the layout templates
+    LAYOUT_MAX_SIZE_MB: int = 64
+
+@dataclass(frozen=True)
+class InputConfig:
+    """Input pages configuration parameters."""
+    # Pages of the years given as a PDF: resolution they are rendered at
+    # (the density of the PNG conversion), and backend rendering them:
+    # "pdftoppm" (poppler binary) or "pypdfium2" (in-process)
+    PDF_DPI: int = 300
+    PDF_BACKEND: Literal["pdftoppm", "pypdfium2"] = "pdftoppm"
+
+@dataclass(frozen=True)
+class WorkerConfig:
+    """Distributed workers configuration parameters."""
+    # Seconds a claimed page stays leased without heartbeat
+    LEASE_SECONDS: int = 600
+    # Times a page is processed, when its processing raises, before it is
+    # failed for good
+    MAX_ATTEMPTS: int = 3
+
 @dataclass(frozen=True)
 class TestConfig:
     """Test configuration parameters."""
@@ -39,12 +135,16 @@ class TestConfig:
 class Params:
     """Base Parameters Class for OCR and image processing configuration."""
 
-    # OCR method type
-    METHOD: Literal["LINE", "BLOCK"] = "LINE"
+    # OCR method type: blocks, their lines, or the cells of the ruled
+    # tables of the pages (in memory only)
+    METHOD: Literal["LINE", "BLOCK", "CELL"] = "LINE"
 
     def __init__(self):
         self._tesseract = TesseractConfig()
         self._processing = ProcessingConfig()
+        self._cache = CacheConfig()
+        self._input = InputConfig()
+        self._worker = WorkerConfig()
         self._test = TestConfig()
 
     @property
@@ -77,11 +177,161 @@ class Params:
         """Alternative PSM method for line processing."""
         return self._tesseract.PSM_LINE_ALT
 
+    @property
+    def OEM_CELL_TO_STRING(self) -> int:
+        """OEM method for table cells."""
+        return self._tesseract.OEM_CELL
+
+    @property
+    def PSM_CELL_TO_STRING(self) -> int:
+        """PSM method for table cells."""
+        return self._tesseract.PSM_CELL
+
+    @property
+    def CELL_WHITELIST(self) -> str:
+        """Characters table cells are read with."""
+        return self._tesseract.CELL_WHITELIST
+
+    @property
+    def OCR_TIMEOUT(self) -> int:
+        """Seconds after which a tesseract process is killed."""
+        return self._tesseract.TIMEOUT_SECONDS
+
+    @property
+    def OCR_ENGINE(self) -> str:
+        """Backend running the text recognition."""
+        return self._tesseract.ENGINE
+
+    @property
+    def LINE_BATCH_SIZE(self) -> int:
+        """Number of short lines stacked into a single recognition."""
+        return self._tesseract.LINE_BATCH_SIZE
+
+    @property
+    def LINE_BATCH_GAP(self) -> int:
+        """Blank rows between stacked lines."""
+        return self._tesseract.LINE_BATCH_GAP
+
+    @property
+    def RETRY_MAX(self) -> int:
+        """Maximum number of readings of a line after the legacy one."""
+        return self._tesseract.RETRY_MAX
+
+    @property
+    def RETRY_MIN_CONFIDENCE(self) -> int:
+        """Mean word confidence below which a line is read again."""
+        return self._tesseract.RETRY_MIN_CONFIDENCE
+
+    @property
+    def REFINE_MIN_CONFIDENCE(self) -> int:
+        """Word confidence below which a word is read again."""
+        return self._tesseract.REFINE_MIN_CONFIDENCE
+
+    @property
+    def REFINE_SCALE(self) -> int:
+        """Scale factor of the word crops read again."""
+        return self._tesseract.REFINE_SCALE
+
     @property
     def TRIGGER_ANALYZE(self) -> int:
         """Minimum number of lines required to trigger analysis."""
         return self._processing.MIN_LINES_TO_ANALYZE
 
+    @property
+    def SELECTION_LEVEL(self) -> int:
+        """Pyramid level lines are counted on by fast selection."""
+        return self._processing.SELECTION_LEVEL
+
+    @property
+    def SELECTION_BAND(self) -> Tuple[float, float]:
+        """Fractions of the trigger between which fast selection counts lines again at full resolution."""
+        return self._processing.SELECTION_BAND
+
+    @property
+    def SKEW_MAX_ANGLE(self) -> float:
+        """Largest skew angle searched by the fast deskew, in degrees."""
+        return self._processing.SKEW_MAX_ANGLE
+
+    @property
+    def SKEW_PRECISION(self) -> float:
+        """Precision of the fast deskew angle search, in degrees."""
+        return self._processing.SKEW_PRECISION
+
+    @property
+    def SKEW_STRIDE(self) -> int:
+        """Sampling step of the ink pixels used by the fast deskew."""
+        return self._processing.SKEW_STRIDE
+
+    @property
+    def SKEW_MIN_ANGLE(self) -> float:
+        """Angle in degrees below which the fast deskew does not rotate the page."""
+        return self._processing.SKEW_MIN_ANGLE
+
+    @property
+    def TILE_BUDGET(self) -> int:
+        """Memory in bytes held by the strips of the tiled cleaning."""
+        return self._processing.TILE_BUDGET_MB * 1024 * 1024
+
+    @property
+    def BINARISATION(self) -> Tuple[Tuple[int, int, str], ...]:
+        """Year ranges binarized by a local method, with their method."""
+        return self._processing.BINARISATION
+
+    @property
+    def BINARISATION_WINDOW(self) -> int:
+        """Side of the window of the local binarisation, in pixels."""
+        return self._processing.BINARISATION_WINDOW
+
+    @property
+    def SEGMENTATION_ENGINE(self) -> str:
+        """Engine finding the blocks of a page ("morphology" or "profile")."""
+        return self._processing.SEGMENTATION_ENGINE
+
+    @property
+    def LAYOUT_MAX_RESIDUAL(self) -> float:
+        """Distance in pixels between a page and its layout template above which it is segmented in full."""
+        return self._processing.LAYOUT_MAX_RESIDUAL
+
+    @property
+    def LAYOUT_MAX_ANGLE(self) -> float:
+        """Angle in degrees between a page and its layout template above which it is segmented in full."""
+        return self._processing.LAYOUT_MAX_ANGLE
+
+    @property
+    def CACHE_MAX_SIZE(self) -> int:
+        """Maximum size of the stage cache in bytes."""
+        return self._cache.MAX_SIZE_MB * 1024 * 1024
+
+    @property
+    def OCR_MEMO_MAX_SIZE(self) -> int:
+        """Maximum size of the OCR memo in bytes."""
+        return self._cache.OCR_MEMO_MAX_SIZE_MB * 1024 * 1024
+
+    @property
+    def LAYOUT_MAX_SIZE(self) -> int:
+        """Maximum size of the layout index in bytes."""
+        return self._cache.LAYOUT_MAX_SIZE_MB * 1024 * 1024
+
+    @property
+    def PDF_DPI(self) -> int:
+        """Resolution the pages of PDF inputs are rendered at."""
+        return self._input.PDF_DPI
+
+    @property
+    def PDF_BACKEND(self) -> str:
+        """Backend rendering the pages of PDF inputs ("pdftoppm" or "pypdfium2")."""
+        return self._input.PDF_BACKEND
+
+    @property
+    def LEASE(self) -> int:
+        """Seconds a page claimed by a worker stays leased without heartbeat."""
+        return self._worker.LEASE_SECONDS
+
+    @property
+    def MAX_ATTEMPTS(self) -> int:
+        """Times a worker processes a page that raises before it is failed for good."""
+        return self._worker.MAX_ATTEMPTS
+
     @property
     def YEARS(self) -> List[int]:
         """Years to process during testing."""
@@ -0,0 +1,131 @@
+"""
+Rasterizers reading the pages of the Year Book PDFs.
+"""
+
+import os
+import subprocess
+import threading
+from pathlib import Path
+from typing import Optional, Tuple
+import cv2
+import numpy as np
+import utils
+
+
+class Rasterizer:
+    """Backend rendering a page of a PDF as a grayscale array at a given DPI.
+
+    The pages of a year can be given as the PDF of the year instead of PNG
+    files: data/input/{year}/input_y{year}.pdf, its first page being page
+    000. A page missing as a PNG file is then named by the PNG it would be,
+    and rendered from the PDF when read, so that the PDF is never converted
+    as a whole and no PNG is written. Rasterizers are created once per
+    process by get(), so a backend holding an open document keeps it for
+    every page the process reads.
+    """
+
+    name = ''
+    _instances = {}
+
+    @classmethod
+    def get(cls, name: str) -> 'Rasterizer':
+        """Rasterizer of the current process for a backend name."""
+        key = (name, os.getpid())
+        if key not in cls._instances:
+            backends = {rasterizer.name: rasterizer for rasterizer in cls.__subclasses__()}
+            if name not in backends:
+                raise ValueError(f"Unsupported PDF backend: {name}")
+            cls._instances[key] = backends[name]()
+        return cls._instances[key]
+
+    @staticmethod
+    def document(src: Path) -> Optional[Tuple[Path, int]]:
+        """
+        PDF and page index a page is read from.
+
+        Args:
+            src: Path of the PNG of the page (input_y{year}-p{page}.png)
+
+        Returns:
+            (PDF of the year, index of the page), or None when the PNG
+            exists or the year has no PDF
+        """
+        src = Path(src)
+        if src.exists():
+            return None
+        metadata = utils.Metadata(src, must_exist=False)
+        pdf = src.parent / f"input_y{metadata.get_year()}.pdf"
+        if not pdf.exists():
+            return None
+        return pdf, int(metadata.get_page())
+
+    def render(self, pdf: Path, index: int, dpi: int) -> Optional[np.ndarray]:
+        """Grayscale page index (from 0) of a PDF, or None if there is no such page."""
+        raise NotImplementedError
+
+
+class PdftoppmRasterizer(Rasterizer):
+    """Runs poppler's pdftoppm for every page, read back from its output pipe."""
+
+    name = 'pdftoppm'
+
+    def render(self, pdf: Path, index: int, dpi: int) -> Optional[np.ndarray]:
+        number = str(index + 1)
+        try:
+            result = subprocess.run(
+                ['pdftoppm', '-f', number, '-l', number, '-r', str(dpi), '-gray', str(pdf)],
+                capture_output=True, check=False)
+        except FileNotFoundError as e:
+            raise FileNotFoundError(
+                "The pdftoppm backend requires poppler (apt-get install poppler-utils)"
+            ) from e
+        # pages beyond the end of the document are an error, and so is a broken PDF
+        if result.returncode != 0 or not result.stdout:
+            return None
+        return cv2.imdecode(np.frombuffer(result.stdout, np.uint8), cv2.IMREAD_GRAYSCALE)
+
+
+class PdfiumRasterizer(Rasterizer):
+    """Renders pages in-process through pypdfium2 (optional dependency).
+
+    The last PDF read stays open, so the pages of a year are read from a
+    document parsed once per process.
+    """
+
+    name = 'pypdfium2'
+
+    def __init__(self):
+        try:
+            import pypdfium2
+        except ImportError as e:
+            raise ImportError(
+                "The pypdfium2 backend requires the pypdfium2 package (pip install pypdfium2)"
+            ) from e
+        self.pdfium = pypdfium2
+        self._path = None
+        self._document = None
+        # pdfium is not thread-safe
+        self._lock = threading.Lock()
+
+    def _open(self, pdf: Path):
+        """Document of a PDF, closing the previous one."""
+        if self._path != pdf:
+            if self._document is not None:
+                self._document.close()
+            self._document = self.pdfium.PdfDocument(str(pdf))
+            self._path = pdf
+        return self._document
+
+    def render(self, pdf: Path, index: int, dpi: int) -> Optional[np.ndarray]:
+        with self._lock:
+            document = self._open(Path(pdf))
+            if not 0 <= index < len(document):
+                return None
+            page = document[index]
+            try:
+                bitmap = page.render(scale=dpi / 72, grayscale=True)
+                # the bitmap memory is released with the page
+                image = np.array(bitmap.to_numpy(), copy=True)
+            finally:
+                page.close()
+        return image[:, :, 0] if image.ndim == 3 else image
@@ -0,0 +1,80 @@
+"""
+Working set of a scanned page shared by the processing stages.
+"""
+
+from functools import cached_property
+from pathlib import Path
+from typing import Callable, Optional
+import cv2
+import numpy as np
+import utils
+
+
+class Scan:
+    """A page decoded once, with its derivatives computed on first use.
+
+    Every stage working on the same page reads the decoded image and its
+    gray, blurred and binary versions from the same Scan, so that none of
+    them is decoded or filtered twice. Pages are decoded as grayscale, the
+    scans being gray; a given BGR `image` is converted once. When `image`
+    is given, `src` is not read and only names the page, and so it is when
+    the page is decoded by `load` (e.g. rendered from a PDF).
+    """
+
+    def __init__(self, src, image: Optional[np.ndarray] = None,
+                 load: Optional[Callable[[], Optional[np.ndarray]]] = None):
+        self.src = Path(src)
+        self._image = image
+        self._load = load
+        self._pyramid = {}
+        self.metadata = utils.Metadata(self.src, must_exist=image is None and load is None)
+
+    @cached_property
+    def image(self) -> Optional[np.ndarray]:
+        """Decoded page (grayscale, or as given), or None if it cannot be read."""
+        if self._image is not None:
+            return self._image
+        if self._load is not None:
+            return self._load()
+        return cv2.imread(str(self.src), cv2.IMREAD_GRAYSCALE)
+
+    @cached_property
+    def gray(self) -> np.ndarray:
+        """Grayscale page (the page itself when decoded as grayscale)."""
+        return utils.Color().to_gray(self.image)
+
+    @cached_property
+    def binary(self) -> np.ndarray:
+        """Otsu binarization of the grayscale page, ink in white."""
+        _, thresh = cv2.threshold(self.gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+        return thresh
+
+    @cached_property
+    def blur(self) -> np.ndarray:
+        """Page smoothed by a 5x5 Gaussian blur (as many channels as the page)."""
+        return utils.Remove().noise(self.image)
+
+    @cached_property
+    def blur_gray(self) -> np.ndarray:
+        """Grayscale of the blurred page."""
+        return utils.Color().to_gray(self.blur)
+
+    @cached_property
+    def blur_binary(self) -> np.ndarray:
+        """Otsu binarization of the blurred grayscale page, ink in white."""
+        _, thresh = cv2.threshold(self.blur_gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+        return thresh
+
+    def release(self) -> None:
+        """Forget the derivatives of the page, computed again if used."""
+        for name in ('gray', 'binary', 'blur', 'blur_gray', 'blur_binary'):
+            self.__dict__.pop(name, None)
+        self._pyramid = {}
+
+    def pyramid(self, level: int) -> np.ndarray:
+        """Blurred grayscale page halved `level` times (Gaussian pyramid)."""
+        if level == 0:
+            return self.blur_gray
+        if level not in self._pyramid:
+            self._pyramid[level] = cv2.pyrDown(self.pyramid(level - 1))
+        return self._pyramid[level]
@@ -0,0 +1,326 @@
+"""
+Work queues shared by several hosts through a common filesystem.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+
+
+class WorkQueue:
+    """Queue of work items claimed under a lease.
+
+    Items are identified by a key and carry a payload (the page to process).
+    A claimed item is leased to a worker for `lease` seconds; the worker must
+    renew the lease with heartbeat() while it is working, otherwise another
+    worker may claim the item again once the lease has expired. Completed
+    items keep their result rows, which results() reads back. An item whose
+    processing raised goes back to pending, and is failed for good after a
+    given number of attempts.
+    """
+
+    def __init__(self, path: Path, lease: float = 600):
+        self.path = Path(path)
+        self.lease = lease
+
+    @classmethod
+    def open(cls, path: Path, lease: float = 600) -> 'WorkQueue':
+        """Open a SQLite queue for .sqlite/.db paths, a directory queue otherwise."""
+        if Path(path).suffix in ('.sqlite', '.db'):
+            return SQLiteQueue(path, lease)
+        return DirectoryQueue(path, lease)
+
+    def add(self, key: str, payload: str) -> bool:
+        """Add an item unless it is already known. Returns True if added."""
+        raise NotImplementedError
+
+    def claim(self, worker: str) -> Optional[Tuple[str, str]]:
+        """Claim a pending or expired item. Returns (key, payload) or None."""
+        raise NotImplementedError
+
+    def heartbeat(self, key: str, worker: str) -> bool:
+        """Renew the lease of an item. Returns False if the lease was lost."""
+        raise NotImplementedError
+
+    def complete(self, key: str, worker: str, rows: List[dict]) -> bool:
+        """Store the result rows of an item and mark it as done. Returns
+        False, storing nothing, if the lease was taken over by another worker."""
+        raise NotImplementedError
+
+    def fail(self, key: str, worker: str, error: str, attempts: int) -> bool:
+        """Release an item whose processing raised error: back to pending,
+        or failed once it has failed `attempts` times. Returns True if it is
+        failed for good (False too if the lease was lost)."""
+        raise NotImplementedError
+
+    def results(self) -> Iterator[List[dict]]:
+        """Result rows of every completed item."""
+        raise NotImplementedError
+
+    def counts(self) -> dict:
+        """Number of pending, leased, done and failed items."""
+        raise NotImplementedError
+
+
+class DirectoryQueue(WorkQueue):
+    """Work queue stored as files in a directory.
+
+    An item is a file moving from pending/ to leased/ to done/. Claims rely
+    on rename being atomic, which also holds on NFS, and the lease expiry is
+    the modification time of the leased file. A claimed item is first hidden
+    in pending/ under the name of its worker, and reaches leased/ only once
+    its owner is recorded, so a leased item always has an owner.
+    """
+
+    STATES = ('pending', 'leased', 'done', 'failed')
+
+    def __init__(self, path: Path, lease: float = 600):
+        super().__init__(path, lease)
+        for state in self.STATES:
+            (self.path / state).mkdir(parents=True, exist_ok=True)
+
+    def _file(self, state: str, key: str) -> Path:
+        return self.path / state / key
+
+    def add(self, key: str, payload: str) -> bool:
+        if any(self._file(state, key).exists() for state in self.STATES):
+            return False
+        tmp = self.path / f'.{key}.{os.getpid()}.tmp'
+        tmp.write_text(payload)
+        os.replace(tmp, self._file('pending', key))
+        return True
+
+    def claim(self, worker: str) -> Optional[Tuple[str, str]]:
+        self._reclaim()
+        for file in sorted((self.path / 'pending').iterdir()):
+            if file.name.startswith('.'):
+                continue
+            claimed = self.path / 'pending' / f'.{file.name}.{worker}.claim'
+            try:
+                # the lease starts now (rename keeps the modification time)
+                os.utime(file)
+                os.rename(file, claimed)
+            except OSError:
+                # claimed by another worker in the meantime
+                continue
+            owner = self.path / 'leased' / f'.{file.name}.{os.getpid()}.tmp'
+            owner.write_text(worker)
+            os.replace(owner, self._owner_file(file.name))
+            leased = self._file('leased', file.name)
+            os.rename(claimed, leased)
+            return file.name, leased.read_text()
+        return None
+
+    def _reclaim(self) -> None:
+        """Move expired leases, and claims left halfway by a crashed worker,
+        back to pending."""
+        now = time.time()
+        files = [(file, file.name) for file in (self.path / 'leased').iterdir()
+                 if not file.name.startswith('.')]
+        files += [(file, file.name[1:].split('.', 1)[0])
+                  for file in (self.path / 'pending').glob('.*.claim')]
+        for file, key in files:
+            try:
+                expired = file.stat().st_mtime + self.lease < now
+            except OSError:
+                continue
+            if expired:
+                try:
+                    os.rename(file, self._file('pending', key))
+                except OSError:
+                    pass
+
+    def _owner_file(self, key: str) -> Path:
+        return self.path / 'leased' / f'.{key}.owner'
+
+    def _owner(self, key: str) -> Optional[str]:
+        try:
+            return self._owner_file(key).read_text()
+        except OSError:
+            return None
+
+    def heartbeat(self, key: str, worker: str) -> bool:
+        if self._owner(key) != worker:
+            return False
+        try:
+            os.utime(self._file('leased', key))
+        except OSError:
+            return False
+        return True
+
+    def complete(self, key: str, worker: str, rows: List[dict]) -> bool:
+        if self._owner(key) != worker:
+            return False
+        # results are written before the item is marked as done
+        tmp = self.path / f'.{key}.{os.getpid()}.tmp'
+        tmp.write_text(json.dumps(rows))
+        os.replace(tmp, self.path / 'done' / f'.{key}.json')
+        try:
+            os.rename(self._file('leased', key), self._file('done', key))
+        except OSError:
+            # lease expired but not claimed again: the results are kept
+            self._file('done', key).write_text('')
+            self._file('pending', key).unlink(missing_ok=True)
+        self._owner_file(key).unlink(missing_ok=True)
+        return True
+
+    def fail(self, key: str, worker: str, error: str, attempts: int) -> bool:
+        if self._owner(key) != worker:
+            return False
+        # errors of the item so far, one per line
+        errors = self.path / 'failed' / f'.{key}.errors'
+        try:
+            previous = len(errors.read_text(encoding='utf-8').splitlines())
+        except FileNotFoundError:
+            previous = 0
+        failed = previous + 1 >= attempts
+        try:
+            os.rename(self._file('leased', key), self._file('failed' if failed else 'pending', key))
+        except OSError:
+            # lease expired: the attempt is not counted, unless the item is
+            # failed for good while still back in pending
+            if not failed:
+                return False
+            try:
+                os.rename(self._file('pending', key), self._file('failed', key))
+            except FileNotFoundError:
+                # claimed again by another worker
+                return False
+        with open(errors, 'a', encoding='utf-8') as f:
+            f.write(error.replace('\n', ' ') + '\n')
+        self._owner_file(key).unlink(missing_ok=True)
+        return failed
+
+    def results(self) -> Iterator[List[dict]]:
+        for file in sorted((self.path / 'done').glob('.*.json')):
+            yield json.loads(file.read_text())
+
+    def counts(self) -> dict:
+        return {
+            state: sum(1 for file in (self.path / state).iterdir() if not file.name.startswith('.'))
+            for state in self.STATES
+        }
+
+
+class SQLiteQueue(WorkQueue):
+    """Work queue stored in a single SQLite file.
+
+    Claims run in an immediate transaction, so a single worker at a time
+    picks the next item. SQLite relies on file locks, which some NFS setups
+    do not honour: prefer the directory queue on such mounts.
+    """
+
+    def __init__(self, path: Path, lease: float = 600):
+        super().__init__(path, lease)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = None
+        self._pid = None
+        self._lock = threading.RLock()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_conn'] = None
+        state['_lock'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.RLock()
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        """Connection of the current process."""
+        if self._conn is None or self._pid != os.getpid():
+            conn = sqlite3.connect(
+                str(self.path), timeout=60, isolation_level=None, check_same_thread=False
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS items ("
+                " key TEXT PRIMARY KEY, payload TEXT, state TEXT DEFAULT 'pending',"
+                " worker TEXT, expires REAL, result TEXT, failures INTEGER DEFAULT 0, error TEXT)"
+            )
+            # queues created before failures were counted
+            columns = [column[1] for column in conn.execute("PRAGMA table_info(items)")]
+            if 'failures' not in columns:
+                conn.execute("ALTER TABLE items ADD COLUMN failures INTEGER DEFAULT 0")
+                conn.execute("ALTER TABLE items ADD COLUMN error TEXT")
+            self._conn = conn
+            self._pid = os.getpid()
+        return self._conn
+
+    def add(self, key: str, payload: str) -> bool:
+        with self._lock:
+            cursor = self.conn.execute(
+                "INSERT OR IGNORE INTO items (key, payload) VALUES (?, ?)", (key, payload)
+            )
+            return cursor.rowcount == 1
+
+    def claim(self, worker: str) -> Optional[Tuple[str, str]]:
+        now = time.time()
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self.conn.execute(
+                    "SELECT key, payload FROM items WHERE state = 'pending'"
+                    " OR (state = 'leased' AND expires < ?) ORDER BY key LIMIT 1", (now,)
+                ).fetchone()
+                if row is not None:
+                    self.conn.execute(
+                        "UPDATE items SET state = 'leased', worker = ?, expires = ? WHERE key = ?",
+                        (worker, now + self.lease, row[0])
+                    )
+                self.conn.execute("COMMIT")
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+        return tuple(row) if row is not None else None
+
+    def heartbeat(self, key: str, worker: str) -> bool:
+        with self._lock:
+            cursor = self.conn.execute(
+                "UPDATE items SET expires = ? WHERE key = ? AND state = 'leased' AND worker = ?",
+                (time.time() + self.lease, key, worker)
+            )
+            return cursor.rowcount == 1
+
+    def complete(self, key: str, worker: str, rows: List[dict]) -> bool:
+        with self._lock:
+            cursor = self.conn.execute(
+                "UPDATE items SET state = 'done', result = ?"
+                " WHERE key = ? AND state = 'leased' AND worker = ?",
+                (json.dumps(rows), key, worker)
+            )
+            return cursor.rowcount == 1
+
+    def fail(self, key: str, worker: str, error: str, attempts: int) -> bool:
+        with self._lock:
+            cursor = self.conn.execute(
+                "UPDATE items SET failures = failures + 1, error = ?,"
+                " state = CASE WHEN failures + 1 >= ? THEN 'failed' ELSE 'pending' END"
+                " WHERE key = ? AND state = 'leased' AND worker = ?",
+                (error, attempts, key, worker)
+            )
+            if cursor.rowcount != 1:
+                return False
+            state = self.conn.execute("SELECT state FROM items WHERE key = ?", (key,)).fetchone()[0]
+        return state == 'failed'
+
+    def results(self) -> Iterator[List[dict]]:
+        with self._lock:
+            results = self.conn.execute(
+                "SELECT result FROM items WHERE state = 'done' ORDER BY key"
+            ).fetchall()
+        for (result,) in results:
+            yield json.loads(result)
+
+    def counts(self) -> dict:
+        counts = {'pending': 0, 'leased': 0, 'done': 0, 'failed': 0}
+        with self._lock:
+            rows = self.conn.execute("SELECT state, COUNT(*) FROM items GROUP BY state").fetchall()
+        for state, count in rows:
+            counts[state] = count
+        return counts
@@ -4,115 +4,830 @@ Main entry point for the image processing and OCR pipeline.
 Handles command line arguments and orchestrates the processing workflow.
 """
 
+from collections import Counter, deque
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 from pathlib import Path
-from typing import List
+from typing import Callable, Iterable, Iterator, List, Optional
+import json
+import os
+import queue
+import socket
+import threading
+import time
+import cv2
+import numpy as np
 import core
 import conf
 import csv
 import pandas as pd
+import utils
+
+# Marks the end of the items flowing through a streaming stage
+_DONE = object()
+# Marks a cache miss
+_MISSING = object()
+
+
+def _init_worker() -> None:
+    """Keep OpenCV single-threaded inside pool workers to avoid oversubscription."""
+    cv2.setNumThreads(1)
+
 
 class Pipeline:
     """Class to manage the image processing pipeline."""
 
-    def __init__(self):
-        """Initialize pipeline with core parameters and IO."""
+    def __init__(self, jobs: int = 1, debug: bool = False, cache: bool = False,
+                 resume: bool = False, journal: bool = True, ocr_procs: int = 0,
+                 engine: Optional[str] = None, line_batch: Optional[int] = None,
+                 memo: bool = False, cascade: bool = False, words: bool = False,
+                 refine: bool = False, fast_select: bool = False, fast_deskew: bool = False,
+                 tiled: bool = False, layouts: bool = False):
+        """Initialize pipeline with core parameters and IO.
+
+        Args:
+            jobs: Number of worker processes used by each stage (1 runs in-process)
+            debug: Write intermediate images when running in memory
+            cache: Reuse the stage outputs of previous runs when running in memory
+            resume: Skip the units recorded in the journal by a previous run
+            journal: Record recognized units in the journal
+            ocr_procs: Number of tesseract processes reading lines at once
+                (0 reads them through the pool of jobs)
+            engine: OCR backend (Params.OCR_ENGINE by default)
+            line_batch: Number of short lines read in a single recognition
+                (Params.LINE_BATCH_SIZE by default)
+            memo: Reuse the text of images recognized by previous runs
+            cascade: Read lines with the legacy engine first, and again with
+                other configs only when their text is doubtful
+            words: Add the words of each unit, with their boxes and
+                confidences, to the result rows
+            refine: Read again the words of low confidence on their own
+            fast_select: Count the lines of a page on a downscaled version
+                first, at full resolution only when close to the trigger
+            fast_deskew: Estimate the skew of a page from projection profiles,
+                and rotate it only above Params.SKEW_MIN_ANGLE
+            tiled: Clean pages by strips held within Params.TILE_BUDGET
+            layouts: Reuse the blocks and lines of pages of the same number
+                and table layout when running in memory
+        """
         self.params = core.Params()
         self.io = core.IO()
+        self.jobs = max(1, int(jobs))
+        self.debug = debug
+        self.resume = resume
+        self.ocr_procs = max(0, int(ocr_procs))
+        self.engine = engine or self.params.OCR_ENGINE
+        self.line_batch = max(1, int(line_batch or self.params.LINE_BATCH_SIZE))
+        self.cascade = cascade
+        # number of lines read at each tier of the cascade
+        self.tiers = Counter()
+        self.words = words
+        self.refine = refine
+        # pyramid level selection starts from (0 is full resolution)
+        self.selection_level = self.params.SELECTION_LEVEL if fast_select else 0
+        self.deskew = None
+        if fast_deskew:
+            self.deskew = {
+                'max_angle': self.params.SKEW_MAX_ANGLE,
+                'precision': self.params.SKEW_PRECISION,
+                'stride': self.params.SKEW_STRIDE,
+                'min_angle': self.params.SKEW_MIN_ANGLE,
+            }
+        self.tile_budget = self.params.TILE_BUDGET if tiled else None
+        self.logger = utils.Log().create_logger(self.__class__.__name__)
+
+        # every recognized unit is recorded so that an interrupted run can resume
+        self.journal = core.Journal(self.io.PATH_JOURNAL_FILE) if journal else None
+        if self.journal is not None and not resume:
+            self.journal.reset()
+
+        # texts of the binarized images already recognized, in every mode
+        self.memo = None
+        if memo:
+            self.memo = core.Cache(self.io.PATH_OCR_MEMO, self.params.OCR_MEMO_MAX_SIZE)
+
+        # boxes of the pages segmented in full, by page number and layout
+        self.layouts = None
+        if layouts:
+            self.layouts = core.Layouts(self.io.PATH_LAYOUT, self.params.LAYOUT_MAX_SIZE,
+                                        self.params.LAYOUT_MAX_RESIDUAL, self.params.LAYOUT_MAX_ANGLE)
+
+        self.cache = None
+        if cache:
+            self.cache = core.Cache(self.io.PATH_CACHE, self.params.CACHE_MAX_SIZE)
+            # a stage is invalidated when the code it runs changes
+            self._versions = {
+                'select': core.Cache.version(
+                    core.Image.select, core.Image._houghlines, core.scan, utils.remove, utils.color, utils.lines, utils.should),
+                'clean': core.Cache.version(
+                    core.Image.preprocess, core.scan, utils.remove, utils.color, utils.transform,
+                    utils.lines, utils.morph, utils.binarise, utils.grid),
+                'split': core.Cache.version(
+                    core.Image.segment_blocks, core.Image.find_blocks, core.Image.segment_lines, core.Image.find_lines,
+                    core.Image.segment_cells, core.Image._region, core.scan, utils.color, utils.segment,
+                    utils.morph, utils.remove, utils.grid),
+                'recognize': core.Cache.version(core.ocr, core.engine, utils.color, utils.should),
+            }
+            # segmentation runs on the output of the cleaning stage
+            self._versions['split'] = core.Cache.digest(self._versions['clean'], self._versions['split'])
         
         # Make sure input files exist
         if not hasattr(self.io, 'PATH_INPUT_FILES'):
             raise AttributeError("IO class must have PATH_INPUT_FILES attribute. Please check core.IO implementation.")
 
+    def _map(self, func: Callable, items: Iterable) -> list:
+        """Apply func to every item, on a process pool when jobs > 1.
+
+        Results are returned in the order of items, whatever the number of jobs,
+        so the manifests and output.csv are identical to a sequential run.
+        """
+        items = list(items)
+        if self.jobs == 1 or len(items) <= 1:
+            return [func(item) for item in items]
+
+        workers = min(self.jobs, len(items))
+        chunksize = max(1, len(items) // (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as executor:
+            results = list(executor.map(partial(self._counted, func), items, chunksize=chunksize))
+
+        for _, counts in results:
+            self._add_counts(counts)
+        return [result for result, _ in results]
+
+    def _stores(self) -> list:
+        """Caches whose hit and miss counters are reported by summary()."""
+        return [store for store in (self.cache, self.memo, self.layouts) if store is not None]
+
+    def _counted(self, func: Callable, item) -> tuple:
+        """Apply func to item and return its result with the cache hits and
+        misses and the cascade tiers it counted, which the pool would lose
+        otherwise (pool task)."""
+        before = [(store.hits, store.misses) for store in self._stores()]
+        tiers = self.tiers.copy()
+        result = func(item)
+        stores = [
+            (store.hits - hits, store.misses - misses)
+            for store, (hits, misses) in zip(self._stores(), before)
+        ]
+        return result, (stores, self.tiers - tiers)
+
+    def _add_counts(self, counts: tuple) -> None:
+        """Add the counters returned by _counted()."""
+        stores, tiers = counts
+        for store, (hits, misses) in zip(self._stores(), stores):
+            store.hits += hits
+            store.misses += misses
+        self.tiers.update(tiers)
+
+    def summary(self) -> None:
+        """Print the hit and miss counters of the caches used by the run."""
+        for name, store in (('Stage cache', self.cache), ('OCR memo', self.memo), ('Layout index', self.layouts)):
+            if store is None:
+                continue
+            total = store.hits + store.misses
+            rate = f" ({100 * store.hits / total:.0f}% hits)" if total else ""
+            print(f"{name}: {store.hits} hits, {store.misses} misses{rate}")
+        if self.cascade:
+            tiers = ", ".join(f"tier {tier}: {count}" for tier, count in sorted(self.tiers.items()))
+            print(f"Lines per cascade tier (0 = legacy only): {tiers or 'none'}")
+
+    def _select_page(self, src: Path):
+        """Selection of a single page (pool task)."""
+        return core.Image(src, self.io.PATH_SELECTION).selection(*self._selection_args())
+
+    def _selection_args(self) -> tuple:
+        """Trigger, pyramid level and band of the selection."""
+        return self.params.TRIGGER_ANALYZE, self.selection_level, self.params.SELECTION_BAND
+
+    def _preprocess_page(self, src: str):
+        """Preprocessing of a single page (pool task)."""
+        return core.Image(Path(src), self.io.PATH_PREPROCESS).clean(
+            self.deskew, self.tile_budget, self._binarisation(src))
+
+    def _binarisation(self, src) -> Optional[dict]:
+        """Local binarisation of a page, by the year range it falls in
+        (None binarizes by Otsu)."""
+        year = int(utils.Metadata(src, must_exist=False).get_year())
+        for first, last, method in self.params.BINARISATION:
+            if first <= year <= last:
+                return {'method': method, 'window': self.params.BINARISATION_WINDOW}
+        return None
+
+    def _segment_page(self, src: str) -> List[str]:
+        """Block segmentation of a single page (pool task)."""
+        return core.Image(Path(src), self.io.PATH_BLOCK).block_segmentation(self.params.SEGMENTATION_ENGINE)
+
+    def _segment_block(self, src: str) -> List[str]:
+        """Line segmentation of a single block (pool task)."""
+        return core.Image(Path(src), self.io.PATH_LINE).line_segmentation()
+
+    def _ocr(self, src: Path, image: Optional[np.ndarray] = None) -> core.OCR:
+        """OCR of a block or line with the engine and memo of the pipeline."""
+        return core.OCR(src, image=image, engine=self.engine, memo=self.memo,
+                        cascade=self.cascade, tiers=self.tiers, refine=self.refine)
+
+    def _read(self, ocr: core.OCR, block: bool = False, cell: bool = False) -> dict:
+        """Fields of the row of a block, line or cell: its text, and its
+        words (JSON) when they are kept (cells have none)."""
+        if cell:
+            fields = {'text': ocr.cell_to_string()}
+            if self.words:
+                fields['words'] = None
+            return fields
+
+        if not (self.words or self.refine):
+            return {'text': ocr.block_to_string() if block else ocr.line_to_string()}
+
+        data = ocr.block_to_data() if block else ocr.line_to_data()
+        fields = {'text': data['text'] if data is not None else None}
+        if self.words:
+            fields['words'] = json.dumps(data['words']) if data is not None else None
+        return fields
+
+    def _journaled(self, src, row: dict, recognize: Callable) -> dict:
+        """Return the row of a unit with the fields returned by recognize,
+        taken from the journal if it was already recognized, otherwise
+        recognized and recorded."""
+        if self.journal is None:
+            fields = dict(recognize())
+            return {'text': fields.pop('text'), **row, **fields}
+
+        done = self.journal.get(row['year'], row['page'], row['block'], row.get('line', ''), words=self.words)
+        if done is not None:
+            return done
+
+        fields = dict(recognize())
+        row = {'text': fields.pop('text'), **row, **fields}
+        self.journal.record(src, row)
+        return row
+
+    def _recognize_block(self, item: tuple) -> dict:
+        """OCR of a single block (pool task)."""
+        src, row = item
+        return self._journaled(src, row, lambda: self._read(self._ocr(Path(src)), block=True))
+
+    def _recognize_line(self, item: tuple) -> dict:
+        """OCR of a single line (pool task)."""
+        src, row = item
+        return self._journaled(src, row, lambda: self._read(self._ocr(Path(src))))
+
+    def _recognize_line_batch(self, items: List[tuple]) -> List[dict]:
+        """OCR of the lines of a block, line_batch lines at a time (pool task)."""
+        rows = [None] * len(items)
+        if self.journal is not None:
+            rows = [self.journal.get(row['year'], row['page'], row['block'], row['line'], words=self.words)
+                    for _, row in items]
+        todo = [i for i, row in enumerate(rows) if row is None]
+
+        batcher = core.LineBatcher(self.line_batch, self.params.LINE_BATCH_GAP, self.engine, self.memo)
+        texts = batcher.recognize([self._ocr(Path(items[i][0])) for i in todo])
+        for i, text in zip(todo, texts):
+            src, row = items[i]
+            rows[i] = {'text': text, **row}
+            if self.journal is not None:
+                self.journal.record(src, rows[i])
+
+        return rows
+
     def run_selection(self) -> None:
         """Run image selection phase."""
-        selection = [
-            core.Image(src, self.io.PATH_SELECTION).selection(self.params.TRIGGER_ANALYZE) 
-            for src in self.io.PATH_INPUT_FILES
-        ]
+        if any(core.Rasterizer.document(src) is not None for src in self.io.PATH_INPUT_FILES):
+            raise ValueError("Pages of PDF inputs are read in memory only (--in-memory or --stream)")
+
+        selection = self._map(self._select_page, self.io.PATH_INPUT_FILES)
         self.io.PATH_SELECTION_FILE.write_text("\n".join([str(sel) for sel in selection]))
 
     def run_preprocessing(self) -> None:
         """Run image preprocessing phase."""
         source = self.io.PATH_SELECTION_FILE.read_text().split("\n")
-        preprocess = [
-            core.Image(Path(src), self.io.PATH_PREPROCESS).clean() 
-            for src in source
-        ]
+        preprocess = self._map(self._preprocess_page, source)
         self.io.PATH_PREPROCESS_FILE.write_text("\n".join([str(pre) for pre in preprocess]))
 
     def run_block_segmentation(self) -> None:
         """Run block segmentation phase."""
         source = self.io.PATH_PREPROCESS_FILE.read_text().split("\n")
-        blocks = [
-            core.Image(Path(src), self.io.PATH_BLOCK).block_segmentation() 
-            for src in source
-        ]
+        blocks = self._map(self._segment_page, source)
         self.io.PATH_BLOCK_FILE.write_text("\n".join([block for sublist in blocks for block in sublist]))
 
+    def _parse_block_name(self, path: Path):
+        """Returns (year, page, block) parsed from a block filename, or None."""
+        try:
+            # More flexible parsing of the filename
+            parts = path.stem.split('-')
+            if len(parts) >= 3:
+                year, page, block_num = parts[-3:]  # Take last 3 parts if available
+            else:
+                # Handle cases with fewer parts - adjust this based on your actual filename format
+                year = parts[0]
+                page = parts[1]
+                block_num = "1"  # default value
+        except (ValueError, IndexError) as e:
+            self.logger.error(f"Error parsing filename {path.stem}: {e}")
+            return None
+        return year, page, block_num
+
     def run_line_segmentation(self) -> List[dict]:
         """Run line segmentation and OCR phase."""
+        if self.params.METHOD == "CELL":
+            raise ValueError("The CELL method runs in memory only (--in-memory or --stream)")
+
         source = self.io.PATH_BLOCK_FILE.read_text().split("\n")
-        results = []
+        blocks = []
+        for src in source:
+            path = Path(src)
+            names = self._parse_block_name(path)
+            if names is not None:
+                blocks.append((path, names))
 
         if self.params.METHOD == "BLOCK":
-            for src in source:
-                path = Path(src)
-                try:
-                    # More flexible parsing of the filename
-                    parts = path.stem.split('-')
-                    if len(parts) >= 3:
-                        year, page, block_num = parts[-3:]  # Take last 3 parts if available
-                    else:
-                        # Handle cases with fewer parts - adjust this based on your actual filename format
-                        year = parts[0]
-                        page = parts[1]
-                        block_num = "1"  # default value
-                except ValueError as e:
-                    logger.error(f"Error parsing filename {path.stem}: {e}")
-                    continue
-                text = core.OCR(path).block_to_string()
-                results.append({
-                    'text': text,
+            return self._map(self._recognize_block, [
+                (str(path), {'year': year, 'page': page, 'block': block_num})
+                for path, (year, page, block_num) in blocks
+            ])
+
+        if self.params.METHOD == "LINE":
+            block_lines = self._map(self._segment_block, [str(path) for path, _ in blocks])
+
+            lines = []
+            for (_, names), line_paths in zip(blocks, block_lines):
+                for line_path in line_paths:
+                    lines.append((line_path, names))
+
+            items = [
+                (line_path, {
                     'year': year,
                     'page': page,
-                    'block': block_num
+                    'block': block_num,
+                    'line': Path(line_path).stem.split('-')[-1]
                 })
-            return results
+                for line_path, (year, page, block_num) in lines
+            ]
+            if self.line_batch > 1:
+                # lines are batched within their block
+                block_items = {}
+                for src, row in items:
+                    block_items.setdefault((row['year'], row['page'], row['block']), []).append((src, row))
+                rows = self._map(self._recognize_line_batch, block_items.values())
+                return [row for block_rows in rows for row in block_rows]
+            if self.ocr_procs:
+                return self._recognize_lines(items)
+            return self._map(self._recognize_line, items)
 
-        if self.params.METHOD == "LINE":
-            lines = []
-            for src in source:
-                path = Path(src)
-                try:
-                    # More flexible parsing of the filename 
-                    parts = path.stem.split('-')
-                    if len(parts) >= 3:
-                        year, page, block_num = parts[-3:]  # Take last 3 parts if available
-                    else:
-                        # Handle cases with fewer parts - adjust this based on your actual filename format
-                        year = parts[0]
-                        page = parts[1]
-                        block_num = "1"  # default value
-                except ValueError as e:
-                    logger.error(f"Error parsing filename {path.stem}: {e}")
+        raise ValueError(f"Unsupported method: {self.params.METHOD}")
+
+    def _recognize_lines(self, items: List[tuple]) -> List[dict]:
+        """OCR of lines with up to ocr_procs tesseract processes running at once.
+
+        Lines are sent in batches, and every batch is recorded in the journal
+        before the next one starts, so an interrupted run loses one batch at most.
+        """
+        rows = [None] * len(items)
+        todo = []
+        for i, (src, row) in enumerate(items):
+            if self.journal is not None:
+                rows[i] = self.journal.get(row['year'], row['page'], row['block'], row['line'], words=self.words)
+            if rows[i] is None:
+                todo.append(i)
+
+        pool = core.TesseractPool(self.ocr_procs, self.params.OCR_TIMEOUT)
+        batch_size = self.ocr_procs * 4
+        for start in range(0, len(todo), batch_size):
+            batch = todo[start:start + batch_size]
+            ocrs = [core.OCR(Path(items[i][0])) for i in batch]
+            requests = [ocr.line_request() for ocr in ocrs]
+
+            outputs = [None] * len(batch)
+            keys = [None] * len(batch)
+            missing = []
+            for n, request in enumerate(requests):
+                if request is None:
                     continue
-                block_lines = core.Image(path, self.io.PATH_LINE).line_segmentation()
-                
-                for line_path in block_lines:
-                    # Convert string to Path object
-                    line_path = Path(line_path)
-                    line_num = line_path.stem.split('-')[-1]  # Now this will work
-                    text = core.OCR(line_path).line_to_string()
-                    results.append({
-                        'text': text,
-                        'year': year,
-                        'page': page,
-                        'block': block_num,
-                        'line': line_num
-                    })
-            return results
+                if self.memo is not None:
+                    # the pool runs the same binary as the pytesseract engine
+                    keys[n] = core.OCR.memo_key(*request, 'pytesseract')
+                    outputs[n] = self.memo.get(keys[n])
+                if outputs[n] is None:
+                    missing.append(n)
 
-        raise ValueError(f"Unsupported method: {self.params.METHOD}")
+            if missing:
+                images, configs = zip(*(requests[n] for n in missing))
+                for n, output in zip(missing, asyncio.run(pool.recognize_many(images, configs))):
+                    outputs[n] = output
+                    if self.memo is not None and output is not None:
+                        self.memo.put(keys[n], output)
+
+            for i, ocr, output in zip(batch, ocrs, outputs):
+                src, row = items[i]
+                rows[i] = {'text': ocr.line_result(output), **row}
+                # lines that failed are recognized again on resume
+                if self.journal is not None and rows[i]['text'] is not None:
+                    self.journal.record(src, rows[i])
+
+        return rows
+
+    def _cached(self, stage: str, parts: tuple, compute: Callable):
+        """Return the output of a stage for the given inputs, from the cache
+        when possible, otherwise computing and storing it."""
+        if self.cache is None:
+            return compute()
+
+        key = self.cache.digest(stage, self._versions[stage], *parts)
+        value = self.cache.get(key, _MISSING)
+        if value is _MISSING:
+            value = compute()
+            self.cache.put(key, value)
+        return value
+
+    def _is_cached(self, stage: str, parts: tuple) -> bool:
+        """Check whether the output of a stage is in the cache."""
+        if self.cache is None:
+            return False
+        return self.cache.digest(stage, self._versions[stage], *parts) in self.cache
+
+    def _read_page(self, src: Path) -> Iterator[tuple]:
+        """Yield (src, digest, scan) for a page only if it passes selection.
+
+        The page is decoded only when a stage needs it, so not at all when
+        its selection and later stages are cached, and only once otherwise.
+        Pages read from a PDF are likewise rendered only when needed.
+        """
+        digest = self._digest(src) if self.cache is not None else None
+        scan = self._scan(src)
+
+        def select():
+            if scan.image is None:
+                self.logger.error(f"Failed to load image: {src}")
+                return False
+            page = core.Image(src, self.io.PATH_SELECTION, scan=scan, debug=self.debug)
+            return page.select(*self._selection_args())
+
+        if self._cached('select', (digest, *self._selection_args()), select):
+            yield src, digest, scan
+
+    def _digest(self, src: Path) -> str:
+        """Digest of the content of a page, or of the state of the PDF file
+        it is rendered from (the PDF is not read)."""
+        document = core.Rasterizer.document(src)
+        if document is None:
+            return self.cache.digest(Path(src).read_bytes())
+
+        pdf, index = document
+        stat = pdf.stat()
+        return self.cache.digest(pdf.name, stat.st_size, stat.st_mtime_ns, index,
+                                 self.params.PDF_DPI, self.params.PDF_BACKEND)
+
+    def _scan(self, src: Path) -> core.Scan:
+        """Scan of a page, rendered from the PDF of its year when it has no
+        PNG file."""
+        document = core.Rasterizer.document(src)
+        if document is None:
+            return core.Scan(src)
+        return core.Scan(src, load=partial(self._render, *document))
+
+    def _render(self, pdf: Path, index: int) -> Optional[np.ndarray]:
+        """Page index of a PDF, rendered at Params.PDF_DPI."""
+        return core.Rasterizer.get(self.params.PDF_BACKEND).render(pdf, index, self.params.PDF_DPI)
+
+    def _preprocess(self, src: Path, digest: Optional[str], scan: core.Scan) -> tuple:
+        """Preprocessed version of a page, and the grid of its tables."""
+        def clean():
+            if self.tile_budget is not None:
+                # strips are computed from the decoded page only
+                scan.release()
+            stages = core.Image(src, self.io.PATH_PREPROCESS, scan=scan, debug=self.debug).preprocess(
+                self.deskew, self.tile_budget, self._binarisation(src))
+            # single channel, as later stages read it back from a PNG
+            return stages['preprocessed'], stages['grid']
+
+        return self._cached('clean', (digest, self.deskew, self._binarisation(src)), clean)
+
+    def _split_parts(self, src: Path, digest: Optional[str]) -> tuple:
+        """Cache key parts of the segmentation of a page."""
+        return (digest, self.deskew, self._binarisation(src),
+                self.params.METHOD, self.params.SEGMENTATION_ENGINE, self.layouts is not None)
+
+    def _clean_page(self, item: tuple) -> Iterator[tuple]:
+        """Yield the preprocessed version of a selected page and its grid,
+        or None when its segmentation is cached and the page need not be
+        cleaned."""
+        src, digest, scan = item
+        if self._is_cached('split', self._split_parts(src, digest)):
+            yield src, digest, None
+            return
+        yield src, digest, self._preprocess(src, digest, scan)
+
+    def _split_page(self, item: tuple) -> Iterator[tuple]:
+        """Yield (src, unit) for the (names, path, image) units to recognize in
+        a preprocessed page: its blocks in BLOCK mode, the lines of its blocks
+        in LINE mode. A last (src, None) item marks the end of the page."""
+        src, digest, cleaned = item
+
+        def split():
+            if cleaned is None:
+                return list(self._segment_page_image(src, *self._preprocess(src, digest, self._scan(src))))
+            return list(self._segment_page_image(src, *cleaned))
+
+        for unit in self._cached('split', self._split_parts(src, digest), split):
+            yield src, unit
+        yield src, None
+
+    def _segment_page_image(self, src: Path, preprocessed: np.ndarray, grid: np.ndarray) -> Iterator[tuple]:
+        """Segment a preprocessed page into blocks, and blocks into lines,
+        or into the cells of its grid."""
+        if self.params.METHOD == "CELL":
+            cells = core.Image(
+                src, self.io.PATH_CELL, image=preprocessed, debug=self.debug
+            ).segment_cells(grid)
+            for cell_path, cell_img in cells:
+                # the row of a cell stands for its block, its column for its line
+                names = self._parse_block_name(Path(cell_path.stem.rsplit('-', 1)[0]))
+                if names is not None:
+                    yield names, cell_path, cell_img
+            return
+
+        page = core.Image(src, self.io.PATH_BLOCK, image=preprocessed, debug=self.debug)
+        layout = None
+        if self.layouts is not None:
+            parts = (self.params.METHOD, self.params.SEGMENTATION_ENGINE)
+            layout = self.layouts.get(page.page, grid, preprocessed.shape, parts)
+            if layout is None:
+                layout = self._find_layout(page)
+                self.layouts.put(page.page, grid, layout, parts)
+        blocks = page.segment_blocks(
+            self.params.SEGMENTATION_ENGINE, None if layout is None else [block[:2] for block in layout]
+        )
+
+        for b, (block_path, block_img) in enumerate(blocks):
+            names = self._parse_block_name(block_path)
+            if names is None:
+                continue
+
+            if self.params.METHOD == "BLOCK":
+                yield names, block_path, block_img
+                continue
+
+            lines = core.Image(
+                block_path, self.io.PATH_LINE, image=block_img, debug=self.debug
+            ).segment_lines(None if layout is None else layout[b][2])
+            for line_path, line_img in lines:
+                yield names, line_path, line_img
+
+    def _find_layout(self, page: core.Image) -> list:
+        """Blocks of a preprocessed page, with the lines of each block in
+        LINE mode, as core.Layouts stores them."""
+        blocks = page.find_blocks(self.params.SEGMENTATION_ENGINE)
+        if self.params.METHOD == "BLOCK":
+            return [(i, region, None) for i, region in blocks]
+
+        img = page.scan.image
+        return [
+            (i, (x0, y0, x1, y1), core.Image(
+                self.io.PATH_BLOCK / f"block_y{page.year}-p{page.page}-b{i}.png", self.io.PATH_LINE,
+                image=img[y0:y1, x0:x1], debug=False
+            ).find_lines())
+            for i, (x0, y0, x1, y1) in blocks
+        ]
+
+    def _recognize_unit(self, item: tuple) -> Iterator[dict]:
+        """Yield the result row of a block or line."""
+        src, unit = item
+        if unit is None:
+            if self.journal is not None:
+                self.journal.complete_page(src)
+            return
+
+        (year, page, block_num), path, img = unit
+        parts = (self.cache.digest(img) if self.cache is not None else None,
+                 self.params.METHOD, self._tesseract_fields())
+
+        if self.params.METHOD == "BLOCK":
+            yield self._journaled(src, {'year': year, 'page': page, 'block': block_num}, lambda: self._cached(
+                'recognize', parts, lambda: self._read(self._ocr(path, img), block=True)))
+            return
+
+        row = {'year': year, 'page': page, 'block': block_num, 'line': path.stem.split('-')[-1]}
+        cell = self.params.METHOD == "CELL"
+        yield self._journaled(src, row, lambda: self._cached(
+            'recognize', parts, lambda: self._read(self._ocr(path, img), cell=cell)))
+
+    def _tesseract_fields(self) -> tuple:
+        """Tesseract parameters the recognized text depends on."""
+        return (
+            self.engine,
+            self.cascade, self.params.RETRY_MAX, self.params.RETRY_MIN_CONFIDENCE,
+            self.words, self.refine, self.params.REFINE_MIN_CONFIDENCE, self.params.REFINE_SCALE,
+            self.params.OEM_BLOCK_TO_STRING, self.params.PSM_BLOCK_TO_STRING,
+            self.params.OEM_LINE_TO_STRING, self.params.PSM_LINE_TO_STRING,
+            self.params.OEM_LINE_TO_STRING_ALT, self.params.PSM_LINE_TO_STRING_ALT,
+            self.params.OEM_CELL_TO_STRING, self.params.PSM_CELL_TO_STRING, self.params.CELL_WHITELIST
+        )
+
+    def _process_page(self, src: Path) -> List[dict]:
+        """Run every stage on a single page, handing decoded arrays from one
+        stage to the next instead of PNG files (pool task)."""
+        if self.resume and self.journal is not None and self.journal.is_complete(src):
+            return self.journal.rows(src, words=self.words)
+
+        return [
+            result
+            for page in self._read_page(src)
+            for cleaned in self._clean_page(page)
+            for unit in self._split_page(cleaned)
+            for result in self._recognize_unit(unit)
+        ]
+
+    def run_in_memory(self) -> List[dict]:
+        """Run all phases page by page without intermediate files."""
+        if self.params.METHOD not in ("LINE", "BLOCK", "CELL"):
+            raise ValueError(f"Unsupported method: {self.params.METHOD}")
+
+        pages = self._map(self._process_page, self.io.PATH_INPUT_FILES)
+        return [result for results in pages for result in results]
+
+    def _run_stage(self, func: Callable, inbox: queue.Queue, outbox: queue.Queue,
+                   errors: List[BaseException]) -> None:
+        """Put every item produced by func on outbox, for each item of inbox."""
+        try:
+            while True:
+                item = inbox.get()
+                if item is _DONE:
+                    break
+                for result in func(item):
+                    outbox.put(result)
+        except BaseException as e:
+            errors.append(e)
+            # drain the inbox so that upstream stages are never blocked
+            while inbox.get() is not _DONE:
+                pass
+        finally:
+            outbox.put(_DONE)
+
+    def stream(self, maxsize: int = 4) -> Iterator[dict]:
+        """Yield result rows as soon as they are recognized.
+
+        With a single job, selection, cleaning, segmentation and OCR each run
+        in their own thread, connected by queues holding at most maxsize
+        items, so a page enters OCR while the next one is being cleaned and
+        memory does not grow with the number of pages. With several jobs,
+        whole pages are processed by the pool and yielded in order.
+        """
+        if self.params.METHOD not in ("LINE", "BLOCK", "CELL"):
+            raise ValueError(f"Unsupported method: {self.params.METHOD}")
+
+        sources = []
+        for src in self.io.PATH_INPUT_FILES:
+            if self.resume and self.journal is not None and self.journal.is_complete(src):
+                yield from self.journal.rows(src, words=self.words)
+            else:
+                sources.append(src)
+
+        if self.jobs > 1:
+            with ProcessPoolExecutor(max_workers=self.jobs, initializer=_init_worker) as executor:
+                pending = deque()
+                for src in sources:
+                    pending.append(executor.submit(self._counted, self._process_page, src))
+                    # keep a bounded number of pages in flight
+                    if len(pending) >= self.jobs + maxsize:
+                        rows, counts = pending.popleft().result()
+                        self._add_counts(counts)
+                        yield from rows
+                while pending:
+                    rows, counts = pending.popleft().result()
+                    self._add_counts(counts)
+                    yield from rows
+            return
+
+        stages = [self._read_page, self._clean_page, self._split_page, self._recognize_unit]
+        queues = [queue.Queue(maxsize=maxsize) for _ in range(len(stages) + 1)]
+        errors = []
+        threads = [
+            threading.Thread(
+                target=self._run_stage, args=(func, queues[i], queues[i + 1], errors), daemon=True
+            )
+            for i, func in enumerate(stages)
+        ]
+        for thread in threads:
+            thread.start()
+
+        def feed():
+            for src in sources:
+                queues[0].put(src)
+            queues[0].put(_DONE)
+
+        threading.Thread(target=feed, daemon=True).start()
+
+        while True:
+            result = queues[-1].get()
+            if result is _DONE:
+                break
+            yield result
+
+        for thread in threads:
+            thread.join()
+        if errors:
+            raise errors[0]
+
+
+    def _page_key(self, src: Path) -> str:
+        """Work queue key of a page."""
+        metadata = utils.Metadata(src, must_exist=False)
+        return f"y{metadata.get_year()}-p{metadata.get_page()}"
+
+    def _work(self, queue_path: Path) -> int:
+        """Claim pages from a work queue and process them until none is left
+        (pool task). Returns the number of pages processed."""
+        work_queue = core.WorkQueue.open(queue_path, self.params.LEASE)
+        worker = f"{socket.gethostname()}-{os.getpid()}"
+        count = 0
+
+        while True:
+            item = work_queue.claim(worker)
+            if item is None:
+                # pages leased by other workers come back if their lease expires
+                if work_queue.counts()['leased'] == 0:
+                    break
+                time.sleep(min(work_queue.lease / 3, 30))
+                continue
+
+            key, payload = item
+            self.logger.info(f"{worker} claimed {key}")
+
+            stop = threading.Event()
+
+            def heartbeat():
+                while not stop.wait(work_queue.lease / 3):
+                    if not work_queue.heartbeat(key, worker):
+                        self.logger.warning(f"{worker} lost the lease on {key}")
+                        return
+
+            thread = threading.Thread(target=heartbeat, daemon=True)
+            thread.start()
+            try:
+                rows = self._process_page(self.io.path_input / payload)
+            except Exception as e:
+                # a broken page must not take down every worker claiming it
+                self.logger.exception(f"{worker} failed on {key}")
+                if work_queue.fail(key, worker, f"{type(e).__name__}: {e}", self.params.MAX_ATTEMPTS):
+                    self.logger.error(f"{key} failed {self.params.MAX_ATTEMPTS} times, left out of the queue")
+                continue
+            finally:
+                stop.set()
+                thread.join()
+
+            if work_queue.complete(key, worker, rows):
+                count += 1
+            else:
+                self.logger.warning(f"{worker} lost the lease on {key}, its rows are left to the new owner")
+
+        return count
+
+    def work(self, queue_path: Path) -> int:
+        """Run as one of the workers sharing a work queue.
+
+        Input pages are added to the queue (pages already known are left
+        as they are), then `jobs` local workers claim and process pages
+        until the queue is empty. Pages are referenced relative to the
+        input directory, so hosts may mount the shared filesystem anywhere.
+
+        Returns:
+            int: Number of pages processed by this host
+        """
+        work_queue = core.WorkQueue.open(queue_path, self.params.LEASE)
+        for src in self.io.PATH_INPUT_FILES:
+            work_queue.add(self._page_key(src), str(Path(src).relative_to(self.io.path_input)))
+
+        count = sum(self._map(self._work, [queue_path] * self.jobs))
+        self.logger.info(f"{count} pages processed - queue: {work_queue.counts()}")
+        return count
+
+    def merge(self, queue_path: Path) -> List[dict]:
+        """Result rows of every page completed in a work queue."""
+        work_queue = core.WorkQueue.open(queue_path, self.params.LEASE)
+        counts = work_queue.counts()
+        if counts['pending'] or counts['leased']:
+            self.logger.warning(f"Merging an unfinished queue: {counts}")
+        if counts['failed']:
+            self.logger.warning(f"{counts['failed']} pages failed and are left out: {counts}")
+        return [row for rows in work_queue.results() for row in rows]
+
+
+def write_stream(results: Iterable[dict], path: str, line: bool = True, words: bool = False) -> int:
+    """Append result rows to a CSV file as they arrive.
+
+    Returns:
+        int: Number of rows written
+    """
+    fieldnames = ['text', 'year', 'page', 'block'] + (['line'] if line else []) + (['words'] if words else [])
+    count = 0
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames)
+        writer.writeheader()
+        for result in results:
+            writer.writerow(result)
+            f.flush()
+            count += 1
+    return count
 
 
 def main():
@@ -129,16 +844,39 @@ def main():
         return
 
     # Initialize and run pipeline
-    pipeline = Pipeline()
-    pipeline.run_selection()
-    pipeline.run_preprocessing()
-    pipeline.run_block_segmentation()
-    results = pipeline.run_line_segmentation()
+    pipeline = Pipeline(jobs=args['jobs'], debug=args['debug'], cache=args['cache'],
+                        resume=args['resume'], journal=args['worker'] is None and args['merge'] is None,
+                        ocr_procs=args['ocr_procs'], engine=args['engine'],
+                        line_batch=args['line_batch'], memo=args['ocr_memo'],
+                        cascade=args['cascade'], words=args['words'], refine=args['refine'],
+                        fast_select=args['fast_select'], fast_deskew=args['fast_deskew'],
+                        tiled=args['tiled'], layouts=args['layouts'])
+    if args['worker']:
+        pipeline.work(args['worker'])
+        pipeline.summary()
+        return
+
+    if args['stream']:
+        write_stream(pipeline.stream(), 'output.csv', line=pipeline.params.METHOD != "BLOCK",
+                     words=pipeline.words)
+        pipeline.summary()
+        return
+
+    if args['merge']:
+        results = pipeline.merge(args['merge'])
+    elif args['in_memory']:
+        results = pipeline.run_in_memory()
+    else:
+        pipeline.run_selection()
+        pipeline.run_preprocessing()
+        pipeline.run_block_segmentation()
+        results = pipeline.run_line_segmentation()
     
     # Use pandas for better CSV handling
     df = pd.DataFrame(results)
     df = df.sort_values(['year', 'page', 'block', 'line'] if 'line' in df.columns else ['year', 'page', 'block'])
     df.to_csv('output.csv', index=False, encoding='utf-8')
+    pipeline.summary()
 
 
 if __name__ == "__main__":
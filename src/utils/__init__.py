@@ -14,6 +14,7 @@ from .lines import Lines
 from .morph import Morph
 from .remove import Remove
 from .segment import Segment
+from .grid import Grid
 from .should import Should
 from .transform import Transform
 from .draw import Draw
@@ -4,7 +4,7 @@ Each method converts a grayscale image to binary using various algorithms.
 """
 
 import cv2
-from typing import Tuple, Union
+from typing import Optional, Tuple, Union
 import numpy as np
 
 
@@ -38,6 +38,222 @@ class Binarise:
             cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU
         )
 
+    def otsu_threshold(self, hist: np.ndarray) -> int:
+        """
+        Compute Otsu's threshold from the histogram of an image.
+
+        Gives the threshold cv2.threshold() finds with THRESH_OTSU for the
+        image, from its histogram only, so that the histogram of a large
+        image can be accumulated over parts of it.
+
+        Args:
+            hist: 256 bin histogram of a grayscale image
+
+        Returns:
+            Threshold value
+
+        Raises:
+            ValueError: If hist does not have 256 bins
+        """
+        hist = np.asarray(hist, dtype=np.float64).ravel()
+        if len(hist) != 256:
+            raise ValueError("Histogram must have 256 bins")
+        total = hist.sum()
+        if total == 0:
+            return 0
+
+        # same steps and tolerance as OpenCV, for the same threshold
+        p = hist / total
+        mu = float(np.dot(np.arange(256), p))
+        epsilon = float(np.finfo(np.float32).eps)
+        q1 = mu1 = max_sigma = 0.0
+        threshold = 0
+        for i in range(256):
+            mu1 *= q1
+            q1 += p[i]
+            q2 = 1.0 - q1
+            if min(q1, q2) < epsilon or max(q1, q2) > 1.0 - epsilon:
+                continue
+            mu1 = (mu1 + i * p[i]) / q1
+            mu2 = (mu - q1 * mu1) / q2
+            sigma = q1 * q2 * (mu1 - mu2) ** 2
+            if sigma > max_sigma:
+                max_sigma = sigma
+                threshold = i
+        return threshold
+
+    # Rows whose local statistics are computed at once, which bounds the
+    # memory held by the integral images and the float arrays
+    LOCAL_ROWS = 64
+
+    def local_stats(self, src: np.ndarray, window: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Compute the mean and standard deviation of the window around each pixel.
+
+        Sums are read from integral images, so that a pixel costs the same
+        whatever the window size. Windows are cut by the borders of the
+        image, and rows are processed LOCAL_ROWS at a time from the integral
+        images of their own windows, so that the statistics of a row only
+        depend on the rows within its window.
+
+        Args:
+            src: Input grayscale image
+            window: Side of the square window, in pixels (odd)
+
+        Returns:
+            Tuple containing:
+                - local mean (float32)
+                - local standard deviation (float32)
+
+        Raises:
+            ValueError: If input image is not grayscale or window is not odd
+        """
+        if len(src.shape) != 2:
+            raise ValueError("Input image must be grayscale")
+        if window < 1 or window % 2 == 0:
+            raise ValueError("Window must be a positive odd number")
+
+        height, width = src.shape
+        half = window // 2
+        # pixel count of the windows along each axis
+        cols, rows = np.arange(width), np.arange(height)
+        count_x = np.minimum(cols + half + 1, width) - np.maximum(cols - half, 0)
+        count_y = np.minimum(rows + half + 1, height) - np.maximum(rows - half, 0)
+        mean = np.empty((height, width), dtype=np.float32)
+        std = np.empty((height, width), dtype=np.float32)
+
+        for y0 in range(0, height, self.LOCAL_ROWS):
+            y1 = min(height, y0 + self.LOCAL_ROWS)
+            top, bottom = max(0, y0 - half), min(height, y1 + half)
+            sums, squares = cv2.integral2(src[top:bottom], sdepth=cv2.CV_64F, sqdepth=cv2.CV_64F)
+
+            def box(integral):
+                # the integral is extended by its first and last rows and
+                # columns, so that windows cut by the borders are read as the
+                # others, with slices
+                padded = cv2.copyMakeBorder(
+                    integral, half - (y0 - top), half - (bottom - y1), half, half, cv2.BORDER_REPLICATE)
+                columns = padded[:, window:] - padded[:, :width]
+                return columns[window:] - columns[:y1 - y0]
+
+            count = np.outer(count_y[y0:y1], count_x).astype(np.float64)
+            total = box(sums)
+            # exact integers in float64: no negative variance from rounding
+            spread = count * box(squares) - total * total
+            mean[y0:y1] = total / count
+            std[y0:y1] = np.sqrt(spread) / count
+
+        return mean, std
+
+    def sauvola(self, src: np.ndarray, window: int = 51, k: float = 0.2,
+                r: float = 128) -> np.ndarray:
+        """
+        Apply Sauvola's local thresholding, ink in white.
+
+        The threshold of a pixel is m * (1 + k * (s / r - 1)), m and s being
+        the mean and standard deviation of its window: it drops below the
+        mean where the contrast is low, so that stains and uneven paper are
+        not taken for ink.
+
+        Args:
+            src: Input grayscale image
+            window: Side of the window, in pixels (odd, default: 51)
+            k: Weight of the contrast (default: 0.2)
+            r: Dynamic range of the standard deviation (default: 128)
+
+        Returns:
+            Binary image output (255 where src is below the threshold)
+        """
+        mean, std = self.local_stats(src, window)
+        # in place, as the statistics are as large as the image
+        threshold = std
+        threshold *= k / r
+        threshold += 1 - k
+        threshold *= mean
+        return self._below(src, threshold)
+
+    def niblack(self, src: np.ndarray, window: int = 51, k: float = -0.2) -> np.ndarray:
+        """
+        Apply Niblack's local thresholding, ink in white.
+
+        The threshold of a pixel is m + k * s, m and s being the mean and
+        standard deviation of its window. Noise of the background is kept
+        where the window holds no ink.
+
+        Args:
+            src: Input grayscale image
+            window: Side of the window, in pixels (odd, default: 51)
+            k: Weight of the standard deviation (default: -0.2)
+
+        Returns:
+            Binary image output (255 where src is below the threshold)
+        """
+        mean, std = self.local_stats(src, window)
+        threshold = std
+        threshold *= k
+        threshold += mean
+        return self._below(src, threshold)
+
+    def wolf(self, src: np.ndarray, window: int = 51, k: float = 0.5,
+             min_gray: Optional[float] = None, max_std: Optional[float] = None) -> np.ndarray:
+        """
+        Apply Wolf's local thresholding, ink in white.
+
+        Sauvola's threshold with the contrast normalised by the image: the
+        threshold of a pixel is (1 - k) * m + k * M + k * s / R * (m - M),
+        M being the darkest gray level of the image and R the largest
+        standard deviation of its windows, so that low contrast scans are
+        not thresholded too low.
+
+        Args:
+            src: Input grayscale image
+            window: Side of the window, in pixels (odd, default: 51)
+            k: Weight of the contrast (default: 0.5)
+            min_gray: M, when src is a part of a larger image (default: of src)
+            max_std: R, when src is a part of a larger image (default: of src)
+
+        Returns:
+            Binary image output (255 where src is below the threshold)
+        """
+        mean, std = self.local_stats(src, window)
+        if min_gray is None:
+            min_gray = float(src.min())
+        if max_std is None:
+            max_std = float(std.max())
+        # a uniform image has no contrast to normalise
+        threshold = std
+        threshold *= k / max_std if max_std > 0 else 0
+        threshold *= mean - min_gray
+        mean *= 1 - k
+        threshold += mean
+        threshold += k * min_gray
+        return self._below(src, threshold)
+
+    def local(self, src: np.ndarray, method: str, window: int = 51, **kwargs) -> np.ndarray:
+        """
+        Apply a local thresholding method, ink in white.
+
+        Args:
+            src: Input grayscale image
+            method: "sauvola", "niblack" or "wolf"
+            window: Side of the window, in pixels (odd, default: 51)
+            kwargs: Parameters of the method
+
+        Returns:
+            Binary image output
+
+        Raises:
+            ValueError: If method is unknown
+        """
+        methods = {'sauvola': self.sauvola, 'niblack': self.niblack, 'wolf': self.wolf}
+        if method not in methods:
+            raise ValueError(f"Unsupported binarisation method: {method}")
+        return methods[method](src, window, **kwargs)
+
+    def _below(self, src: np.ndarray, threshold: np.ndarray) -> np.ndarray:
+        """255 where src is below the threshold, 0 elsewhere."""
+        return (src < threshold).astype(np.uint8) * 255
+
     def adaptive(self, src: np.ndarray, max_value: int = 255) -> np.ndarray:
         """
         Apply adaptive thresholding using mean neighborhood value.
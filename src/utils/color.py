@@ -16,14 +16,17 @@ class Color:
         Convert an RGB/BGR image to grayscale.
 
         Args:
-            src: Input image in BGR format (OpenCV default)
+            src: Input image in BGR format (OpenCV default), or already
+                grayscale (single channel), which is returned as is
 
         Returns:
             Grayscale version of the input image
 
         Raises:
-            ValueError: If input image is not in BGR format (3 channels)
+            ValueError: If input image is neither grayscale nor BGR (3 channels)
         """
+        if len(src.shape) == 2:
+            return src
         if len(src.shape) != 3 or src.shape[2] != 3:
             raise ValueError("Input image must be in BGR format (3 channels)")
 
@@ -0,0 +1,152 @@
+"""
+Module for table grid operations.
+Provides utilities to find the cells of the ruled tables of a page from the
+mask of its rulings, and the text rows of a ruled band from its ink profile.
+"""
+
+import numpy as np
+from typing import List, Tuple
+
+
+class Grid:
+    """Table grid of a page, found from the mask of its rulings.
+
+    The mask is added by rows, all at once or strip by strip: only its row
+    profile and its column profile over groups of GROUP rows are kept.
+    Horizontal rulings are the rows of the mask spanning MIN_WIDTH of the
+    page, and cut the page into bands. The vertical rulings of a band are
+    the columns of the mask covering MIN_COVER of the band.
+    """
+
+    # Share of the page width a horizontal ruling spans
+    MIN_WIDTH = 0.3
+    # Share of the height of a band its vertical rulings cover
+    MIN_COVER = 0.8
+    # Rows summed together in the column profile (bands thinner than
+    # twice as many rows have no cells)
+    GROUP = 16
+
+    def __init__(self, shape: Tuple[int, int]):
+        """
+        Initialize an empty grid.
+
+        Args:
+            shape: (height, width) of the page
+        """
+        height, width = shape[:2]
+        self.shape = (height, width)
+        self.rows = np.zeros(height, dtype=np.int32)
+        self.columns = np.zeros((-(-height // self.GROUP), width), dtype=np.int32)
+
+    def add(self, mask: np.ndarray, y0: int = 0) -> None:
+        """
+        Add rows of the ruling mask of the page.
+
+        Args:
+            mask: Rows y0 to y0 + len(mask) of the mask (rulings in white)
+            y0: First row of the page mask holds
+        """
+        if not len(mask):
+            return
+        ruled = mask > 0
+        ys = np.arange(y0, y0 + len(mask))
+        self.rows[ys] = ruled.sum(axis=1)
+        # first row of mask in each group
+        starts = np.r_[0, np.flatnonzero(ys[1:] % self.GROUP == 0) + 1]
+        self.columns[ys[starts] // self.GROUP] += np.add.reduceat(ruled, starts, axis=0, dtype=np.int32)
+
+    def cells(self) -> np.ndarray:
+        """
+        Cells of the ruled tables of the page, band by band.
+
+        Returns:
+            (N, 6) int32 array: band, column, x0, y0, x1, y1 of each cell,
+            (x0, y0, x1, y1) being the bounds of its area within the rulings
+        """
+        height, width = self.shape
+        cells = []
+        rulings = self.runs(self.rows >= self.MIN_WIDTH * width)
+        bands = [(top[1], bottom[0]) for top, bottom in zip(rulings, rulings[1:])]
+        for band, (y0, y1) in enumerate(bands):
+            # groups of rows within the band
+            g0, g1 = -(-y0 // self.GROUP), y1 // self.GROUP
+            if g1 <= g0:
+                continue
+            cover = self.columns[g0:g1].sum(axis=0) / ((g1 - g0) * self.GROUP)
+            columns = self.runs(cover >= self.MIN_COVER)
+            for column, (left, right) in enumerate(zip(columns, columns[1:])):
+                cells.append((band, column, left[1], y0, right[0], y1))
+
+        return np.array(cells, dtype=np.int32).reshape(-1, 6)
+
+    def runs(self, flags: np.ndarray) -> List[Tuple[int, int]]:
+        """
+        Runs of consecutive set flags.
+
+        Args:
+            flags: 1D boolean array
+
+        Returns:
+            (start, stop) of each run, stop excluded
+        """
+        edges = np.flatnonzero(np.diff(np.r_[0, flags.astype(np.int8), 0]))
+        return [(int(start), int(stop)) for start, stop in zip(edges[::2], edges[1::2])]
+
+    def pitch(self, profiles: List[np.ndarray], min_height: int = 10) -> float:
+        """
+        Height of a text row, from the ink profiles of bands.
+
+        Runs of ink of the bands not higher than 1.5 times the lowest one are
+        single text rows: the pitch is their median height.
+
+        Args:
+            profiles: Ink pixels of each row of each band
+            min_height: Height below which a run of ink is left out (stains,
+                remains of rulings)
+
+        Returns:
+            Height of a text row in pixels (0 if the bands hold no ink)
+        """
+        heights = np.array([
+            stop - start
+            for profile in profiles
+            for start, stop in self.runs(profile > 0)
+            if stop - start >= min_height
+        ])
+        if not len(heights):
+            return 0.0
+        return float(np.median(heights[heights < 1.5 * heights.min()]))
+
+    def text_rows(self, profile: np.ndarray, pitch: float, min_height: int = 10) -> List[Tuple[int, int]]:
+        """
+        Split the ink profile of a band into its text rows.
+
+        Rows of ink separated by blank rows are text rows, unless higher than
+        a text row: ascenders and descenders may join the rows of a table,
+        which are then cut at the least inked rows around their expected
+        bounds. Rows are shared by the cells of the band, so that a row of
+        the table is the same row in all its columns.
+
+        Args:
+            profile: Ink pixels of each row of the band
+            pitch: Height of a text row (see pitch())
+            min_height: Height below which a run of ink is left out
+
+        Returns:
+            (start, stop) of each text row within the band, stop excluded
+        """
+        rows = []
+        for start, stop in self.runs(profile > 0):
+            if stop - start < min_height:
+                continue
+            count = max(1, round((stop - start) / pitch)) if pitch else 1
+            cuts = [start]
+            reach = max(1, int(pitch // 3))
+            for i in range(1, count):
+                expected = start + round(i * (stop - start) / count)
+                # least inked row around the expected bound
+                lo, hi = max(cuts[-1] + 1, expected - reach), min(stop - 1, expected + reach + 1)
+                cuts.append(lo + int(np.argmin(profile[lo:hi])) if hi > lo else expected)
+            cuts.append(stop)
+            rows.extend(zip(cuts[:-1], cuts[1:]))
+        return rows
@@ -6,11 +6,19 @@ Provides utilities to detect horizontal and vertical lines using morphological a
 import numpy as np
 import cv2
 from typing import Optional, Tuple
+from .morph import Morph
 
 
 class Lines:
     """Class containing line detection utilities."""
 
+    # Morphological operations (Morph method, width, height, iterations)
+    # applied in turn to find horizontal and vertical lines
+    HORIZONTAL = (('to_erode', 20, 1, 2), ('to_dilate', 20, 4, 2),
+                  ('to_dilate', 50, 1, 4), ('to_erode', 50, 1, 4))
+    VERTICAL = (('to_erode', 1, 20, 2), ('to_dilate', 3, 40, 2),
+                ('to_dilate', 1, 50, 4), ('to_erode', 1, 50, 4))
+
     def find_lines(self, src: np.ndarray) -> np.ndarray:
         """
         Find lines in a document using morphological operations.
@@ -27,31 +35,43 @@ class Lines:
         if not isinstance(src, np.ndarray):
             raise TypeError("Input must be a numpy array")
 
-        hlines = src.copy()
-        vlines = src.copy()
+        morph = Morph()
 
         # Horizontal lines detection
-        h_kernel1 = cv2.getStructuringElement(cv2.MORPH_RECT, (20, 1))
-        h_kernel2 = cv2.getStructuringElement(cv2.MORPH_RECT, (20, 4))
-        h_kernel3 = cv2.getStructuringElement(cv2.MORPH_RECT, (50, 1))
-
-        hlines = cv2.erode(hlines, h_kernel1, iterations=2)
-        hlines = cv2.dilate(hlines, h_kernel2, iterations=2)
-        hlines = cv2.dilate(hlines, h_kernel3, iterations=4)
-        hlines = cv2.erode(hlines, h_kernel3, iterations=4)
+        hlines = src
+        for operation, hsize, vsize, iterations in self.HORIZONTAL:
+            hlines = getattr(morph, operation)(hlines, hsize, vsize, iterations)
 
         # Vertical lines detection
-        v_kernel1 = cv2.getStructuringElement(cv2.MORPH_RECT, (1, 20))
-        v_kernel2 = cv2.getStructuringElement(cv2.MORPH_RECT, (3, 40))
-        v_kernel3 = cv2.getStructuringElement(cv2.MORPH_RECT, (1, 50))
-
-        vlines = cv2.erode(vlines, v_kernel1, iterations=2)
-        vlines = cv2.dilate(vlines, v_kernel2, iterations=2)
-        vlines = cv2.dilate(vlines, v_kernel3, iterations=4)
-        vlines = cv2.erode(vlines, v_kernel3, iterations=4)
+        vlines = src
+        for operation, hsize, vsize, iterations in self.VERTICAL:
+            vlines = getattr(morph, operation)(vlines, hsize, vsize, iterations)
 
         return hlines + vlines
 
+    def halo(self) -> Tuple[int, int]:
+        """
+        Reach of find_lines() around a pixel.
+
+        A pixel of the output of find_lines() only depends on the input
+        pixels within that many columns and rows of it, the sum of the
+        reaches of the successive kernels: find_lines() gives the same
+        output on a tile of an image extended by the halo as on the image.
+
+        Returns:
+            (columns, rows) of the halo
+        """
+        halo = [0, 0]
+        for operations in (self.HORIZONTAL, self.VERTICAL):
+            reach = [0, 0]
+            for _, hsize, vsize, iterations in operations:
+                for axis, size in enumerate((hsize, vsize)):
+                    # kernel of the merged iterations, anchored as by OpenCV
+                    length, anchor = iterations * (size - 1) + 1, iterations * (size // 2)
+                    reach[axis] += max(anchor, length - 1 - anchor)
+            halo = [max(halo[axis], reach[axis]) for axis in range(2)]
+        return tuple(halo)
+
     def houghlinesS(self, src: np.ndarray) -> Optional[np.ndarray]:
         """
         Find lines using standard Hough transform.
@@ -78,12 +98,14 @@ class Lines:
 
         return cv2.HoughLines(src, **params)
 
-    def houghlinesP(self, src: np.ndarray) -> Optional[np.ndarray]:
+    def houghlinesP(self, src: np.ndarray, scale: float = 1.0) -> Optional[np.ndarray]:
         """
         Find lines using probabilistic Hough transform.
 
         Args:
             src: Input binary image
+            scale: Size of src relative to the full resolution page, the
+                lengths and vote threshold being scaled accordingly
 
         Returns:
             Array of detected line segments or None if no lines found
@@ -101,5 +123,9 @@ class Lines:
             'minLineLength': 250,
             'maxLineGap': 4
         }
+        if scale != 1.0:
+            params['threshold'] = max(1, round(params['threshold'] * scale))
+            params['minLineLength'] = params['minLineLength'] * scale
+            params['maxLineGap'] = max(1, round(params['maxLineGap'] * scale))
 
         return cv2.HoughLinesP(src, **params)
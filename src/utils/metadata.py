@@ -6,9 +6,9 @@ from typing import Union, Optional
 from PIL import Image
 
 class Metadata:
-    def __init__(self, src: Union[str, pathlib.Path]):
+    def __init__(self, src: Union[str, pathlib.Path], must_exist: bool = True):
         self.src = pathlib.Path(src)
-        if not self.src.exists():
+        if must_exist and not self.src.exists():
             raise FileNotFoundError(f"Source file {src} not found")
             
     def get_year(self) -> str:
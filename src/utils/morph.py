@@ -3,17 +3,95 @@ Module for morphological operations on images.
 Provides utilities for basic morphological transformations using OpenCV.
 """
 
+from functools import lru_cache
 import cv2
 import numpy as np
 from typing import Tuple
 
 
 class Morph:
-    """Class containing morphological transformation utilities."""
+    """Class containing morphological transformation utilities.
+
+    Rectangular operations give the same output as cv2.erode, cv2.dilate
+    and cv2.morphologyEx with a MORPH_RECT kernel of the same size and
+    iterations, and the default anchor and border. Iterations are merged
+    into a single kernel, as OpenCV does, and the kernel is applied row
+    then column. OpenCV costs the length of the kernel per pixel, so sides
+    of at least LINE_MIN_LENGTH pixels are applied as line operators
+    instead: the min (or max) over a window of length L is the min of two
+    overlapping windows of the largest power of two below L, computed by
+    log2(L) shifted mins.
+    """
+
+    # Kernel side from which line operators are faster than OpenCV
+    LINE_MIN_LENGTH = 80
+
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def kernel(shape: int, size: Tuple[int, int]) -> np.ndarray:
+        """
+        Structuring element, created once per shape and size.
+
+        Args:
+            shape: OpenCV shape (cv2.MORPH_RECT, cv2.MORPH_CROSS, ...)
+            size: (width, height) of the kernel
+
+        Returns:
+            Kernel shared by every caller, which must not modify it
+        """
+        return cv2.getStructuringElement(shape, size)
+
+    def _rect(self, src: np.ndarray, erode: bool, hsize: int, vsize: int,
+              iterations: int) -> np.ndarray:
+        """Erosion or dilation by a rectangle, as cv2.erode / cv2.dilate."""
+        # single kernel equivalent to the iterations, with the anchor OpenCV gives it
+        width, height = iterations * (hsize - 1) + 1, iterations * (vsize - 1) + 1
+        anchor = (iterations * (hsize // 2), iterations * (vsize // 2))
+        operation = cv2.erode if erode else cv2.dilate
+
+        if src.ndim != 2 or max(width, height) < self.LINE_MIN_LENGTH:
+            kernel = self.kernel(cv2.MORPH_RECT, (width, height))
+            return operation(src, kernel, anchor=anchor)
+
+        dst = src
+        for axis, length in ((1, width), (0, height)):
+            if length >= self.LINE_MIN_LENGTH:
+                dst = self._line(dst, erode, length, anchor[1 - axis], axis)
+            elif length > 1:
+                size = (length, 1) if axis == 1 else (1, length)
+                origin = (anchor[0], 0) if axis == 1 else (0, anchor[1])
+                dst = operation(dst, self.kernel(cv2.MORPH_RECT, size), anchor=origin)
+        return dst
+
+    @staticmethod
+    def _line(src: np.ndarray, erode: bool, length: int, anchor: int, axis: int) -> np.ndarray:
+        """Erosion or dilation of a 2D image by a line along an axis."""
+        op = np.minimum if erode else np.maximum
+        # outside the image, erosion sees the maximum value and dilation the
+        # minimum one, as with OpenCV default border
+        info = np.iinfo(src.dtype) if np.issubdtype(src.dtype, np.integer) else np.finfo(src.dtype)
+        border = float(info.max if erode else info.min)
+        before, after = anchor, length - 1 - anchor
+        if axis == 1:
+            pad = cv2.copyMakeBorder(src, 0, 0, before, after, cv2.BORDER_CONSTANT, value=border)
+        else:
+            pad = cv2.copyMakeBorder(src, before, after, 0, 0, cv2.BORDER_CONSTANT, value=border)
+
+        # window[x] = op over pad[x:x + power], doubling power while it fits
+        window = np.moveaxis(pad, axis, 0)
+        power = 1
+        while 2 * power <= length:
+            window = op(window[:-power], window[power:])
+            power *= 2
+
+        # min and max are idempotent: two windows of `power` cover `length`
+        size = src.shape[axis]
+        dst = op(window[:size], window[length - power:length - power + size])
+        return np.ascontiguousarray(np.moveaxis(dst, 0, axis))
 
     def to_close(self, src: np.ndarray, hsize: int, vsize: int, iterations: int) -> np.ndarray:
         """
-        Apply closing morphological operation.
+        Apply closing with rectangular kernel.
 
         Args:
             src: Input image
@@ -33,12 +111,12 @@ class Morph:
         if any(val <= 0 for val in [hsize, vsize, iterations]):
             raise ValueError("Kernel sizes and iterations must be positive")
 
-        kernel = cv2.getStructuringElement(cv2.MORPH_CLOSE, (hsize, vsize))
-        return cv2.morphologyEx(src, kernel, iterations=iterations)
+        dilated = self._rect(src, False, hsize, vsize, iterations)
+        return self._rect(dilated, True, hsize, vsize, iterations)
 
     def to_open(self, src: np.ndarray, hsize: int, vsize: int, iterations: int) -> np.ndarray:
         """
-        Apply opening morphological operation.
+        Apply opening with rectangular kernel.
 
         Args:
             src: Input image
@@ -58,8 +136,8 @@ class Morph:
         if any(val <= 0 for val in [hsize, vsize, iterations]):
             raise ValueError("Kernel sizes and iterations must be positive")
 
-        kernel = cv2.getStructuringElement(cv2.MORPH_OPEN, (hsize, vsize))
-        return cv2.morphologyEx(src, kernel, iterations=iterations)
+        eroded = self._rect(src, True, hsize, vsize, iterations)
+        return self._rect(eroded, False, hsize, vsize, iterations)
 
     def to_dilate(self, src: np.ndarray, hsize: int, vsize: int, iterations: int) -> np.ndarray:
         """
@@ -83,8 +161,7 @@ class Morph:
         if any(val <= 0 for val in [hsize, vsize, iterations]):
             raise ValueError("Kernel sizes and iterations must be positive")
 
-        kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (hsize, vsize))
-        return cv2.dilate(src, kernel, (-1, -1), iterations=iterations)
+        return self._rect(src, False, hsize, vsize, iterations)
 
     def to_erode(self, src: np.ndarray, hsize: int, vsize: int, iterations: int) -> np.ndarray:
         """
@@ -108,5 +185,4 @@ class Morph:
         if any(val <= 0 for val in [hsize, vsize, iterations]):
             raise ValueError("Kernel sizes and iterations must be positive")
 
-        kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (hsize, vsize))
-        return cv2.erode(src, kernel, (-1, -1), iterations=iterations)
+        return self._rect(src, True, hsize, vsize, iterations)
@@ -5,7 +5,9 @@ Provides utilities to clean and enhance image quality using OpenCV.
 
 import cv2
 import numpy as np
-from typing import Tuple
+from typing import List, Tuple
+from .color import Color
+from .morph import Morph
 
 
 class Remove:
@@ -36,13 +38,13 @@ class Remove:
         Removes remaining spots of digits and other noise using morphological operations.
 
         Args:
-            src: Input BGR image
+            src: Input grayscale (or BGR) image
             height: Height of the image row in pixels
 
         Returns:
             Tuple containing:
                 - Binary mask of cleaned regions
-                - Cleaned image with artifacts removed
+                - Cleaned image with artifacts removed, with the channels of src
 
         Raises:
             TypeError: If src is not a numpy array
@@ -53,36 +55,64 @@ class Remove:
         if height <= 0:
             raise ValueError("Height must be positive")
 
+        return self._artifacts(src, Color().to_gray(src), height)
+
+    def artifacts_batch(self, src: np.ndarray, regions: List[Tuple[int, int, int, int, int]]
+                        ) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Remove artifacts in every line of a block in one call.
+
+        A BGR block is converted to grayscale once, and each line is cleaned
+        on its region of the block as artifacts() cleans its crop, with the
+        same output.
+
+        Args:
+            src: Input grayscale (or BGR) image of the block
+            regions: (x0, y0, x1, y1, height) of each line, (x0, y0, x1, y1)
+                being the bounds of its crop and height the one of the row
+
+        Returns:
+            (mask, cleaned image) of each line, as artifacts() returns them
+
+        Raises:
+            TypeError: If src is not a numpy array
+            ValueError: If a height is negative
+        """
+        if not isinstance(src, np.ndarray):
+            raise TypeError("Input must be a numpy array")
+        if any(height <= 0 for *_, height in regions):
+            raise ValueError("Height must be positive")
+
+        gray = Color().to_gray(src)
+        return [
+            self._artifacts(src[y0:y1, x0:x1], gray[y0:y1, x0:x1], height)
+            for x0, y0, x1, y1, height in regions
+        ]
+
+    def _artifacts(self, src: np.ndarray, gray: np.ndarray, height: int
+                   ) -> Tuple[np.ndarray, np.ndarray]:
+        """Keep the largest region of ink of a line, whiten the rest."""
         # Constants
         H_LIM_SEGMENTATION = 75
 
-        # Convert to grayscale and threshold
-        gray = cv2.cvtColor(src, cv2.COLOR_BGR2GRAY)
+        # Threshold, then apply morphological operations based on height
+        # (the 120x1 and 1x4 crosses are rectangles)
         thresh = cv2.threshold(gray, 127, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)[1]
-        mask = np.zeros(src.shape, dtype=np.uint8)
-
-        # Apply morphological operations based on height
-        if height < H_LIM_SEGMENTATION:
-            kclose = cv2.getStructuringElement(cv2.MORPH_CROSS, (120, 1))
-            thresh = cv2.morphologyEx(thresh, cv2.MORPH_CLOSE, kclose, iterations=1)
-        else:
-            kclose = cv2.getStructuringElement(cv2.MORPH_CROSS, (120, 1))
-            kopen = cv2.getStructuringElement(cv2.MORPH_CROSS, (1, 4))
-            thresh = cv2.morphologyEx(thresh, cv2.MORPH_CLOSE, kclose, iterations=1)
-            thresh = cv2.morphologyEx(thresh, cv2.MORPH_OPEN, kopen, iterations=1)
-
-        # Find and sort contours
-        cnts = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-        cnts = cnts[0] if len(cnts) == 2 else cnts[1]
-        cnts = sorted(cnts, key=cv2.contourArea, reverse=True)
-
-        # Draw contours on mask
-        if cnts:
-            cv2.drawContours(mask, [cnts[0]], -1, (255, 255, 255), -1)
+        thresh = Morph().to_close(thresh, 120, 1, 1)
+        if height >= H_LIM_SEGMENTATION:
+            thresh = Morph().to_open(thresh, 1, 4, 1)
 
-        # Apply mask and set background to white
-        mask = cv2.cvtColor(mask, cv2.COLOR_BGR2GRAY)
-        result = cv2.bitwise_and(src, src, mask=mask)
-        result[mask == 0] = (255, 255, 255)
+        # Fill the largest contour (the first one of equal areas) on a single channel mask
+        cnts, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        mask = np.zeros(thresh.shape, dtype=np.uint8)
+        if cnts:
+            largest = int(np.argmax([cv2.contourArea(cnt) for cnt in cnts]))
+            cv2.drawContours(mask, cnts, largest, 255, -1)
+
+        # Keep the image under the mask, set background to white
+        background = cv2.bitwise_not(mask)
+        if src.ndim == 3:
+            background = cv2.cvtColor(background, cv2.COLOR_GRAY2BGR)
+        result = cv2.bitwise_or(src, background)
 
         return mask, result
@@ -85,7 +85,7 @@ class Should:
             'digit': r'(?:.\n?|^)+([1-9]|[1-3][1-9]+)(?:\n|\s{2,})+(.*)',
             'string': r'(?:.\n?|^)+((?:Level|Station|Non|Mean|Year|'
                      r'Pressure|Temperature|Relative|Humidity|Wind|Speed|'
-                     r'Jan|Feb|Mar|April|May|June|Jul|Aug|Sept|Oct|Nov|Dec)'
+                     r'Jan|Feb|Mar|April|May|June|Jul|Aug|Sept|Oct|Nov|Dec))'
                      r'(?:\.|\,|\-|\n|\s{1})+(.*)'
         }
 
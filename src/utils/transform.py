@@ -5,7 +5,7 @@ Provides utilities for rotating and estimating skew angles in images.
 
 import cv2
 import numpy as np
-from typing import Tuple, Union
+from typing import Optional, Tuple, Union
 
 
 class Transform:
@@ -27,18 +27,104 @@ class Transform:
         if not isinstance(src, np.ndarray):
             raise TypeError("Input must be a numpy array")
 
-        non_zero_pixels = cv2.findNonZero(src)
-        _, _, angle = cv2.minAreaRect(non_zero_pixels)
-        
+        return self.estimate_angle_points(cv2.findNonZero(src))
+
+    def estimate_angle_points(self, points: np.ndarray) -> float:
+        """
+        Estimate skew angle of the document from the coordinates of its ink.
+
+        The angle is the one of the minimum area rectangle of the points,
+        which only depends on their convex hull: the hulls of the parts of
+        a page give the angle of the whole page.
+
+        Args:
+            points: (x, y) coordinates of the ink pixels, or of the vertices
+                of their convex hull, as cv2.findNonZero returns them
+
+        Returns:
+            Estimated rotation angle in degrees (0 without any point)
+        """
+        if points is None or len(points) == 0:
+            return 0.0
+
+        _, _, angle = cv2.minAreaRect(points)
+
         return angle + 90 if angle <= -45 else angle
 
-    def rotate(self, src: np.ndarray, angle: float) -> np.ndarray:
+    def estimate_angle_profile(self, src: np.ndarray, max_angle: float = 5.0,
+                               precision: float = 0.05, stride: int = 4,
+                               shape: Optional[Tuple[int, int]] = None) -> float:
+        """
+        Estimate skew angle of the document from projection profiles.
+
+        Ink pixels are sampled every `stride` rows and columns, and the angle
+        whose rotation gives the sharpest row profile (text lines and table
+        rulings falling on as few rows as possible) is searched for within
+        ±max_angle: by steps of max_angle / 10 first, then by steps ten times
+        smaller around the best angle, down to `precision`. The angle is 0
+        when no orientation stands out.
+
+        Args:
+            src: Input binary image
+            max_angle: Largest skew angle considered, in degrees
+            precision: Step of the last search, in degrees
+            stride: Sampling step of the pixels
+            shape: Shape of the page when src is the page already sampled
+                (page[::stride, ::stride]), which a large page can be
+                sampled into part by part
+
+        Returns:
+            Estimated rotation angle in degrees, in the convention of
+            estimate_angle() (rotate() by that angle deskews the document)
+
+        Raises:
+            TypeError: If src is not a numpy array
+        """
+        if not isinstance(src, np.ndarray):
+            raise TypeError("Input must be a numpy array")
+
+        if shape is None:
+            shape = src.shape[:2]
+            src = src[::stride, ::stride]
+        ys, xs = np.nonzero(src)
+        if len(xs) == 0:
+            return 0.0
+        # coordinates relative to the centre of the page
+        xs = xs.astype(np.float32) * stride - shape[1] / 2
+        ys = ys.astype(np.float32) * stride - shape[0] / 2
+
+        def sharpness(angle: float) -> float:
+            # row of each pixel once rotated as rotate() would, binned by stride
+            theta = np.deg2rad(angle)
+            rows = np.floor((ys * np.cos(theta) - xs * np.sin(theta)) / stride).astype(np.int64)
+            profile = np.bincount(rows - rows.min()).astype(np.float64)
+            return float(np.dot(profile, profile))
+
+        low, high, step = -max_angle, max_angle, max_angle / 10
+        while True:
+            angles = np.arange(low, high + step / 2, step)
+            scores = [sharpness(angle) for angle in angles]
+            if step == max_angle / 10 and max(scores) - min(scores) < 0.05 * max(scores):
+                # no orientation stands out (picture, blank or rotated page)
+                return 0.0
+            best = float(angles[np.argmax(scores)])
+            if step <= precision:
+                # drop the rounding errors of the steps
+                return round(best, 6)
+            low, high = max(best - step, -max_angle), min(best + step, max_angle)
+            step = max(step / 10, precision)
+
+    def rotate(self, src: np.ndarray, angle: float, min_angle: float = 0.0,
+               interpolation: int = cv2.INTER_CUBIC) -> np.ndarray:
         """
         Rotate a document by specified angle.
 
         Args:
             src: Input image
             angle: Rotation angle in degrees
+            min_angle: Angle in degrees below which src is returned as is
+            interpolation: OpenCV interpolation flag (INTER_NEAREST keeps a
+                binary image binary)
 
         Returns:
             Rotated image
@@ -52,8 +138,38 @@ class Transform:
         if not isinstance(angle, (int, float)):
             raise ValueError("Angle must be a number")
 
+        if abs(angle) < min_angle:
+            return src
+
+        rotation_matrix, (bound_w, bound_h) = self.rotation(src.shape[:2], angle)
+
+        # Apply rotation
+        dst = cv2.warpAffine(
+            src,
+            rotation_matrix,
+            (bound_w, bound_h),
+            flags=interpolation,
+            borderMode=cv2.BORDER_REPLICATE
+        )
+
+        return dst
+
+    def rotation(self, shape: Tuple[int, int], angle: float) -> Tuple[np.ndarray, Tuple[int, int]]:
+        """
+        Rotation matrix of rotate() and size of the rotated image.
+
+        Args:
+            shape: (height, width) of the image
+            angle: Rotation angle in degrees
+
+        Returns:
+            Tuple containing:
+                - 2x3 matrix mapping the image to the rotated image
+                - (width, height) of the rotated image, which holds the
+                  whole image
+        """
         # Get image dimensions
-        height, width = src.shape[:2]
+        height, width = shape
         center = (width/2, height/2)
 
         # Calculate rotation matrix
@@ -69,13 +185,4 @@ class Transform:
         rotation_matrix[0, 2] += bound_w/2 - center[0]
         rotation_matrix[1, 2] += bound_h/2 - center[1]
 
-        # Apply rotation
-        dst = cv2.warpAffine(
-            src,
-            rotation_matrix,
-            (bound_w, bound_h),
-            flags=cv2.INTER_CUBIC,
-            borderMode=cv2.BORDER_REPLICATE
-        )
-
-        return dst
+        return rotation_matrix, (bound_w, bound_h)
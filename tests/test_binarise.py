@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+from utils import Binarise
+
+
+def test_local_stats():
+    """Test the window statistics against the windows cut by the borders."""
+    rng = np.random.default_rng(0)
+    src = rng.integers(0, 256, (150, 40)).astype(np.uint8)
+    binarise = Binarise()
+    # rows processed by several chunks
+    binarise.LOCAL_ROWS = 16
+    mean, std = binarise.local_stats(src, 15)
+    for y, x in [(0, 0), (7, 39), (75, 20), (149, 3), (64, 0)]:
+        window = src[max(0, y - 7):y + 8, max(0, x - 7):x + 8].astype(np.float64)
+        assert mean[y, x] == pytest.approx(window.mean(), abs=1e-4)
+        assert std[y, x] == pytest.approx(window.std(), abs=1e-4)
+
+    with pytest.raises(ValueError):
+        binarise.local_stats(src, 16)
+
+
+def test_uneven_background():
+    """Test that local methods find ink on a shaded page, where Otsu fails."""
+    # paper darkening from left to right, ink a bit darker than the paper
+    src = np.tile(np.linspace(230, 90, 400), (200, 1)).astype(np.uint8)
+    ink = np.zeros(src.shape, bool)
+    ink[50:150:20, 20:380] = True
+    ink[50:150:20, :] &= np.arange(400) % 10 < 6
+    src[ink] = (src[ink] * 0.6).astype(np.uint8)
+
+    binarise = Binarise()
+    otsu = binarise.otsu(src)[1] > 0
+    assert (otsu & ~ink).mean() > 0.1
+    for method in ('sauvola', 'niblack', 'wolf'):
+        binary = binarise.local(src, method, 31) > 0
+        assert binary[ink].mean() > 0.95
+        # Niblack keeps some noise of the background
+        assert (binary & ~ink).mean() < (0.1 if method == 'niblack' else 0.01)
+
+    with pytest.raises(ValueError):
+        binarise.local(src, 'bernsen')
@@ -0,0 +1,60 @@
+import os
+import numpy as np
+import pytest
+from core import Cache
+
+
+@pytest.fixture
+def cache(tmp_path):
+    """Fixture providing an empty cache."""
+    return Cache(tmp_path / 'cache', max_bytes=10 * 1024 * 1024)
+
+
+def test_roundtrip(cache):
+    """Test that stored values are returned unchanged."""
+    value = [('line', np.arange(12, dtype=np.uint8).reshape(3, 4))]
+    key = Cache.digest('split', 'v1', b'page')
+    cache.put(key, value)
+
+    assert key in cache
+    stored = cache.get(key)
+    assert stored[0][0] == 'line'
+    assert np.array_equal(stored[0][1], value[0][1])
+    assert (cache.hits, cache.misses) == (1, 0)
+
+
+def test_miss(cache):
+    """Test that a missing key returns the default."""
+    missing = object()
+    assert cache.get(Cache.digest('unknown'), missing) is missing
+    assert cache.misses == 1
+
+
+def test_digest():
+    """Test that digests depend on array content and shape."""
+    img = np.zeros((4, 4), dtype=np.uint8)
+    assert Cache.digest(img) == Cache.digest(img.copy())
+    assert Cache.digest(img) != Cache.digest(img.reshape(2, 8))
+    img2 = img.copy()
+    img2[0, 0] = 1
+    assert Cache.digest(img) != Cache.digest(img2)
+
+
+def test_lru_eviction(tmp_path):
+    """Test that least recently used entries are evicted first."""
+    rng = np.random.default_rng(0)
+    cache = Cache(tmp_path / 'cache', max_bytes=2500)
+    keys = [Cache.digest(i) for i in range(3)]
+
+    for i, key in enumerate(keys[:2]):
+        cache.put(key, rng.integers(0, 255, 1000, dtype=np.uint8))
+        os.utime(cache._file(key), (i, i))
+
+    # reading the oldest entry makes it the most recently used
+    cache.get(keys[0])
+    cache.put(keys[2], rng.integers(0, 255, 1000, dtype=np.uint8))
+
+    assert keys[0] in cache
+    assert keys[1] not in cache
+    assert keys[2] in cache
+    assert cache.size() <= 2500
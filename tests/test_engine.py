@@ -0,0 +1,15 @@
+import pytest
+from core import Engine, PytesseractEngine
+
+
+def test_engine_is_created_once_per_process():
+    """Test that the engine of a backend is created once per process."""
+    engine = Engine.get('pytesseract')
+    assert isinstance(engine, PytesseractEngine)
+    assert Engine.get('pytesseract') is engine
+
+
+def test_unknown_engine():
+    """Test that an unknown backend name is rejected."""
+    with pytest.raises(ValueError):
+        Engine.get('unknown')
@@ -0,0 +1,56 @@
+import numpy as np
+from utils import Grid
+
+
+def ruled(shape=(400, 600)):
+    """Mask of a table of 3 bands (the middle one not ruled) and 4 columns."""
+    mask = np.zeros(shape, np.uint8)
+    for y in (20, 100, 150, 380):
+        mask[y:y + 4, 40:560] = 255
+    for x in (40, 170, 300, 430, 556):
+        mask[20:150, x:x + 4] = 255
+        mask[150:384, x:x + 4] = 255
+    # no ruling between the columns 1 and 2 of the last band
+    mask[154:380, 170:174] = 0
+    return mask
+
+
+def test_cells():
+    """Test that cells are found between the rulings of each band."""
+    grid = Grid((400, 600))
+    grid.add(ruled())
+    cells = grid.cells()
+    assert cells.dtype == np.int32
+    assert cells[:4].tolist() == [
+        [0, 0, 44, 24, 170, 100], [0, 1, 174, 24, 300, 100],
+        [0, 2, 304, 24, 430, 100], [0, 3, 434, 24, 556, 100],
+    ]
+    assert [len(cells[cells[:, 0] == band]) for band in range(3)] == [4, 4, 3]
+    assert cells[8].tolist() == [2, 0, 44, 154, 300, 380]
+
+
+def test_cells_by_strips():
+    """Test that a mask added by strips gives the same grid."""
+    mask = ruled()
+    grid = Grid(mask.shape)
+    grid.add(mask)
+    strips = Grid(mask.shape)
+    for y0 in range(0, 400, 37):
+        strips.add(mask[y0:y0 + 37], y0)
+    assert (strips.cells() == grid.cells()).all()
+
+
+def test_text_rows():
+    """Test that joined rows of text are cut at their pitch."""
+    profile = np.zeros(300, np.int32)
+    profile[10:40] = 50
+    # three rows joined by descenders, least inked at 100 and 131
+    profile[70:163] = 50
+    profile[[100, 131]] = 3
+    # a speck
+    profile[200:203] = 5
+    grid = Grid((300, 10))
+    pitch = grid.pitch([profile])
+    assert pitch == 30
+    assert grid.text_rows(profile, pitch) == [(10, 40), (70, 100), (100, 131), (131, 163)]
+    assert grid.text_rows(np.zeros(10), 0) == []
@@ -0,0 +1,72 @@
+import cv2
+import numpy as np
+import pytest
+from core import Image
+from utils import Transform
+
+
+def page(angle=1.5):
+    """BGR page of a ruled table with ink in its cells, skewed by angle."""
+    rng = np.random.default_rng(0)
+    src = np.full((1400, 900, 3), 235, np.uint8)
+    src[100:1300:60, 50:850] = 30
+    src[100:1300, 50:850:200] = 30
+    for y in range(115, 1280, 60):
+        for x in range(70, 820, 45):
+            src[y:y + 25, x:x + 4 + int(rng.integers(0, 20))] = 40
+    src = Transform().rotate(src, angle)
+    return (src.astype(np.int16) + rng.integers(-15, 15, src.shape)).clip(0, 255).astype(np.uint8)
+
+
+@pytest.mark.parametrize('deskew', [
+    None, {'max_angle': 5.0, 'precision': 0.05, 'stride': 4, 'min_angle': 0.1},
+])
+def test_preprocess_tiled(tmp_path, deskew):
+    """Test that cleaning a page by strips gives the same page."""
+    image = page()
+    whole = Image(tmp_path / 'input_y1922-p028.png', tmp_path, image=image,
+                  debug=False).preprocess(deskew)
+    expected = whole['preprocessed']
+    # strips as small as the halo of the line detection
+    stages = Image(tmp_path / 'input_y1922-p028.png', tmp_path, image=image,
+                   debug=False).preprocess(deskew, budget=1)
+    assert list(stages) == ['preprocessed', 'grid']
+    assert (stages['preprocessed'] == expected).all()
+    assert (stages['grid'] == whole['grid']).all()
+
+
+@pytest.mark.parametrize('binarisation', [
+    {'method': 'sauvola', 'window': 51}, {'method': 'wolf', 'window': 51},
+])
+def test_preprocess_tiled_local(tmp_path, binarisation):
+    """Test that strips binarized locally give the same page."""
+    image = page()
+    expected = Image(tmp_path / 'input_y1922-p028.png', tmp_path, image=image,
+                     debug=False).preprocess(binarisation=binarisation)['preprocessed']
+    stages = Image(tmp_path / 'input_y1922-p028.png', tmp_path, image=image,
+                   debug=False).preprocess(budget=1, binarisation=binarisation)
+    assert (stages['preprocessed'] == expected).all()
+
+
+def test_segment_cells(tmp_path):
+    """Test that each text row of each ruled cell is cropped on its own."""
+    src = np.full((900, 1000), 235, np.uint8)
+    # 2 ruled bands of 4 columns, of 5 and 3 rows of ink
+    for y in (100, 400, 600):
+        src[y:y + 5, 100:900] = 20
+    for x in (100, 300, 500, 700, 895):
+        src[100:605, x:x + 5] = 20
+    for y in list(range(130, 380, 50)) + list(range(430, 580, 50)):
+        for x in (150, 350, 550, 750):
+            cv2.putText(src, '12.7', (x, y + 30), cv2.FONT_HERSHEY_SIMPLEX, 1.0, 40, 2)
+    stages = Image(tmp_path / 'input_y1922-p028.png', tmp_path, image=src,
+                   debug=False).preprocess()
+    assert len(stages['grid']) == 2 * 4
+
+    cells = Image(tmp_path / 'input_y1922-p028.png', tmp_path, image=stages['preprocessed'],
+                  debug=False).segment_cells(stages['grid'])
+    names = [path.name for path, _ in cells]
+    assert len(cells) == (5 + 3) * 4
+    assert names[:2] == ['cell_y1922-p028-b0-r0.png', 'cell_y1922-p028-b0-r1.png']
+    assert names[-1] == 'cell_y1922-p028-b7-r3.png'
+    assert all(20 <= img.shape[0] <= 30 and 180 <= img.shape[1] < 200 for _, img in cells)
@@ -0,0 +1,76 @@
+import pickle
+import pytest
+from core import Journal
+
+
+@pytest.fixture
+def journal(tmp_path):
+    """Fixture providing an empty journal."""
+    return Journal(tmp_path / 'journal.sqlite')
+
+
+def test_record_and_get(journal):
+    """Test that recorded units are found again."""
+    row = {'text': '1003-56', 'year': 'block_y1922', 'page': 'p028', 'block': 'b0', 'line': 'r1'}
+    journal.record('input_y1922-p028.png', row)
+
+    assert journal.get('block_y1922', 'p028', 'b0', 'r1') == row
+    assert journal.get('block_y1922', 'p028', 'b0', 'r2') is None
+
+
+def test_pages(journal):
+    """Test page completion and page rows."""
+    for line in ('r3', 'r1'):
+        journal.record('page.png', {'text': line, 'year': 'y', 'page': 'p', 'block': 'b', 'line': line})
+
+    assert not journal.is_complete('page.png')
+    journal.complete_page('page.png')
+    assert journal.is_complete('page.png')
+    assert [row['line'] for row in journal.rows('page.png')] == ['r3', 'r1']
+
+
+def test_block_rows(journal):
+    """Test that block rows have no line."""
+    journal.record('page.png', {'text': 'x', 'year': 'y', 'page': 'p', 'block': 'b'})
+    assert journal.get('y', 'p', 'b') == {'text': 'x', 'year': 'y', 'page': 'p', 'block': 'b'}
+
+
+def test_durable(journal):
+    """Test that records survive a new connection and pickling."""
+    journal.record('page.png', {'text': 'x', 'year': 'y', 'page': 'p', 'block': 'b', 'line': 'r0'})
+    copy = pickle.loads(pickle.dumps(journal))
+    assert copy.get('y', 'p', 'b', 'r0')['text'] == 'x'
+
+    copy.reset()
+    assert journal.get('y', 'p', 'b', 'r0') is None
+
+
+def test_words(journal):
+    """Test that the words of a unit are kept, and older journals upgraded."""
+    row = {'text': 'x', 'year': 'y', 'page': 'p', 'block': 'b', 'line': 'r0', 'words': '[]'}
+    journal.record('page.png', row)
+    assert journal.get('y', 'p', 'b', 'r0') == row
+    assert journal.rows('page.png') == [row]
+
+    journal.conn.execute("CREATE TABLE old (src TEXT, year TEXT, page TEXT, block TEXT, line TEXT, text TEXT)")
+    journal.conn.execute("DROP TABLE units")
+    journal.conn.execute("ALTER TABLE old RENAME TO units")
+    copy = pickle.loads(pickle.dumps(journal))
+    copy.record('page.png', row)
+    assert copy.get('y', 'p', 'b', 'r0') == row
+
+
+def test_resumed_without_words(journal, tmp_path):
+    """Test that rows recorded with their words are resumed without them by
+    a run that does not keep them, and still fit its output columns."""
+    from main import write_stream
+
+    row = {'text': '1003-56', 'year': 'block_y1922', 'page': 'p028', 'block': 'b0', 'line': 'r1',
+           'words': '[{"text": "1003-56"}]'}
+    journal.record('page.png', row)
+
+    assert journal.get('block_y1922', 'p028', 'b0', 'r1') == row
+    assert 'words' not in journal.get('block_y1922', 'p028', 'b0', 'r1', words=False)
+    rows = journal.rows('page.png', words=False)
+    assert rows == [{key: value for key, value in row.items() if key != 'words'}]
+    assert write_stream(rows, str(tmp_path / 'output.csv'), line=True, words=False) == 1
@@ -0,0 +1,72 @@
+import math
+import numpy as np
+import pytest
+from core import Layouts
+
+
+@pytest.fixture
+def layouts(tmp_path):
+    """Fixture providing an empty layout index."""
+    return Layouts(tmp_path / 'layout', max_bytes=10 * 1024 * 1024, max_residual=4.0, max_angle=0.5)
+
+
+def grid(dx=0, dy=0, angle=0.0):
+    """Cells of 2 bands of 3 columns, moved by a rotation and a translation."""
+    cells = np.array([
+        (band, column, 100 + 300 * column, 100 + 500 * band, 390 + 300 * column, 590 + 500 * band)
+        for band in range(2) for column in range(3)
+    ], dtype=np.float64)
+    theta = math.radians(angle)
+    for x, y in ((2, 3), (4, 5)):
+        cells[:, x], cells[:, y] = (cells[:, x] * math.cos(theta) - cells[:, y] * math.sin(theta) + dx,
+                                    cells[:, x] * math.sin(theta) + cells[:, y] * math.cos(theta) + dy)
+    return np.round(cells).astype(np.int32)
+
+
+BLOCKS = [(3, (80, 80, 1020, 1120), [(0, (10, 20, 900, 60), 20), (4, (10, 70, 900, 110), 20)])]
+
+
+def test_fit():
+    """Test that the rotation and translation between two grids are found."""
+    rotation, translation, residual = Layouts.fit(grid(), grid(12, -7, 0.2))
+    assert math.degrees(math.atan2(rotation[1, 0], rotation[0, 0])) == pytest.approx(0.2, abs=0.02)
+    assert translation == pytest.approx((12, -7), abs=1)
+    assert residual < 1
+
+
+def test_signature():
+    """Test that a layout is signed by the number of columns of its bands."""
+    assert Layouts.signature(grid()) == (3, 3)
+    assert Layouts.signature(grid()[1:]) == (2, 3)
+
+
+def test_registered(layouts):
+    """Test that the boxes of a template are moved onto a page of its layout."""
+    assert layouts.get('040', grid(), (1500, 1200)) is None
+    layouts.put('040', grid(), BLOCKS)
+
+    blocks = layouts.get('040', grid(15, -10), (1500, 1200))
+    assert blocks == [(3, (95, 70, 1035, 1110), [(0, (10, 20, 900, 60), 20), (4, (10, 70, 900, 110), 20)])]
+    assert (layouts.hits, layouts.misses) == (1, 1)
+
+    # the block is clipped to the page, its lines stay where they are on the page
+    blocks = layouts.get('040', grid(-90, 0), (1500, 1200))
+    assert blocks == [(3, (0, 80, 930, 1120), [(0, (0, 20, 890, 60), 20), (4, (0, 70, 890, 110), 20)])]
+
+
+def test_segmented_in_full(layouts):
+    """Test that pages of another number or layout, or fitting their
+    template poorly, have no boxes."""
+    layouts.put('040', grid(), BLOCKS)
+    assert layouts.get('041', grid(), (1500, 1200)) is None
+    assert layouts.get('040', grid()[1:], (1500, 1200)) is None
+    assert layouts.get('040', grid(angle=2), (1500, 1200)) is None
+    distorted = grid()
+    distorted[0, 2:6] += 20
+    assert layouts.get('040', distorted, (1500, 1200)) is None
+    assert layouts.get('040', grid()[:0], (1500, 1200)) is None
+    assert layouts.hits == 0
+
+    # the first template of a layout is kept
+    layouts.put('040', grid(), [])
+    assert layouts.get('040', grid(), (1500, 1200)) == BLOCKS
@@ -0,0 +1,30 @@
+import cv2
+import numpy as np
+import pytest
+from utils import Morph
+
+
+@pytest.mark.parametrize('hsize, vsize, iterations', [
+    (20, 1, 2), (20, 4, 2), (50, 1, 4), (1, 50, 4), (3, 40, 2), (500, 1, 4), (1, 1, 1), (90, 85, 1),
+])
+def test_rect_matches_opencv(hsize, vsize, iterations):
+    """Test that rectangular operations are bit-identical to OpenCV."""
+    rng = np.random.default_rng(0)
+    src = (rng.random((300, 700)) < 0.3).astype(np.uint8) * 255
+    src[100:110] = rng.integers(0, 256, (10, 700), dtype=np.uint8)
+    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (hsize, vsize))
+    morph = Morph()
+
+    assert (morph.to_erode(src, hsize, vsize, iterations)
+            == cv2.erode(src, kernel, iterations=iterations)).all()
+    assert (morph.to_dilate(src, hsize, vsize, iterations)
+            == cv2.dilate(src, kernel, iterations=iterations)).all()
+    assert (morph.to_close(src, hsize, vsize, iterations)
+            == cv2.morphologyEx(src, cv2.MORPH_CLOSE, kernel, iterations=iterations)).all()
+    assert (morph.to_open(src, hsize, vsize, iterations)
+            == cv2.morphologyEx(src, cv2.MORPH_OPEN, kernel, iterations=iterations)).all()
+
+
+def test_kernel_cached():
+    """Test that structuring elements are created once."""
+    assert Morph.kernel(cv2.MORPH_RECT, (5, 1)) is Morph.kernel(cv2.MORPH_RECT, (5, 1))
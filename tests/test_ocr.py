@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+from core import OCR, LineBatcher
+
+
+def word(text, top, height, line, left=0):
+    """Word of the engine, 10 pixels per character."""
+    return {'text': text, 'left': left, 'top': top, 'width': 10 * len(text), 'height': height,
+            'conf': 90.0, 'line': line}
+
+
+def test_stack():
+    """Test that lines are stacked on zeros, gap rows apart."""
+    images = [np.full((10, 30), 255, np.uint8), np.full((20, 50), 255, np.uint8)]
+    stacked, spans = LineBatcher.stack(images, gap=5)
+
+    assert stacked.shape == (5 + 10 + 5 + 20 + 5, 50)
+    assert spans == [(5, 15), (20, 40)]
+    assert (stacked[5:15, :30] == 255).all() and (stacked[5:15, 30:] == 0).all()
+    assert (stacked[15:20] == 0).all()
+
+
+def test_assign_words_to_lines():
+    """Test that words go back to the line whose rows they lie in."""
+    spans = [(5, 15), (20, 40)]
+    words = [word('a', 6, 8, 1), word('b', 5, 10, 1), word('c', 22, 15, 2)]
+
+    texts, ambiguous = LineBatcher.assign(words, spans)
+
+    assert [[word['text'] for word in line] for line in texts] == [['a', 'b'], ['c']]
+    assert ambiguous == set()
+
+
+def test_assign_ambiguous():
+    """Test that lines with words across or between them are ambiguous."""
+    spans = [(5, 15), (20, 40), (45, 60)]
+    # crosses the first two lines, then lies in the gap between the last two
+    words = [word('a', 10, 15, 1), word('b', 41, 3, 2)]
+    assert LineBatcher.assign(words, spans)[1] == {0, 1, 2}
+
+    # one text line of the engine over two lines
+    words = [word('a', 6, 8, 1), word('b', 22, 15, 1), word('c', 46, 10, 2)]
+    assert LineBatcher.assign(words, spans)[1] == {0, 1}
+
+
+def test_join_keeps_column_gaps():
+    """Test that gaps wider than a character are kept as spaces."""
+    words = [word('12', 0, 10, 1, left=100), word('1003', 0, 10, 1, left=0), word('5.2', 0, 10, 1, left=44)]
+    # 4 pixels between the first two words, 26 (2.6 characters) before the last one
+    assert LineBatcher.join(words) == '1003 5.2   12'
+    assert LineBatcher.join([]) == ''
+
+
+@pytest.mark.parametrize('height, tier', [(30, 'line'), (80, 'line_alt')])
+def test_cascade_first_config(monkeypatch, height, tier):
+    """Test that the cascade reads short lines with the legacy config first,
+    and tall lines with their LSTM config."""
+    ocr = OCR('line_y1922-p028-b0-r1.png', image=np.full((height, 200), 255, np.uint8), cascade=True)
+    configs = []
+
+    def read(image, config):
+        configs.append(config)
+        return '', []
+
+    monkeypatch.setattr(ocr, '_perform_read', read)
+    ocr.line_cascade(ocr.image)
+    assert configs[0] == ocr.configs[tier]
+    assert len(set((config.oem, config.psm) for config in configs)) == len(configs)
@@ -0,0 +1,59 @@
+import importlib.util
+import shutil
+import cv2
+import numpy as np
+import pytest
+from core import Rasterizer, Scan
+
+
+def test_document(tmp_path):
+    """Test that pages missing as PNG files are read from the PDF of their year."""
+    src = tmp_path / 'input_y1922-p040.png'
+    assert Rasterizer.document(src) is None
+
+    pdf = tmp_path / 'input_y1922.pdf'
+    pdf.write_bytes(b'%PDF-1.4')
+    assert Rasterizer.document(src) == (pdf, 40)
+
+    # a PNG of the page takes precedence
+    cv2.imwrite(str(src), np.full((40, 60), 255, np.uint8))
+    assert Rasterizer.document(src) is None
+
+
+def test_scan_load(tmp_path):
+    """Test that a page decoded by a function is decoded once, when used."""
+    img = np.full((40, 60), 255, np.uint8)
+    img[10:30, 10:50] = 0
+    calls = []
+
+    def load():
+        calls.append(1)
+        return img
+
+    scan = Scan(tmp_path / 'input_y1922-p040.png', load=load)
+    assert not calls
+    assert scan.image is img and scan.binary[20, 20] == 255
+    scan.release()
+    assert scan.image is img and len(calls) == 1
+
+
+@pytest.mark.parametrize('backend, available', [
+    ('pdftoppm', shutil.which('pdftoppm') is not None),
+    ('pypdfium2', importlib.util.find_spec('pypdfium2') is not None),
+])
+def test_render(tmp_path, backend, available):
+    """Test that a page of a PDF is rendered as a grayscale array at a given DPI."""
+    if not available:
+        pytest.skip(f"{backend} is not installed")
+    PIL = pytest.importorskip('PIL.Image')
+
+    page = np.full((300, 200), 255, np.uint8)
+    page[100:200, 50:150] = 0
+    pages = [PIL.fromarray(np.full((300, 200), 255, np.uint8)), PIL.fromarray(page)]
+    pdf = tmp_path / 'input_y1922.pdf'
+    pages[0].save(pdf, save_all=True, append_images=pages[1:], resolution=100)
+
+    img = Rasterizer.get(backend).render(pdf, 1, 200)
+    assert img.ndim == 2 and abs(img.shape[0] - 600) <= 1 and abs(img.shape[1] - 400) <= 1
+    assert img[300, 200] < 64 and img[50, 50] > 192
+    assert Rasterizer.get(backend).render(pdf, 2, 200) is None
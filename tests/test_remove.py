@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+from utils import Remove
+
+
+def line(seed=0):
+    """BGR line crop: a row of digits, a spot of ink above it, noise."""
+    rng = np.random.default_rng(seed)
+    src = np.full((60, 600, 3), 230, np.uint8)
+    for x in range(40, 520, 30):
+        src[25:40, x:x + 12] = 20
+    src[3:8, 300:306] = 20
+    src += rng.integers(0, 10, src.shape, dtype=np.uint8)
+    return src
+
+
+def test_artifacts_keeps_largest_region():
+    """Test that only the largest region is kept, the rest whitened."""
+    mask, result = Remove().artifacts(line(), 15)
+    assert mask.ndim == 2 and set(np.unique(mask)) == {0, 255}
+    assert mask[30, 40:502].all() and not mask[5, 303]
+    assert (result[mask == 0] == 255).all()
+    assert (result[mask > 0] == line()[mask > 0]).all()
+
+
+def test_artifacts_batch_matches_single():
+    """Test that the batch mode cleans each region as a crop."""
+    block = np.concatenate([line(seed) for seed in range(3)])
+    regions = [(10, 0, 590, 60, 15), (0, 50, 600, 130, 15), (100, 110, 500, 180, 80)]
+    for (x0, y0, x1, y1, height), (mask, result) in zip(regions, Remove().artifacts_batch(block, regions)):
+        expected_mask, expected_result = Remove().artifacts(block[y0:y1, x0:x1], height)
+        assert (mask == expected_mask).all() and (result == expected_result).all()
+
+    with pytest.raises(ValueError):
+        Remove().artifacts_batch(block, [(0, 0, 10, 10, 0)])
+
+
+def test_artifacts_grayscale():
+    """Test that a grayscale line is cleaned as its BGR version."""
+    src = line()
+    gray = src[..., 0].copy()
+    mask, result = Remove().artifacts(np.dstack([gray] * 3), 15)
+    gray_mask, gray_result = Remove().artifacts(gray, 15)
+    assert gray_result.ndim == 2
+    assert (gray_mask == mask).all() and (gray_result == result[..., 0]).all()
@@ -0,0 +1,51 @@
+import cv2
+import numpy as np
+from core import Scan
+
+
+def test_derivatives_are_shared(tmp_path):
+    """Test that a scan is decoded once and its derivatives computed once."""
+    img = np.full((40, 60, 3), 255, np.uint8)
+    img[10:30, 10:50] = 0
+    src = tmp_path / 'input_y1922-p028.png'
+    cv2.imwrite(str(src), img)
+
+    scan = Scan(src)
+    assert scan.image is scan.image
+    assert scan.blur_binary is scan.blur_binary
+    assert scan.binary[20, 20] == 255 and scan.binary[0, 0] == 0
+
+    # a given array is used as is, src only names the page
+    assert Scan(tmp_path / 'missing_y1922-p028.png', image=img).image is img
+
+
+def test_pyramid(tmp_path):
+    """Test that each pyramid level halves the previous one."""
+    img = np.full((40, 60, 3), 255, np.uint8)
+    scan = Scan(tmp_path / 'input_y1922-p028.png', image=img)
+    assert scan.pyramid(0) is scan.blur_gray
+    assert scan.pyramid(2).shape == (10, 15)
+    assert scan.pyramid(1).shape == (20, 30)
+
+
+def test_release(tmp_path):
+    """Test that released derivatives are computed again."""
+    img = np.full((40, 60, 3), 255, np.uint8)
+    scan = Scan(tmp_path / 'input_y1922-p028.png', image=img)
+    blur_gray, pyramid = scan.blur_gray, scan.pyramid(1)
+    scan.release()
+    assert scan.image is img
+    assert scan.blur_gray is not blur_gray and scan.pyramid(1) is not pyramid
+
+
+def test_decoded_as_grayscale(tmp_path):
+    """Test that pages are decoded on a single channel."""
+    img = np.full((40, 60, 3), 255, np.uint8)
+    img[10:30, 10:50] = 0
+    src = tmp_path / 'input_y1922-p028.png'
+    cv2.imwrite(str(src), img)
+
+    scan = Scan(src)
+    assert scan.image.shape == (40, 60)
+    assert scan.gray is scan.image
+    assert (scan.binary == Scan(src, image=img).binary).all()
@@ -0,0 +1,48 @@
+import cv2
+import numpy as np
+import pytest
+from utils import Segment
+
+
+def page(seed, height, width):
+    """Binary page of random bands of ink, some far apart on the same rows."""
+    rng = np.random.default_rng(seed)
+    src = np.zeros((height, width), np.uint8)
+    for _ in range(30):
+        y, x = int(rng.integers(0, height)), int(rng.integers(0, width))
+        src[y:y + int(rng.integers(1, 20)), x:x + int(rng.integers(1, 400))] = 255
+    return src
+
+
+@pytest.mark.parametrize('seed, height, width', [(0, 300, 700), (1, 200, 2500), (2, 400, 4500), (19, 400, 4500), (28, 400, 4500)])
+def test_profile_block_matches_morphology(seed, height, width):
+    """Test that profile blocks are the contours of the morphology engine."""
+    src = page(seed, height, width)
+    segment = Segment().segment_block(src)
+    contours, _ = cv2.findContours(segment, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+    assert Segment().profile_block(src, 0) == [
+        (i, cv2.boundingRect(contour), int(cv2.contourArea(contour)))
+        for i, contour in enumerate(contours)
+    ]
+
+
+def test_profile_block_min_area():
+    """Test that blocks smaller than min_area are left out."""
+    src = np.zeros((200, 600), np.uint8)
+    assert Segment().profile_block(src) == []
+    src[50:60, 100:200] = 255
+    assert Segment().profile_block(src, 10**6) == []
+    assert len(Segment().profile_block(src, 0)) == 1
+
+
+def test_profile_block_contour_area():
+    """Test that blocks are kept by the area of their contour, as the
+    morphology engine keeps them, not by their number of pixels."""
+    src = np.zeros((400, 1400), np.uint8)
+    src[100:172, 100:1100] = 255
+    # 72 rows across the page: 100800 pixels, but a contour of 1399 x 71
+    assert Segment().profile_block(src, 100000) == []
+    assert Segment().profile_block(src, 99329) == [(0, (0, 102, 1400, 72), 99329)]
+    src[172] = 255
+    assert Segment().profile_block(src, 100000) == [(0, (0, 102, 1400, 73), 100728)]
@@ -0,0 +1,9 @@
+from utils import Should
+
+
+def test_recognize_again():
+    """Test that texts led by a stray digit or a header word are recognized again."""
+    should = Should()
+    assert should.recognize_again('12  3.4 5.6') == (False, None, None)
+    assert should.recognize_again('3  4\n5') == (True, 1, 11)
+    assert should.recognize_again('Mean\n12\n3') == (True, 0, 7)
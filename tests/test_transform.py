@@ -0,0 +1,38 @@
+import cv2
+import numpy as np
+from utils import Transform
+
+
+def test_estimate_angle_profile():
+    """Test that the skew of ruled lines is undone by rotate()."""
+    page = np.zeros((600, 800), np.uint8)
+    page[50:550:25, 100:700] = 255
+    transform = Transform()
+    assert transform.estimate_angle_profile(page) == 0.0
+
+    skewed = transform.rotate(page, 2.0, interpolation=cv2.INTER_NEAREST)
+    assert abs(transform.estimate_angle_profile(skewed) + 2.0) <= 0.05
+    assert transform.estimate_angle_profile(np.zeros_like(page)) == 0.0
+
+
+def test_rotate():
+    """Test the small angles and the nearest-neighbour interpolation."""
+    page = np.zeros((60, 80), np.uint8)
+    page[20:40, 10:70] = 255
+    transform = Transform()
+    assert transform.rotate(page, 0.05, min_angle=0.1) is page
+
+    rotated = transform.rotate(page, 3.0, interpolation=cv2.INTER_NEAREST)
+    assert set(np.unique(rotated)) == {0, 255}
+
+
+def test_estimate_angle_points():
+    """Test that the convex hulls of the parts of a page give its angle."""
+    page = np.zeros((300, 400), np.uint8)
+    page[50:250:20, 40:360] = 255
+    page = Transform().rotate(page, 3.0, interpolation=cv2.INTER_NEAREST)
+    transform = Transform()
+    hulls = [cv2.convexHull(cv2.findNonZero(part)) + np.array([0, y], dtype=np.int32)
+             for y, part in ((0, page[:150]), (150, page[150:])) if cv2.countNonZero(part)]
+    assert transform.estimate_angle_points(np.concatenate(hulls)) == transform.estimate_angle(page)
+    assert transform.estimate_angle_points(None) == 0.0
@@ -0,0 +1,131 @@
+import os
+import time
+from pathlib import Path
+import pytest
+from core import WorkQueue, DirectoryQueue, SQLiteQueue
+
+
+@pytest.fixture(params=['queue', 'queue.sqlite'])
+def work_queue(request, tmp_path):
+    """Fixture providing an empty queue of each backend."""
+    return WorkQueue.open(tmp_path / request.param, lease=0.5)
+
+
+def test_open(tmp_path):
+    """Test backend selection from the path."""
+    assert isinstance(WorkQueue.open(tmp_path / 'queue'), DirectoryQueue)
+    assert isinstance(WorkQueue.open(tmp_path / 'queue.sqlite'), SQLiteQueue)
+
+
+def test_claim_once(work_queue):
+    """Test that an item is added and claimed only once."""
+    assert work_queue.add('y1922-p028', '1922/input_y1922-p028.png')
+    assert not work_queue.add('y1922-p028', '1922/input_y1922-p028.png')
+
+    assert work_queue.claim('w1') == ('y1922-p028', '1922/input_y1922-p028.png')
+    assert work_queue.claim('w2') is None
+    assert work_queue.counts() == {'pending': 0, 'leased': 1, 'done': 0, 'failed': 0}
+
+
+def test_expired_lease(work_queue):
+    """Test that an expired lease is claimed again and lost by its worker."""
+    work_queue.add('y1922-p028', 'page')
+    work_queue.claim('w1')
+    assert work_queue.heartbeat('y1922-p028', 'w1')
+
+    time.sleep(0.7)
+    assert work_queue.claim('w2') == ('y1922-p028', 'page')
+    assert not work_queue.heartbeat('y1922-p028', 'w1')
+    assert work_queue.heartbeat('y1922-p028', 'w2')
+
+
+def test_results(work_queue):
+    """Test that completed items keep their rows."""
+    for key in ('y1922-p040', 'y1922-p028'):
+        work_queue.add(key, key)
+        claimed, _ = work_queue.claim('w1')
+        work_queue.complete(claimed, 'w1', [{'text': claimed}])
+
+    assert work_queue.counts() == {'pending': 0, 'leased': 0, 'done': 2, 'failed': 0}
+    assert list(work_queue.results()) == [[{'text': 'y1922-p028'}], [{'text': 'y1922-p040'}]]
+
+
+def test_stale_completion(work_queue):
+    """Test that a worker whose lease was taken over cannot complete the item."""
+    work_queue.add('y1922-p028', 'page')
+    work_queue.claim('w1')
+    time.sleep(0.7)
+    work_queue.claim('w2')
+
+    assert not work_queue.complete('y1922-p028', 'w1', [{'text': 'w1'}])
+    assert work_queue.heartbeat('y1922-p028', 'w2')
+    assert work_queue.complete('y1922-p028', 'w2', [{'text': 'w2'}])
+    assert list(work_queue.results()) == [[{'text': 'w2'}]]
+
+
+def test_claimed_with_owner(tmp_path, monkeypatch):
+    """Test that an item is leased only once its owner is recorded."""
+    work_queue = DirectoryQueue(tmp_path / 'queue', lease=0.5)
+    work_queue.add('y1922-p028', 'page')
+    rename = os.rename
+
+    def check_owner(src, dst):
+        if Path(dst).parent.name == 'leased':
+            assert work_queue._owner(Path(dst).name) == 'w1'
+        rename(src, dst)
+
+    monkeypatch.setattr(os, 'rename', check_owner)
+    assert work_queue.claim('w1') == ('y1922-p028', 'page')
+    monkeypatch.undo()
+    assert work_queue.heartbeat('y1922-p028', 'w1')
+
+
+def test_reclaim_halfway_claim(tmp_path):
+    """Test that an item left hidden by a worker crashed while claiming it
+    is claimed again once its lease has expired."""
+    work_queue = DirectoryQueue(tmp_path / 'queue', lease=0.5)
+    work_queue.add('y1922-p028', 'page')
+    os.rename(tmp_path / 'queue' / 'pending' / 'y1922-p028',
+              tmp_path / 'queue' / 'pending' / '.y1922-p028.host.1.claim')
+    assert work_queue.claim('w2') is None
+
+    time.sleep(0.7)
+    assert work_queue.claim('w2') == ('y1922-p028', 'page')
+
+
+def test_failed(work_queue):
+    """Test that an item raising goes back to pending, and is failed for
+    good after the given number of attempts."""
+    work_queue.add('y1922-p028', 'page')
+    work_queue.claim('w1')
+    assert not work_queue.fail('y1922-p028', 'w2', 'ValueError: other worker', 2)
+    assert not work_queue.fail('y1922-p028', 'w1', 'ValueError: corrupt', 2)
+    assert work_queue.counts() == {'pending': 1, 'leased': 0, 'done': 0, 'failed': 0}
+
+    assert work_queue.claim('w2') == ('y1922-p028', 'page')
+    assert work_queue.fail('y1922-p028', 'w2', 'ValueError: corrupt', 2)
+    assert work_queue.counts() == {'pending': 0, 'leased': 0, 'done': 0, 'failed': 1}
+    assert work_queue.claim('w3') is None
+
+
+def test_failed_lost_lease(tmp_path):
+    """Test that a worker whose lease expired while it was failing the item
+    neither counts the attempt nor fails an item claimed again."""
+    work_queue = DirectoryQueue(tmp_path / 'queue', lease=0.5)
+    work_queue.add('y1922-p028', 'page')
+    work_queue.claim('w1')
+    leased = tmp_path / 'queue' / 'leased' / 'y1922-p028'
+    pending = tmp_path / 'queue' / 'pending' / 'y1922-p028'
+
+    # expired and moved back to pending
+    os.rename(leased, pending)
+    assert not work_queue.fail('y1922-p028', 'w1', 'ValueError: corrupt', 2)
+    work_queue.claim('w1')
+    assert not work_queue.fail('y1922-p028', 'w1', 'ValueError: corrupt', 2)
+    assert work_queue.counts() == {'pending': 1, 'leased': 0, 'done': 0, 'failed': 0}
+
+    # being claimed by another worker
+    work_queue.claim('w1')
+    os.rename(leased, pending.with_name('.y1922-p028.w2.claim'))
+    assert not work_queue.fail('y1922-p028', 'w1', 'ValueError: corrupt', 2)
+    assert work_queue.counts() == {'pending': 0, 'leased': 0, 'done': 0, 'failed': 0}